@@ -0,0 +1,174 @@
+"""
+Measures the throughput, latency, CPU time and memory use of Pydel against the local stub server.
+
+Usage: python -m benchmarks.bench_client [--requests N] [--concurrency N] [--latency SECONDS] [--output FILE]
+                                         [--compare FILE]
+
+Results are printed, or written to --output, as JSON. --compare prints how they differ from an earlier result file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pydel
+from pydel import Post, generate_post_list
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+DEVICE_UID = 'b' * 64
+
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # Bytes on macOS, kilobytes elsewhere
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[int(round(fraction * (len(sorted_values) - 1)))]
+
+
+def measure(operation, count, concurrency=1):
+    """
+    Runs operation count times, on concurrency threads, and summarizes the time each call took.
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def timed(_):
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    cpu = time.process_time()
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, range(count)))
+    else:
+        for i in range(count):
+            timed(i)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+
+    latencies.sort()
+    return {'operations': count,
+            'concurrency': concurrency,
+            'seconds': round(wall, 4),
+            'operations_per_second': round(count / wall, 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'cpu_seconds': round(cpu, 4),
+            'cpu_ms_per_operation': round(cpu / count * 1000, 4),
+            'max_rss_kb': max_rss_kb()}
+
+
+def start_stub(latency, posts):
+    """
+    Starts the stub server in a separate process, so that its CPU time and memory are not counted. Returns the process
+    and the URL it listens on.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.stub_server', '--latency', str(latency),
+                                '--posts', str(posts)], cwd=root, stdout=subprocess.PIPE, universal_newlines=True)
+    return process, process.stdout.readline().strip()
+
+
+def run(base_url, requests, concurrency):
+    p = pydel.Pydel(device_uid=DEVICE_UID, city='Trondheim', country_code='NO', lat=63.43, lng=10.39,
+                    loc_name='Trondheim', base_url=base_url, write_delay=0, pool_maxsize=max(10, concurrency))
+    results = {}
+
+    results['auth'] = measure(lambda: p.authenticate(force=True), max(1, requests // 10))
+    results['feed'] = measure(p.get_newest_jodels, requests, concurrency)
+    results['feed_serial'] = measure(p.get_newest_jodels, max(1, requests // 5))
+    results['feed_stream'] = measure(lambda: list(p.iter_newest_jodels()), max(1, requests // 5))
+
+    post_json = p.get_newest_jodels()[0]._json_dict
+    results['vote'] = measure(lambda: p.upvote_post(Post(post_json, p)), requests, concurrency)
+    results['delete'] = measure(lambda: p.delete_post(Post(post_json, p)), max(1, requests // 5), concurrency)
+
+    body = p._authenticated_request(method='GET', url=pydel.FEED_URLS['newest']).json()['posts']
+    results['parse'] = measure(lambda: generate_post_list(body, p), requests)
+    posts = generate_post_list(body, p)
+
+    def read_properties():
+        for post in posts:
+            (post.post_id, post.message, post.color, post.vote_count, post.reply_count, post.created_at, post.location,
+             post.replies)
+    results['properties'] = measure(read_properties, requests)
+    results['parse']['posts_per_operation'] = results['properties']['posts_per_operation'] = len(body)
+
+    p.close()
+    return results
+
+
+def compare(old, new):
+    print("{:<14}{:>14}{:>14}{:>9}{:>12}{:>12}".format('', 'old ops/s', 'new ops/s', 'change', 'old p99', 'new p99'))
+    for name, result in new['results'].items():
+        before = old['results'].get(name)
+        if before is None:
+            continue
+        change = (result['operations_per_second'] / before['operations_per_second'] - 1) * 100
+        print("{:<14}{:>14.1f}{:>14.1f}{:>8.1f}%{:>10.2f}ms{:>10.2f}ms".format(
+            name, before['operations_per_second'], result['operations_per_second'], change, before['p99_ms'],
+            result['p99_ms']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help="Number of requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="Number of threads sending requests")
+    parser.add_argument('--latency', type=float, default=0, help="Seconds the stub server delays every response by")
+    parser.add_argument('--posts', type=int, default=60, help="Number of posts in a feed")
+    parser.add_argument('--stub-url', help="URL of a running stub server, instead of starting one")
+    parser.add_argument('--output', help="File to write the results to")
+    parser.add_argument('--compare', help="Earlier result file to compare with")
+    args = parser.parse_args()
+
+    process = None
+    base_url = args.stub_url
+    if base_url is None:
+        process, base_url = start_stub(args.latency, args.posts)
+
+    try:
+        results = run(base_url, args.requests, args.concurrency)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report = {'python': platform.python_version(),
+              'implementation': platform.python_implementation(),
+              'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+              'config': {'requests': args.requests, 'concurrency': args.concurrency, 'latency': args.latency,
+                         'posts': args.posts},
+              'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares the JSON codecs available to Pydel on generated feed responses and post bodies.
+
+Usage: python -m benchmarks.bench_codec [number of posts per feed ...]
+"""
+import json
+import sys
+import timeit
+
+import requests
+
+from pydel import Pydel
+from pydel.codec import CODECS, PREFERENCE
+
+from .payloads import make_feed
+
+
+def best_time(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def make_response(body):
+    response = requests.Response()
+    response._content = body
+    response.status_code = 200
+    response.headers['Content-Type'] = 'application/json; charset=utf-8'
+    response.encoding = 'utf-8'
+    return response
+
+
+def bench_decode(n):
+    body = json.dumps(make_feed(n, replies=2)).encode('utf-8')
+    number = max(1, 20000 // n)
+    response = make_response(body)
+
+    print("Feed of {} posts with 2 replies each ({} KB)".format(n, len(body) // 1024))
+    baseline = best_time(response.json, number)
+    print("{:<28}{:>10.3f} ms".format('Response.json()', baseline * 1000))
+    for name in PREFERENCE:
+        if name in CODECS:
+            loads = CODECS[name].loads
+            seconds = best_time(lambda: loads(body), number)
+            print("{:<28}{:>10.3f} ms{:>8.1f}x".format(name + '.loads(content)', seconds * 1000, baseline / seconds))
+    print()
+
+
+def bench_encode():
+    location = ('Trondheim', 'NO', 63.4305, 10.3951, 'Strindvegen')
+    message = 'Hvorfor er det alltid kø i kantina når det regner? 😩'
+
+    def requests_json():
+        json.dumps({'color': 'FF9908',
+                    'location': {'city': location[0], 'country': location[1], 'loc_accuracy': 19.7,
+                                 'loc_coordinates': {'lat': location[2], 'lng': location[3]}, 'name': location[4]},
+                    'message': message}).encode('utf-8')
+
+    print("Post body")
+    baseline = best_time(requests_json, 20000)
+    print("{:<28}{:>10.3f} us".format('json.dumps(dict)', baseline * 1e6))
+    for name in PREFERENCE:
+        if name in CODECS:
+            p = Pydel('a' * 64, location[0], location[1], location[2], location[3], location[4], codec=name)
+            seconds = best_time(lambda: p._encode_post('FF9908', location[0], location[1], 19.7, location[2],
+                                                       location[3], location[4], message), 20000)
+            print("{:<28}{:>10.3f} us{:>8.1f}x".format(name + ', pre-encoded location', seconds * 1e6,
+                                                       baseline / seconds))
+            p.close()
+
+
+def main(*sizes):
+    print("Available codecs: {}\n".format(', '.join(n for n in PREFERENCE if n in CODECS)))
+    for n in sizes or (60, 1000):
+        bench_decode(n)
+    bench_encode()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
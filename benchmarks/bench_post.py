@@ -0,0 +1,54 @@
+"""
+Compares the memory use and attribute access speed of Post and CompactPost.
+
+Usage: python -m benchmarks.bench_post [number of posts]
+"""
+import gc
+import json
+import sys
+import timeit
+import tracemalloc
+
+from pydel import CompactPost, Post, generate_post_list
+
+from .payloads import make_feed
+
+
+def measure_memory(post_class, body, n):
+    # Posts are built from a freshly decoded body, which is then dropped like it is in Pydel.get_feed
+    gc.collect()
+    tracemalloc.start()
+    posts = generate_post_list(json.loads(body)['posts'], None, post_class)
+    gc.collect()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return posts, current / float(n)
+
+
+def measure_access(posts, attribute, number=3):
+    def access():
+        for post in posts:
+            getattr(post, attribute)
+    return min(timeit.repeat(access, number=1, repeat=number)) / len(posts) * 1e9
+
+
+def main(n=20000):
+    body = json.dumps(make_feed(n, replies=2))
+    attributes = ('post_id', 'message', 'vote_count', 'created_at', 'location', 'replies', 'user_handle')
+
+    print("{} posts with 2 replies each".format(n))
+    print("{:<22}{:>14}{:>14}".format('', 'Post', 'CompactPost'))
+
+    results = {}
+    for post_class in (Post, CompactPost):
+        posts, per_post = measure_memory(post_class, body, n)
+        results[post_class] = [per_post] + [measure_access(posts, a) for a in attributes]
+        del posts
+
+    rows = ['bytes/post'] + ['{} ns'.format(a) for a in attributes]
+    for i, row in enumerate(rows):
+        print("{:<22}{:>14.0f}{:>14.0f}".format(row, results[Post][i], results[CompactPost][i]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,77 @@
+"""
+Measures building, saving and loading a SearchIndex, and compares its queries with scanning all messages.
+
+Usage: python -m benchmarks.bench_search [number of posts]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+
+from pydel.search import SearchIndex, tokenize
+
+from .payloads import WORDS, make_post
+
+QUERIES = ('kaffe', 'kaffe eksamen', '"hei og hallo"', 'trond*', 'mensa OR vorlesung -regn', 'w123')
+
+
+def make_posts(n, seed=0):
+    # Messages mix the common words of the other benchmarks with a long tail of rare ones, as real messages do
+    rng = random.Random(seed)
+    tail = ['w{}'.format(i) for i in range(50000)]
+
+    def word():
+        return rng.choice(WORDS) if rng.random() < 0.6 else tail[int(rng.paretovariate(1.2)) % len(tail)]
+
+    posts = []
+    for i in range(n, 0, -1):
+        post = make_post(i, rng)
+        post['message'] = ' '.join(word() for _ in range(rng.randint(3, 30)))
+        posts.append(post)
+    return posts
+
+
+def scan(posts, query):
+    # What a search without an index does: tokenize every message and test it
+    words = query.split()
+    return [p['post_id'] for p in posts if all(w in tokenize(p['message']) for w in words)]
+
+
+def best_time(function, number=3):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def main(n=200000):
+    posts = make_posts(n)
+    print("{} posts, {:.1f} MB of messages".format(n, sum(len(p['message'].encode('utf-8')) for p in posts) / 1e6))
+
+    index = SearchIndex()
+    started = time.perf_counter()
+    index.add(posts)
+    print("{:<28}{:>10.2f} s".format('add', time.perf_counter() - started))
+    stats = index.stats()
+    print("{:<28}{:>10.1f} MB for {} terms".format('postings', stats['postings_bytes'] / 1e6, stats['terms']))
+
+    path = os.path.join(tempfile.mkdtemp(), 'index')
+    started = time.perf_counter()
+    index.save(path)
+    print("{:<28}{:>10.2f} s, {:.1f} MB".format('save', time.perf_counter() - started, os.path.getsize(path) / 1e6))
+    started = time.perf_counter()
+    loaded = SearchIndex.load(path)
+    print("{:<28}{:>10.2f} s".format('load', time.perf_counter() - started))
+    print()
+
+    seconds = best_time(lambda: scan(posts, 'kaffe'), 1)
+    print("{:<28}{:>10.1f} ms".format('scan for kaffe', seconds * 1000))
+    for query in QUERIES:
+        matches = loaded.count(query)
+        seconds = best_time(lambda: loaded.search(query, limit=50))
+        print("{:<28}{:>10.2f} ms{:>10} matches".format(query, seconds * 1000, matches))
+    loaded.close()
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
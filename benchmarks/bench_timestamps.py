@@ -0,0 +1,41 @@
+"""
+Compares the timestamp parsers in pydel.utils with the strptime based parser they replaced.
+
+Usage: python -m benchmarks.bench_timestamps [number of timestamps]
+"""
+import datetime
+import sys
+import timeit
+
+from pydel import utils
+
+from .payloads import make_timestamp
+
+
+def strptime(iso8601):
+    return datetime.datetime.strptime(iso8601, "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def main(n=100000):
+    timestamps = [make_timestamp(i * 37) for i in range(n)]
+    unexpected = [t[:19] + '+01:00' for t in timestamps[:n // 10]]
+
+    cases = [
+        ('strptime', lambda: [strptime(t) for t in timestamps]),
+        ('iso8601_to_datetime', lambda: [utils.iso8601_to_datetime(t) for t in timestamps]),
+        ('iso8601_to_utc_datetime', lambda: [utils.iso8601_to_utc_datetime(t) for t in timestamps]),
+        ('fixed layout parser', lambda: [utils._parse_fixed_layout(t) for t in timestamps]),
+        ('batch, datetimes', lambda: utils.batch_iso8601_to_datetime(timestamps)),
+        ('batch, epoch seconds', lambda: utils.batch_iso8601_to_datetime(timestamps, epoch_seconds=True)),
+    ]
+
+    print("{} timestamps".format(n))
+    for name, case in cases:
+        print("{:<28}{:>10.0f} ns/timestamp".format(name, min(timeit.repeat(case, number=1, repeat=3)) / n * 1e9))
+
+    fallback = min(timeit.repeat(lambda: [utils.iso8601_to_utc_datetime(t) for t in unexpected], number=1, repeat=3))
+    print("{:<28}{:>10.0f} ns/timestamp".format('fallback (+01:00 offsets)', fallback / len(unexpected) * 1e9))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
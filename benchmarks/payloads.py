@@ -0,0 +1,66 @@
+"""
+Generators for realistic Jodel API payloads, shared by the benchmarks.
+"""
+import datetime
+import hashlib
+import random
+
+from pydel import colors
+
+COLORS = (colors.ORANGE, colors.YELLOW, colors.RED, colors.BLUE, colors.BLUEGREY, colors.GREEN)
+WORDS = ('jodel', 'trondheim', 'eksamen', 'kaffe', 'heute', 'mensa', 'vorlesung', 'studenter', 'regn', 'schnee',
+         'bussen', 'party', 'hei', 'hallo', 'lol', 'noen', 'jemand', 'hvorfor', 'warum', 'og', 'und', 'er', 'ist')
+START = datetime.datetime(2016, 1, 1)
+
+
+def make_post_id(i):
+    return hashlib.md5(str(i).encode('UTF-8')).hexdigest()[:24]
+
+
+def make_timestamp(seconds):
+    return (START + datetime.timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def make_post(i, rng=random, replies=0, message_words=12, created=None):
+    """
+    Returns a dictionary shaped like a post in a feed response.
+
+    Args:
+        i: Number identifying the post; the post_id is derived from it.
+        (optional) rng: random.Random instance.
+        (optional) replies: Number of replies embedded as children.
+        (optional) message_words: Number of words in the message.
+        (optional) created: Creation time in seconds after 2016-01-01. Defaults to i minutes.
+    """
+    created = created if created is not None else i * 60
+    post = {
+        'post_id': make_post_id(i),
+        'message': ' '.join(rng.choice(WORDS) for _ in range(message_words)),
+        'color': rng.choice(COLORS),
+        'vote_count': rng.randint(-5, 200),
+        'child_count': replies,
+        'post_own': 'friend',
+        'discovered_by': 0,
+        'distance': rng.randint(0, 20),
+        'user_handle': hashlib.md5(str(rng.random()).encode('UTF-8')).hexdigest()[:16],
+        'got_thanks': False,
+        'created_at': make_timestamp(created),
+        'updated_at': make_timestamp(created),
+        'location': {
+            'name': 'Trondheim',
+            'loc_accuracy': 10.0,
+            'loc_coordinates': {'lat': 63.43 + rng.uniform(-0.1, 0.1), 'lng': 10.39 + rng.uniform(-0.1, 0.1)}
+        }
+    }
+    if replies:
+        post['children'] = [make_post(i * 1000 + r + 1, rng, 0, message_words // 2, created + r + 1)
+                            for r in range(replies)]
+    return post
+
+
+def make_feed(n, replies=2, seed=0, message_words=12):
+    """
+    Returns a dictionary shaped like a feed response with n posts, newest first.
+    """
+    rng = random.Random(seed)
+    return {'posts': [make_post(i, rng, replies, message_words) for i in range(n, 0, -1)]}
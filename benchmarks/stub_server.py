@@ -0,0 +1,279 @@
+"""
+Local stand-in for the Jodel API, serving the endpoints Pydel uses with generated posts.
+
+Usage: python -m benchmarks.stub_server [--port PORT] [--latency SECONDS] [--posts N] [--error-rate RATE] ...
+
+The server prints the URL it listens on, which can be passed to Pydel as base_url.
+"""
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .payloads import START, make_feed, make_post, make_post_id
+
+FEED_PATH = re.compile(r'^/api/v2/posts/(location/(popular|discussed)?|mine/(replies|votes|popular)?)?$')
+VOTE_PATH = re.compile(r'^/api/v2/posts/(\w+)/(up|down)vote$')
+POST_PATH = re.compile(r'^/api/v2/posts/(\w+)$')
+DETAILS_PATH = re.compile(r'^/api/v3/posts/(\w+)/details$')
+DETAILS_PAGE_SIZE = 50
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real API
+    disable_nagle_algorithm = True
+    wbufsize = -1  # Send headers and body together
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        path = re.sub('/+', '/', url.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        stub.count(method, path)
+
+        if stub.latency or stub.jitter:
+            time.sleep(stub.latency + stub.jitter * random.random())
+
+        if stub.error_rate and random.random() < stub.error_rate:
+            return self._reply(stub.error_status, b'{}')
+
+        if method == 'POST' and path in ('/api/v2/users', '/api/v2/users/refreshToken'):
+            return self._reply(200, stub.token_body())
+
+        if path.startswith('/api/v2/users') and path.endswith('/karma'):
+            return self._reply(200, b'{"karma":42}')
+
+        if method == 'GET' and FEED_PATH.match(path):
+            params = parse_qs(url.query)
+            return self._reply(200, stub.feed_body(int(params['limit'][0]) if 'limit' in params else None,
+                                                   params['after'][0] if 'after' in params else None))
+
+        details = DETAILS_PATH.match(path)
+        if method == 'GET' and details:
+            params = parse_qs(url.query)
+            body = stub.details_body(details.group(1), int(params['reply'][0]) if 'reply' in params else 0)
+            return self._reply(200, body) if body is not None else self._reply(404, b'{}')
+
+        if method == 'POST' and path == '/api/v2/posts':
+            return self._reply(200, stub.reply_body(json.loads(body.decode('utf-8'))))
+
+        if method == 'PUT' and VOTE_PATH.match(path):
+            return self._reply(204)
+
+        if method == 'DELETE' and POST_PATH.match(path):
+            return self._reply(204)
+
+        return self._reply(404, b'{}')
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class StubServer:
+    """
+    Threaded HTTP server answering the requests of Pydel like the Jodel API would.
+
+    Feeds consist of the same generated posts every time, paged by the limit and after parameters like the real ones.
+    Responses can be delayed by latency seconds plus up to jitter seconds, and a share error_rate of all requests can be
+    answered with error_status instead.
+    """
+    def __init__(self, port=0, latency=0, jitter=0, posts=60, replies=2, message_words=12, error_rate=0,
+                 error_status=503, token_lifetime=3600, seed=0, thread_replies=120):
+        """
+        Args:
+            (optional) port: Port to listen on. Defaults to any free port.
+            (optional) latency: Seconds every response is delayed by.
+            (optional) jitter: Maximum number of seconds added to the delay at random.
+            (optional) posts: Number of posts in a feed.
+            (optional) replies: Number of replies embedded in every post.
+            (optional) message_words: Number of words in every message.
+            (optional) error_rate: Share of requests answered with error_status.
+            (optional) error_status: HTTP status of the injected errors.
+            (optional) token_lifetime: Seconds until the access tokens handed out expire.
+            (optional) seed: Seed of the generated posts.
+            (optional) thread_replies: Number of replies in the full thread of every post, see details_body.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_lifetime = token_lifetime
+        self.thread_replies = thread_replies
+        self.requests = {}
+
+        feed = make_feed(posts, replies, seed, message_words)
+        self._posts = feed['posts']
+        self._posts_by_id = dict((p['post_id'], p) for p in self._posts)
+        self._positions = dict((p['post_id'], i) for i, p in enumerate(self._posts))
+        self._threads = {}
+        self._seed = seed
+        self._feed_body = json.dumps(feed).encode('utf-8')
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        The base URL to pass to Pydel.
+        """
+        return 'http://127.0.0.1:{}/'.format(self._server.server_port)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Serves requests on a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, name='pydel-stub-server')
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, method, path):
+        with self._lock:
+            key = '{} {}'.format(method, path)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def token_body(self):
+        return json.dumps({'access_token': uuid.uuid4().hex,
+                           'distinct_id': uuid.uuid4().hex[:24],
+                           'expiration_date': int(time.time() + self.token_lifetime),
+                           'refresh_token': uuid.uuid4().hex}).encode('utf-8')
+
+    def feed_body(self, limit=None, after=None):
+        """
+        Returns a page of the feed: at most limit posts, starting after the post with the ID after. The page after the
+        last post, or after an unknown one, is empty.
+        """
+        start = 0
+        if after is not None:
+            start = self._positions.get(after, len(self._posts) - 1) + 1
+
+        if start == 0 and (limit is None or limit >= len(self._posts)):
+            return self._feed_body
+        end = len(self._posts) if limit is None else start + limit
+        return json.dumps({'posts': self._posts[start:end]}).encode('utf-8')
+
+    def thread(self, post_id):
+        """
+        Returns the replies to a post, generated on first use: one in five by the author of the post, and one in four
+        answering an earlier reply (parent_id).
+        """
+        with self._lock:
+            replies = self._threads.get(post_id)
+            if replies is None:
+                replies = self._threads[post_id] = []
+                self._extend_thread(post_id, replies, self.thread_replies)
+            return replies
+
+    def add_replies(self, post_id, n):
+        """
+        Appends n new replies to the thread of a post.
+        """
+        replies = self.thread(post_id)
+        with self._lock:
+            self._extend_thread(post_id, replies, n)
+
+    def _extend_thread(self, post_id, replies, n):
+        rng = random.Random('{}{}{}'.format(self._seed, post_id, len(replies)))
+        created = (datetime.datetime.strptime(self._posts_by_id[post_id]['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ') -
+                   START).total_seconds()
+        for i in range(len(replies), len(replies) + n):
+            reply = make_post(0, rng, 0, 6, created + 60 * (i + 1))
+            reply['post_id'] = make_post_id('{}/{}'.format(post_id, i))
+            reply['parent_creator'] = 1 if i % 5 == 0 else 0
+            reply['replier'] = 0 if i % 5 == 0 else rng.randint(1, 20)
+            if i % 4 == 3:
+                reply['parent_id'] = replies[rng.randrange(len(replies))]['post_id']
+            replies.append(reply)
+
+    def details_body(self, post_id, skip=0):
+        """
+        Returns the body answering a request for the details of a post: the post, and the replies after the first skip
+        ones, DETAILS_PAGE_SIZE at a time. next is the skip of the next page, or null after the last one.
+        """
+        if post_id not in self._posts_by_id:
+            return None
+        replies = self.thread(post_id)
+        page = replies[skip:skip + DETAILS_PAGE_SIZE]
+        end = skip + len(page)
+        details = dict(self._posts_by_id[post_id], child_count=len(replies))
+        details.pop('children', None)
+        return json.dumps({'details': details,
+                           'replies': page,
+                           'next': end if end < len(replies) else None,
+                           'remaining': len(replies) - end}).encode('utf-8')
+
+    def reply_body(self, request):
+        post = make_post(random.randint(0, 1 << 30), message_words=0)
+        post['message'] = request.get('message', '')
+        post['color'] = request.get('color', post['color'])
+        return json.dumps([post] + self._posts[:9]).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0)
+    parser.add_argument('--jitter', type=float, default=0)
+    parser.add_argument('--posts', type=int, default=60)
+    parser.add_argument('--replies', type=int, default=2)
+    parser.add_argument('--message-words', type=int, default=12)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--error-status', type=int, default=503)
+    args = parser.parse_args()
+
+    server = StubServer(args.port, args.latency, args.jitter, args.posts, args.replies, args.message_words,
+                        args.error_rate, args.error_status)
+    print(server.url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,129 @@
 import requests
+import sys
+import threading
 import time
-from pydel_exceptions import (AuthenticationError, UnexpectedResponseCodeException, InvalidPostException,
-                              NoPydelInstanceException, UnauthorizedDeletionException, UnauthenticatedException)
-import utils
-import colors
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from .pydel_exceptions import (AuthenticationError, UnexpectedResponseCodeException, InvalidPostException,
+                               NoPydelInstanceException, UnauthorizedDeletionException, UnauthenticatedException)
+from .credentials import CREDENTIAL_KEYS, FileCredentialStore, MemoryCredentialStore
+from . import utils
+from . import colors
+from . import streaming
+from .codec import get_codec
+from .cursor import DEFAULT_PAGE_SIZE, FeedCursor
+from .hooks import DECODE, ERROR, REAUTH, REQUEST_START, RESPONSE, RequestEvent, dispatch as dispatch_event
 
 DEFAULT_USER_AGENT_STRING = 'Jodel/65000 Dalvik/2.1.0 (Linux; U; Android 5.0; SM-G900F Build/LRX21T)'
 BASE_API_URL = 'https://api.go-tellm.com/'
+CLIENT_ID = '81e8a76e-1e02-4d17-9ba0-8a7020261b26'
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_REFRESH_MARGIN = 300
+AUTO_REFRESH_RETRY_INTERVAL = 10
+DEFAULT_WRITE_DELAY = 5
+MAX_WRITE_DELAY = 60
+TOO_EARLY_STATUS_CODES = (425, 429)
+STREAM_CHUNK_SIZE = 16384
+JSON_CONTENT_TYPE = 'application/json; charset=UTF-8'
+
+FEED_URLS = {
+    'home': 'api/v2/posts/',
+    'mine': 'api/v2/posts/mine/',
+    'mine_replies': 'api/v2/posts/mine/replies',
+    'mine_votes': 'api/v2/posts/mine/votes',
+    'mine_popular': 'api/v2/posts/mine/popular',
+    'newest': 'api/v2/posts/location/',
+    'popular': 'api/v2/posts/location/popular',
+    'discussed': 'api/v2/posts/location/discussed'
+}
+LOCATION_FEEDS = ('home', 'newest', 'popular', 'discussed')
+MAX_LOCATION_EXTRAS = 1024
+
+_LOCATION_EXTRAS = {}  # See _location_extra
+
+
+def create_session(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                   keep_alive=True):
+    """
+    Creates a pooled HTTP session. The session may be shared by any number of Pydel instances.
+
+    Args:
+        pool_connections: Number of per-host connection pools to keep around.
+        pool_maxsize: Maximum number of connections kept open to a single host.
+        pool_block: If True, requests wait for a free connection instead of opening more than pool_maxsize connections to a host.
+        keep_alive: If False, every connection is closed after its response has been read.
+
+    Returns:
+        requests.Session object
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                            pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    session.headers['Accept-Encoding'] = 'gzip'
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    return session
 
 
 class Pydel:
-    def __init__(self, device_uid, city, country_code, lat, lng, loc_name, user_agent_string=DEFAULT_USER_AGENT_STRING):
+    """
+    A client for the Jodel API, acting as a single user at a single position.
+
+    Pydel instances are safe to share between threads. Requests are sent through a thread-safe connection pool, and
+    authentication is single-flight: when several threads find the access token outdated at the same time, exactly one
+    of them renews it while the others wait for and then use the new token. start_auto_refresh() additionally renews
+    the token in a background thread before it expires, so that requests never have to wait for it.
+    """
+    def __init__(self, device_uid, city, country_code, lat, lng, loc_name, user_agent_string=DEFAULT_USER_AGENT_STRING,
+                 session=None, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, keep_alive=True, credential_store=None, auto_refresh=False,
+                 refresh_margin=DEFAULT_REFRESH_MARGIN, write_delay=DEFAULT_WRITE_DELAY, adaptive_write_delay=False,
+                 policy=None, post_class=None, cache=None, base_url=None, hooks=None, codec=None, hub=None):
+        """
+        Instantiates a Pydel object.
+
+        Args:
+            device_uid: 64 character device UID identifying the user.
+            city: City name
+            country_code: 2 or 3 capital letter country code
+            lat: Latitude of the current position
+            lng: Longitude of the current position
+            loc_name: Human-friendly name of the current position
+            (optional) user_agent_string: User agent string sent with every request.
+            (optional) session: requests.Session to send requests through, typically one made by create_session and
+                shared by several Pydel instances. The remaining arguments are ignored if a session is given.
+            (optional) pool_connections: See create_session.
+            (optional) pool_maxsize: See create_session.
+            (optional) pool_block: See create_session.
+            (optional) keep_alive: See create_session.
+            (optional) credential_store: Store used to persist authentication credentials between instances, such as
+                a FileCredentialStore. Credentials stored for device_uid are loaded immediately. Defaults to a
+                MemoryCredentialStore used by this instance only.
+            (optional) auto_refresh: If True, start_auto_refresh() is called immediately.
+            (optional) refresh_margin: Number of seconds before expiry at which the token is renewed by the background
+                refresher. If the server issues tokens for no longer than this, they are renewed halfway instead.
+            (optional) write_delay: Number of seconds after registering during which the server rejects posts, replies,
+                votes and deletions. Writes wait for whatever is left of this delay; reads are sent right away.
+            (optional) adaptive_write_delay: If True, write_delay is ignored. Writes are sent right away, and retried
+                with exponential backoff while the server rejects them with one of TOO_EARLY_STATUS_CODES. The delay
+                observed this way is used for subsequent registrations.
+            (optional) policy: policy.RequestPolicy rate limiting and retrying requests. By default, requests are
+                neither limited nor retried.
+            (optional) post_class: Class of the posts returned, Post (the default) or CompactPost.
+            (optional) cache: cache.ResponseCache reusing the responses to GET requests. It may be shared by several
+                instances. By default, nothing is cached.
+            (optional) base_url: URL of the API, ending with a slash. Defaults to BASE_API_URL.
+            (optional) hooks: List of hooks.Hook objects notified of every request, see add_hook.
+            (optional) codec: codec.JSONCodec, or the name of one, encoding requests and decoding responses. Defaults
+                to the fastest one installed (see codec.get_codec).
+            (optional) hub: hub.FeedHub sharing the location feeds read by this instance with other instances at the
+                same position.
+        """
         self._device_uid = device_uid
         self._city = city
         self._country_code = country_code
@@ -18,11 +131,151 @@ class Pydel:
         self._lng = lng
         self._loc_name = loc_name
         self._user_agent_string = user_agent_string
+        self._base_url = base_url if base_url is not None else BASE_API_URL
+        self._codec = get_codec(codec)
+        self._location_fragments = None
 
         self._access_token = None
         self._distinct_id = None
         self._expiration_date = None
         self._refresh_token = None
+        self._auth_lock = threading.RLock()
+
+        self._credential_store = credential_store if credential_store is not None else MemoryCredentialStore()
+        self._load_credentials()
+
+        # A session of our own carries our headers, a shared one gets them passed along with every request
+        self._owns_session = session is None
+        if self._owns_session:
+            self._session = create_session(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                           pool_block=pool_block, keep_alive=keep_alive)
+        else:
+            self._session = session
+        self._request_headers = None
+        self._json_headers = None
+        self._update_headers()
+
+        self._policy = policy
+        self._cache = cache
+        self._hub = hub
+        self._hooks = tuple(hooks) if hooks else ()
+        self._hooks_lock = threading.Lock()
+        self._post_class = post_class if post_class is not None else Post
+
+        self._write_delay = 0 if adaptive_write_delay else write_delay
+        self._adaptive_write_delay = adaptive_write_delay
+        self._registered_at = 0
+        self._writes_allowed_at = 0
+
+        self._refresh_margin = refresh_margin
+        self._refresher = None
+        self._stop_refresher = threading.Event()
+        if auto_refresh:
+            self.start_auto_refresh()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Stops the background token refresher and closes the pooled connections of this instance. Shared sessions passed
+        to the constructor are left open.
+        """
+        self.stop_auto_refresh()
+        if self._owns_session:
+            self._session.close()
+
+    def add_hook(self, hook):
+        """
+        Registers a hooks.Hook, such as a hooks.MetricsAggregator, to be notified when a request is sent, answered or
+        fails, when the access token is renewed and when a response is decoded. Responses served from the response cache
+        are not reported.
+        """
+        with self._hooks_lock:
+            self._hooks = self._hooks + (hook,)
+
+    def remove_hook(self, hook):
+        """
+        Unregisters a hook registered with add_hook or passed to the constructor.
+        """
+        with self._hooks_lock:
+            self._hooks = tuple(h for h in self._hooks if h is not hook)
+
+    def start_auto_refresh(self):
+        """
+        Starts a background thread renewing the access token refresh_margin seconds before it expires. Does nothing if
+        the thread is already running.
+        """
+        with self._auth_lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+
+            self._stop_refresher.clear()
+            self._refresher = threading.Thread(target=self._auto_refresh, name='pydel-refresh-{}'.format(
+                self._device_uid[:8]))
+            self._refresher.daemon = True
+            self._refresher.start()
+
+    def stop_auto_refresh(self):
+        """
+        Stops the background thread started by start_auto_refresh(), if any.
+        """
+        refresher = self._refresher
+        if refresher is not None:
+            self._stop_refresher.set()
+            if refresher is not threading.current_thread():
+                refresher.join()
+            self._refresher = None
+
+    def _auto_refresh(self):
+        margin = self._refresh_margin
+        delay = 0
+        while not self._stop_refresher.wait(delay):
+            if self._expiration_date is None:  # Not authenticated yet, or a token that never expires
+                delay = AUTO_REFRESH_RETRY_INTERVAL
+                continue
+
+            delay = self._expiration_date - margin - time.time()
+            if delay > 0:
+                continue
+
+            try:
+                self._renew_token(margin)
+            except Exception:  # Try again later; the request path still renews the token once it actually expires
+                delay = AUTO_REFRESH_RETRY_INTERVAL
+                continue
+
+            expiration_date = self._expiration_date
+            if expiration_date is None:
+                continue
+            lifetime = expiration_date - time.time()
+            if lifetime <= margin:
+                # The new token would be due for renewal right away, over and over
+                warnings.warn("refresh_margin ({}s) is not shorter than the lifetime of the access token ({:.0f}s), "
+                              "renewing it halfway instead".format(self._refresh_margin, lifetime))
+                margin = lifetime / 2.0
+            delay = max(AUTO_REFRESH_RETRY_INTERVAL, expiration_date - margin - time.time())
+
+    def _renew_token(self, margin=0):
+        """
+        Makes sure the access token stays valid for more than margin seconds, renewing it with the refresh token or by
+        registering anew if needed. Only one thread renews the token at a time, and threads that had to wait find the
+        token already renewed.
+        """
+        with self._auth_lock:
+            if self._has_valid_token(margin):
+                return True
+
+            if self._refresh_token is not None:
+                try:
+                    return self.refresh_access_token()
+                except AuthenticationError:
+                    pass  # Fall back to registering
+
+            return self._register()
 
     def _generate_headers(self):
         return {'User-Agent': self._user_agent_string,
@@ -30,21 +283,209 @@ class Pydel:
                 'Accept-Encoding': 'gzip'
                 }
 
-    def _authenticated_request(self, method, url, json=None, data=None):
+    def _update_headers(self):
+        headers = self._generate_headers()
+        if self._owns_session:
+            self._session.headers.update(headers)
+            self._json_headers = {'Content-Type': JSON_CONTENT_TYPE}
+        else:
+            self._request_headers = headers
+            self._json_headers = dict(headers, **{'Content-Type': JSON_CONTENT_TYPE})
+
+    def _load_credentials(self):
+        credentials = self._credential_store.load(self._device_uid)
+        if credentials is not None:
+            self._access_token = credentials['access_token']
+            self._distinct_id = credentials['distinct_id']
+            self._expiration_date = credentials['expiration_date']
+            self._refresh_token = credentials['refresh_token']
+
+    def _save_credentials(self):
+        self._credential_store.save(self._device_uid, dict(zip(CREDENTIAL_KEYS, (self._access_token, self._distinct_id,
+                                                                                 self._expiration_date,
+                                                                                 self._refresh_token))))
+
+    def _has_valid_token(self, margin=0):
+        return self._access_token is not None and (self._expiration_date is None or
+                                                   self._expiration_date - margin > time.time())
+
+    def _authenticated_request(self, method, url, json=None, data=None, endpoint=None, stream=False, params=None):
+        """
+        Sends an authenticated request, subject to the rate limits and retries of the request policy. GET requests are
+        answered from the response cache, if any.
+
+        Args:
+            method: HTTP method.
+            url: URL relative to the base URL.
+            (optional) json: Object sent as JSON body.
+            (optional) data: Request body already encoded as JSON, instead of json.
+            (optional) endpoint: Name of the endpoint, used by the request policy. Defaults to url.
+            (optional) stream: If True, the body is not downloaded until it is read from the returned object.
+            (optional) params: Dictionary of query string parameters.
+
+        Returns:
+            Request object
+
+        Raises:
+            UnauthenticatedException: authenticate() has not been called.
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
         if self._access_token is None:
             raise UnauthenticatedException()
 
-        if self._expiration_date is not None and self._expiration_date < time.time():  # Our access token has expired
-            self.authenticate()
+        endpoint = endpoint or url
+        started = time.perf_counter() if self._hooks else None
+        attempts = [0]
+
+        def attempt():
+            retries = attempts[0]
+            attempts[0] += 1
+            return self._send_request(method, url, json, data, stream, params, endpoint, retries, started)
+
+        def send():
+            if self._policy is None:
+                return attempt()
+            return self._policy.execute(attempt, method, endpoint)
+
+        if self._cache is not None and method == 'GET' and not stream:
+            return self._cache.get((endpoint, self._device_uid, (self._lat, self._lng), url,
+                                    tuple(sorted(params.items())) if params else None), send)
 
-        req = requests.request(method=method, url=BASE_API_URL + url, headers=self._generate_headers(), json=json,
-                               data=data)
+        return send()
+
+    def _send_request(self, method, url, json, data, stream=False, params=None, endpoint=None, retries=0,
+                      started=None):
+        if self._expiration_date is not None and self._expiration_date < time.time():  # Our access token has expired
+            self._renew_token()
+
+        hooks = self._hooks
+        if hooks:
+            sent = time.perf_counter()
+            wait = sent - started if started is not None else 0.0
+            dispatch_event(hooks, RequestEvent(REQUEST_START, self._device_uid, method, endpoint or url,
+                                               retries=retries, timings={'wait': wait}))
+
+        if json is not None:
+            data = self._codec.dumps(json)
+
+        try:
+            req = self._session.request(method=method, url=self._base_url + url,
+                                        headers=self._request_headers if data is None else self._json_headers,
+                                        data=data, stream=stream, params=params)
+        except requests.exceptions.RequestException as e:
+            if hooks:
+                self._dispatch_response(ERROR, method, endpoint or url, retries, wait, sent, None, stream, e)
+            raise
 
         if req.status_code == requests.codes.ok or req.status_code == requests.codes.no_content:
+            if hooks:
+                self._dispatch_response(RESPONSE, method, endpoint or url, retries, wait, sent, req, stream)
             return req
 
         else:
-            raise UnexpectedResponseCodeException("Server responded with {}".format(req.status_code))
+            if stream:
+                req.content  # Reads the (short) error body, releasing the connection
+            error = UnexpectedResponseCodeException("Server responded with {}".format(req.status_code),
+                                                    req.status_code, req)
+            if hooks:
+                self._dispatch_response(ERROR, method, endpoint or url, retries, wait, sent, req, False, error)
+            raise error
+
+    def _dispatch_response(self, kind, method, endpoint, retries, wait, sent, req, stream, error=None):
+        """
+        Reports the outcome of a request to the hooks. The body of streamed responses has not been read yet, so their
+        download time is not known, and their size only if the server sent a Content-Length.
+        """
+        elapsed = time.perf_counter() - sent
+        if req is None:
+            timings = {'wait': wait, 'server': elapsed, 'download': 0.0, 'total': wait + elapsed}
+            event = RequestEvent(kind, self._device_uid, method, endpoint, retries=retries, timings=timings,
+                                 error=error)
+        else:
+            server = min(req.elapsed.total_seconds(), elapsed)
+            timings = {'wait': wait, 'server': server, 'download': elapsed - server, 'total': wait + elapsed}
+            body = req.request.body
+            if stream:
+                length = req.headers.get('Content-Length')
+                bytes_in = int(length) if length is not None else None
+            else:
+                bytes_in = len(req.content)
+            event = RequestEvent(kind, self._device_uid, method, endpoint, req.status_code, len(body) if body else 0,
+                                 bytes_in, retries, timings, error)
+        dispatch_event(self._hooks, event)
+
+    def _dispatch_reauth(self, endpoint, sent, req=None, error=None):
+        elapsed = time.perf_counter() - sent
+        body = req.request.body if req is not None else None
+        dispatch_event(self._hooks, RequestEvent(REAUTH, self._device_uid, 'POST', endpoint,
+                                                 req.status_code if req is not None else None,
+                                                 len(body) if body else 0,
+                                                 len(req.content) if req is not None else None,
+                                                 timings={'total': elapsed}, error=error))
+
+    def _decode(self, req, endpoint):
+        """
+        Decodes the JSON body of a response with the codec, timing it if any hooks are registered. The result is kept on
+        the response, so that responses served from the cache are decoded only once, and must not be modified.
+        """
+        try:
+            return req.pydel_decoded
+        except AttributeError:
+            pass
+
+        if not self._hooks:
+            decoded = req.pydel_decoded = self._codec.loads(req.content)
+            return decoded
+
+        start = time.perf_counter()
+        decoded = req.pydel_decoded = self._codec.loads(req.content)
+        dispatch_event(self._hooks, RequestEvent(DECODE, self._device_uid, req.request.method, endpoint,
+                                                 req.status_code, bytes_in=len(req.content),
+                                                 timings={'decode': time.perf_counter() - start}))
+        return decoded
+
+    def _wait_for_writes(self):
+        remaining = self._writes_allowed_at - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def _write_request(self, method, url, json=None, endpoint=None, data=None):
+        """
+        Sends an authenticated request that the server refuses until some time after registration.
+        """
+        self._wait_for_writes()
+
+        if not self._adaptive_write_delay:
+            req = self._authenticated_request(method=method, url=url, json=json, data=data, endpoint=endpoint)
+            self._invalidate_cache()
+            return req
+
+        backoff = 0.5
+        while True:
+            try:
+                req = self._authenticated_request(method=method, url=url, json=json, data=data, endpoint=endpoint)
+            except UnexpectedResponseCodeException as e:
+                if (e.status_code not in TOO_EARLY_STATUS_CODES or
+                        time.time() + backoff > self._registered_at + MAX_WRITE_DELAY):
+                    raise
+
+                time.sleep(backoff)
+                backoff *= 2
+                continue
+
+            if backoff > 0.5:  # We had to wait, so remember how long it took before writes were allowed
+                self._write_delay = max(self._write_delay, time.time() - self._registered_at)
+            self._invalidate_cache()
+            return req
+
+    def _invalidate_cache(self):
+        # Our own writes change our feeds and karma; cached responses of other accounts are left to expire
+        if self._cache is not None:
+            self._cache.invalidate(account=self._device_uid)
+        # They also change the feeds shared at our position
+        if self._hub is not None:
+            self._hub.invalidate(location=(self._lat, self._lng))
 
     def _post_jodel(self, color, city, country_code, loc_accuracy, lat, lng, loc_name, message):
         """
@@ -67,20 +508,9 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return self._authenticated_request(method='POST', url='api/v2/posts',
-                                           json={
-                                               'color': color,
-                                               'location': {
-                                                   'city': city,
-                                                   'country': country_code,
-                                                   'loc_accuracy': loc_accuracy,
-                                                   'loc_coordinates': {
-                                                       'lat': lat,
-                                                       'lng': lng
-                                                   },
-                                                   'name': loc_name
-                                               },
-                                               'message': message})
+        return self._write_request(method='POST', url='api/v2/posts', endpoint='post',
+                                   data=self._encode_post(color, city, country_code, loc_accuracy, lat, lng, loc_name,
+                                                          message))
 
     def _reply_to_post_id(self, color, city, country_code, loc_accuracy, lat, lng, loc_name, message, post_id):
         """
@@ -104,24 +534,30 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return self._authenticated_request(method='POST', url='api/v2/posts',
-                                           json={
-                                               'ancestor': post_id,
-                                               'color': color,
-                                               'location': {
-                                                   'city': city,
-                                                   'country': country_code,
-                                                   'loc_accuracy': loc_accuracy,
-                                                   'loc_coordinates': {
-                                                       'lat': lat,
-                                                       'lng': lng
-                                                   },
-                                                   'name': loc_name
-                                               },
-                                               'message': message})
+        return self._write_request(method='POST', url='api/v2/posts', endpoint='reply',
+                                   data=self._encode_post(color, city, country_code, loc_accuracy, lat, lng, loc_name,
+                                                          message, post_id))
+
+    def _encode_post(self, color, city, country_code, loc_accuracy, lat, lng, loc_name, message, ancestor=None):
+        """
+        Encodes the body of a post or reply. The location block, except for the loc_accuracy randomized for every post,
+        is encoded once and reused for as long as the location stays the same.
+        """
+        dumps = self._codec.dumps
+        location = (city, country_code, lat, lng, loc_name)
+        fragments = self._location_fragments
+        if fragments is None or fragments[0] != location:
+            head = b'"location":{"city":' + dumps(city) + b',"country":' + dumps(country_code) + b',"loc_accuracy":'
+            tail = (b',"loc_coordinates":{"lat":' + dumps(lat) + b',"lng":' + dumps(lng) + b'},"name":' +
+                    dumps(loc_name) + b'}')
+            fragments = self._location_fragments = (location, head, tail)
+
+        start = b'{"ancestor":' + dumps(ancestor) + b',"color":' if ancestor is not None else b'{"color":'
+        return b''.join((start, dumps(color), b',', fragments[1], dumps(loc_accuracy), fragments[2], b',"message":',
+                         dumps(message), b'}'))
 
     def _delete_post_id(self, post_id):
-        return self._authenticated_request(method='DELETE', url="api/v2/posts/{}".format(post_id))
+        return self._write_request(method='DELETE', url="api/v2/posts/{}".format(post_id), endpoint='delete')
 
     def _vote_post_id(self, post_id, direction):
         """
@@ -138,50 +574,119 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return self._authenticated_request(method='PUT', url="api/v2/posts/{}/{}vote".format(post_id, direction))
+        req = self._write_request(method='PUT', url="api/v2/posts/{}/{}vote".format(post_id, direction),
+                                  endpoint='vote')
+        if self._hub is not None:
+            self._hub.learn_vote(self, post_id, direction)
+        return req
 
     def get_device_uid(self):
         return self._device_uid
 
-    def authenticate(self):
+    def authenticate(self, force=False):
         """
-        Authenticates with the Jodel server, then sleeps for 5 seconds.
-        
+        Authenticates with the Jodel server.
+
+        Credentials that are still valid (typically loaded from the credential store) are reused without contacting the
+        server, and expired ones are renewed with the refresh token. If neither works, the device is registered anew.
+        Writes are then held back for write_delay seconds, while reads can be sent immediately.
+
+        Args:
+            (optional) force: If True, always register anew.
+
         Returns:
             True on success.
 
         Raises:
             AuthenticationError on failure to authenticate (typically, the server not returning HTTP 200 or 204).
         """
-        req = requests.post(BASE_API_URL + 'api/v2/users',
-                            headers={'User-Agent': self._user_agent_string,
-                                     'Accept-Encoding': 'gzip',
-                                     'Content-Type': 'application/json; charset=UTF-8'},
-                            json={'client_id': '81e8a76e-1e02-4d17-9ba0-8a7020261b26',
-                                  'device_uid': self._device_uid,
-                                  'location': {
-                                      'city': self._city,
-                                      'country': self._country_code,
-                                      'loc_accuracy': utils.random_loc_accuracy(),
-                                      'loc_coordinates': {
-                                          'lat': self._lat,
-                                          'lng': self._lng
-                                      }
-                                  }}
-                            )
+        if force:
+            with self._auth_lock:
+                return self._register()
 
-        if req.status_code == requests.codes.ok:
-            self._access_token = req.json()['access_token']
-            self._distinct_id = req.json()['distinct_id']
-            self._expiration_date = req.json()['expiration_date']
-            self._refresh_token = req.json()['refresh_token']
+        return self._renew_token()
 
-            time.sleep(5)  # Workaround for certain actions being disabled for x seconds after authentication
+    def _register(self):
+        sent = time.perf_counter()
+        try:
+            req = self._post_register()
+        except requests.exceptions.RequestException as e:
+            if self._hooks:
+                self._dispatch_reauth('register', sent, error=e)
+            raise
+
+        if req.status_code == requests.codes.ok:
+            if self._hooks:
+                self._dispatch_reauth('register', sent, req)
+            auth = self._codec.loads(req.content)
+            self._access_token = auth['access_token']
+            self._distinct_id = auth['distinct_id']
+            self._expiration_date = auth['expiration_date']
+            self._refresh_token = auth['refresh_token']
+            self._update_headers()
+            self._save_credentials()
+
+            # Certain actions are disabled for a few seconds after registering, see _write_request
+            self._registered_at = time.time()
+            self._writes_allowed_at = self._registered_at + self._write_delay
 
             return True
 
         else:
-            raise AuthenticationError("Server returned {}".format(req.status_code))
+            error = AuthenticationError("Server returned {}".format(req.status_code))
+            if self._hooks:
+                self._dispatch_reauth('register', sent, req, error)
+            raise error
+
+    def _post_register(self):
+        return self._session.post(self._base_url + 'api/v2/users',
+                                  headers={'User-Agent': self._user_agent_string,
+                                           'Authorization': None,  # Drop any outdated token set on the session
+                                           'Accept-Encoding': 'gzip',
+                                           'Content-Type': JSON_CONTENT_TYPE},
+                                  data=self._codec.dumps(_registration_body(self._device_uid, self._city,
+                                                                            self._country_code, self._lat, self._lng)))
+
+    def refresh_access_token(self):
+        """
+        Replaces the current access token using the refresh token received when authenticating.
+
+        Returns:
+            True on success.
+
+        Raises:
+            UnauthenticatedException: We have never been authenticated, so there is no refresh token.
+            AuthenticationError on failure to refresh (typically, the server not returning HTTP 200).
+        """
+        with self._auth_lock:
+            if self._refresh_token is None:
+                raise UnauthenticatedException()
+
+            sent = time.perf_counter()
+            try:
+                req = self._session.post(self._base_url + 'api/v2/users/refreshToken', headers=self._json_headers,
+                                         data=self._codec.dumps(_refresh_body(self._distinct_id, self._refresh_token)))
+            except requests.exceptions.RequestException as e:
+                if self._hooks:
+                    self._dispatch_reauth('refresh', sent, error=e)
+                raise
+
+            if req.status_code == requests.codes.ok:
+                if self._hooks:
+                    self._dispatch_reauth('refresh', sent, req)
+                auth = self._codec.loads(req.content)
+                self._access_token = auth['access_token']
+                self._expiration_date = auth['expiration_date']
+                self._update_headers()
+                self._save_credentials()
+
+                return True
+
+            else:
+                error = AuthenticationError("Server returned {}".format(req.status_code))
+                if self._hooks:
+                    self._dispatch_reauth('refresh', sent, req, error)
+                raise error
 
     def get_karma(self):
         """
@@ -194,7 +699,154 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return int(self._authenticated_request(method='GET', url='/api/v2/users/karma').json()['karma'])
+        return int(self._decode(self._authenticated_request(method='GET', url='/api/v2/users/karma', endpoint='karma'),
+                                'karma')['karma'])
+
+    def get_feed(self, feed, lat=None, lng=None):
+        """
+        Returns the posts of a feed.
+
+        Args:
+            feed: Name of the feed, one of the keys of FEED_URLS ('home', 'mine', 'mine_replies', 'mine_votes',
+                'mine_popular', 'newest', 'popular' or 'discussed').
+            (optional) lat: Latitude to fetch a location feed for, instead of the current position.
+            (optional) lng: Longitude to fetch a location feed for, instead of the current position.
+
+        Returns:
+            list of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return generate_post_list(self._fetch_feed(feed, lat, lng), self, self._post_class)
+
+    def _fetch_feed(self, feed, lat=None, lng=None):
+        if self._hub is not None and feed in LOCATION_FEEDS:
+            return self._hub.fetch(self, feed, lat, lng)
+
+        params = {'lat': lat, 'lng': lng} if lat is not None and lng is not None else None
+        return self._learn(self._decode(self._authenticated_request(method='GET', url=FEED_URLS[feed], endpoint=feed,
+                                                                    params=params), feed)['posts'])
+
+    def _learn(self, posts):
+        # Lets the hub know which posts we voted on or wrote, so that it can tell when reading shared feeds
+        if self._hub is not None:
+            self._hub.learn(self, posts)
+        return posts
+
+    def get_feeds(self, feeds=LOCATION_FEEDS, max_workers=None):
+        """
+        Fetches several feeds concurrently. A post found in more than one feed is represented by the same Post object in
+        all of them.
+
+        Args:
+            (optional) feeds: Names of the feeds to fetch (see get_feed). Defaults to the feeds near the current position.
+            (optional) max_workers: Maximum number of simultaneous requests. Defaults to one per feed.
+
+        Returns:
+            Dictionary mapping each feed name to a list of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        feeds = list(feeds)
+        if not feeds:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(feeds)) as executor:
+            responses = list(executor.map(self._fetch_feed, feeds))
+
+        posts_by_id = {}
+        result = {}
+        for feed, json_data in zip(feeds, responses):
+            posts = []
+            for p in json_data:
+                post = posts_by_id.get(p.get('post_id'))
+                if post is None:
+                    post = self._post_class(p, self)
+                    posts_by_id[post.post_id] = post
+                posts.append(post)
+            result[feed] = posts
+
+        return result
+
+    def _get_page(self, feed, limit, after=None):
+        params = {'limit': limit}
+        if after is not None:
+            params['after'] = after
+        return self._decode(self._authenticated_request(method='GET', url=FEED_URLS[feed], endpoint=feed,
+                                                        params=params), feed)['posts']
+
+    def _get_post_details(self, post_id, skip=0):
+        """
+        Fetches a post and a page of its replies, oldest first, from the v3 details endpoint.
+
+        Returns:
+            Dictionary mapping 'details' to the post, 'replies' to the replies after the first skip ones, 'next' to the
+            skip of the next page (None after the last page) and 'remaining' to the number of replies after this page.
+        """
+        details = self._decode(self._authenticated_request(method='GET', url='api/v3/posts/{}/details'.format(post_id),
+                                                           endpoint='details',
+                                                           params={'details': 'true', 'reply': skip}), 'details')
+        self._learn([details['details']] + details.get('replies', []))
+        return details
+
+    def paginate(self, feed, page_size=DEFAULT_PAGE_SIZE, max_posts=None, max_age=None, max_pages=None, after=None,
+                 prefetch=True):
+        """
+        Returns a cursor iterating over a feed beyond its first page. The next page is fetched in the background while
+        the current one is consumed. See FeedCursor.
+
+        Args:
+            feed: Name of the feed (see get_feed).
+            (optional) page_size: Number of posts requested per page.
+            (optional) max_posts: Maximum number of posts to yield.
+            (optional) max_age: Maximum age of the posts to yield, in seconds.
+            (optional) max_pages: Maximum number of pages to fetch.
+            (optional) after: post_id to start after. Defaults to the start of the feed.
+            (optional) prefetch: Whether to fetch the next page while the current one is consumed.
+
+        Returns:
+            FeedCursor, an iterable of Post objects.
+        """
+        if feed not in FEED_URLS:
+            raise KeyError(feed)
+        return FeedCursor(self, feed, page_size, max_posts, max_age, max_pages, after, prefetch)
+
+    def iter_feed(self, feed, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Iterates over the posts of a feed as they are downloaded. Unlike get_feed, only one post is decoded at a time, so
+        memory use does not grow with the size of the feed.
+
+        The request is sent when iteration starts. The connection is kept until the iteration is finished or the
+        generator is closed. With a hub, location feeds are read through the hub like in get_feed instead, since it
+        keeps whole feeds anyway.
+
+        Args:
+            feed: Name of the feed (see get_feed).
+            (optional) chunk_size: Number of bytes read from the connection at a time.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        if self._hub is not None and feed in LOCATION_FEEDS:
+            for json_dict in self._fetch_feed(feed):
+                yield self._post_class(json_dict, self)
+            return
+
+        req = self._authenticated_request(method='GET', url=FEED_URLS[feed], endpoint=feed, stream=True)
+        try:
+            for json_dict in streaming.iter_json_array(req.iter_content(chunk_size), 'posts', req.encoding or 'utf-8'):
+                self._learn((json_dict,))
+                yield self._post_class(json_dict, self)
+        finally:
+            req.close()
 
     def get_home(self):
         """
@@ -207,7 +859,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(self._authenticated_request(method='GET', url='api/v2/posts/').json()['posts'], self)
+        return self.get_feed('home')
 
     def get_my_jodels(self):
         """
@@ -220,8 +872,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(self._authenticated_request(method='GET', url='api/v2/posts/mine/').json()['posts'],
-                                  self)
+        return self.get_feed('mine')
 
     def get_my_replies(self):
         """
@@ -234,8 +885,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(
-            self._authenticated_request(method='GET', url='api/v2/posts/mine/replies').json()['posts'], self)
+        return self.get_feed('mine_replies')
 
     def get_my_votes(self):
         """
@@ -248,8 +898,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(
-            self._authenticated_request(method='GET', url='api/v2/posts/mine/votes').json()['posts'], self)
+        return self.get_feed('mine_votes')
 
     def get_my_top_jodels(self):
         """
@@ -262,8 +911,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(
-            self._authenticated_request(method='GET', url='api/v2/posts/mine/popular').json()['posts'], self)
+        return self.get_feed('mine_popular')
 
     def get_newest_jodels(self):
         """
@@ -276,8 +924,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(
-            self._authenticated_request(method='GET', url='api/v2/posts/location/').json()['posts'], self)
+        return self.get_feed('newest')
 
     def get_top_jodels(self):
         """
@@ -290,8 +937,7 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(
-            self._authenticated_request(method='GET', url='api/v2/posts/location/popular').json()['posts'], self)
+        return self.get_feed('popular')
 
     def get_most_discussed_jodels(self):
         """
@@ -304,8 +950,111 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(
-            self._authenticated_request(method='GET', url='api/v2/posts/location/discussed').json()['posts'], self)
+        return self.get_feed('discussed')
+
+    def iter_home(self):
+        """
+        Iterates over the newest posts near the current position. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('home')
+
+    def iter_my_jodels(self):
+        """
+        Iterates over the posts of the currently logged in user. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('mine')
+
+    def iter_my_replies(self):
+        """
+        Iterates over the replies of the currently logged in user. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('mine_replies')
+
+    def iter_my_votes(self):
+        """
+        Iterates over the posts the currently logged in user has voted on. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('mine_votes')
+
+    def iter_my_top_jodels(self):
+        """
+        Iterates over the highest voted posts of the currently logged in user. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('mine_popular')
+
+    def iter_newest_jodels(self):
+        """
+        Iterates over the newest posts near the current position. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('newest')
+
+    def iter_top_jodels(self):
+        """
+        Iterates over the highest voted posts near the current position. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('popular')
+
+    def iter_most_discussed_jodels(self):
+        """
+        Iterates over the most commented posts near the current position. See iter_feed.
+
+        Returns:
+            Generator of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        return self.iter_feed('discussed')
 
     def post_jodel(self, color, message):
         """
@@ -322,9 +1071,10 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(self._post_jodel(color=color, city=self._city, country_code=self._country_code,
-                                                   loc_accuracy=utils.random_loc_accuracy(), lat=self._lat, lng=self._lng,
-                                                   loc_name=self._loc_name, message=message).json(), self)
+        req = self._post_jodel(color=color, city=self._city, country_code=self._country_code,
+                               loc_accuracy=utils.random_loc_accuracy(), lat=self._lat, lng=self._lng,
+                               loc_name=self._loc_name, message=message)
+        return generate_post_list(self._learn(self._decode(req, 'post')), self, self._post_class)
 
     def reply_to_jodel(self, message, jodel):
         """
@@ -341,11 +1091,10 @@ class Pydel:
             AuthenticationError: An attempt to replace an outdated auth token failed.
             UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
         """
-        return generate_post_list(self._reply_to_post_id(color=jodel.color, city=self._city, country_code=self._country_code,
-                                                         loc_accuracy=utils.random_loc_accuracy(), lat=self._lat,
-                                                         lng=self._lng,
-                                                         loc_name=self._loc_name, message=message,
-                                                         post_id=jodel.post_id).json(), self)
+        req = self._reply_to_post_id(color=jodel.color, city=self._city, country_code=self._country_code,
+                                     loc_accuracy=utils.random_loc_accuracy(), lat=self._lat, lng=self._lng,
+                                     loc_name=self._loc_name, message=message, post_id=jodel.post_id)
+        return generate_post_list(self._learn(self._decode(req, 'reply')), self, self._post_class)
 
     def delete_post(self, post):
         """
@@ -366,7 +1115,7 @@ class Pydel:
 
     def upvote_post(self, post):
         """
-        Upvotes a post.
+        Upvotes a post, and records the vote in its voted attribute.
 
         Args:
             post: Post object to upvote.
@@ -383,11 +1132,12 @@ class Pydel:
 
         else:
             self._vote_post_id(post.post_id, 'up')
+            post._record_vote('up')
             return True
 
     def downvote_post(self, post):
         """
-        Downvotes a post.
+        Downvotes a post, and records the vote in its voted attribute.
 
         Args:
             post: Post object to downvote.
@@ -404,45 +1154,19 @@ class Pydel:
 
         else:
             self._vote_post_id(post.post_id, 'down')
+            post._record_vote('down')
             return True
 
 
-class Post:
+class _PostActions(object):
     """
-    A Jodel post.
-
-    In addition to the explicitly declared attributes, Post instances will also return data for any key found in the json
-    data used for instantiation.
-
-    Attributes:
-        voted (str): "up"/"down" if the user fetching the post has voted on the post. None if the user has not voted.
-        has_replies (bool): True if the post has replies, False if it does not.
-        reply_from_op (bool): True if the post was made by someone replying to their own thread.
-        replies (list): List of Post objects representing the replies to this post. Empty list if there are no replies.
-        reply_count (int): The number of replies to this post.
-        created_at (datetime): Time the post was created.
-        updated_at (datetime): Time the post was last updated (seems to always be the same as created_at).
-        own_post (boolean): True if the post was written by the user who fetched it, False if it was not.
-        location (dict): Dictionary mapping 'lat', 'lng' and 'name' to latitude, longitude and name.
-        message (str): The contents of the post. Empty string it no message is found.
-        color (str): Six character hex describing the color of the post. FFFFFF if no color is found.
-        post_id (str): Alphanumeric string identifying the post.
+    Actions shared by all post types, carried out by the Pydel instance the post was fetched with.
     """
-    def __init__(self, json_dict, pydel_instance=None):
-        """
-        Instantiates a Post object.
+    __slots__ = ()
 
-        Args:
-             json_dict: Dictionary describing a Jodel post.
-             (optional) pydel_instance: A Pydel instance used for voting/replying/deleting.
-
-        Raises:
-            InvalidPostException: json_dict does not describe a valid Jodel (typically, it does map post_id)
-        """
-        if 'post_id' not in json_dict:
-            raise InvalidPostException('Post data did not contain post_id', json_dict)
-        self._json_dict = json_dict
-        self._pydel_instance = pydel_instance
+    def _record_vote(self, direction):
+        # Called after a vote was sent, so that voted reflects it; post classes keeping voted elsewhere override this
+        pass
 
     def upvote(self):
         """
@@ -521,6 +1245,48 @@ class Post:
         else:
             return self._pydel_instance.delete_post(self)
 
+
+class Post(_PostActions):
+    """
+    A Jodel post.
+
+    In addition to the explicitly declared attributes, Post instances will also return data for any key found in the json
+    data used for instantiation.
+
+    Attributes:
+        voted (str): "up"/"down" if the user fetching the post has voted on the post. None if the user has not voted.
+        has_replies (bool): True if the post has replies, False if it does not.
+        reply_from_op (bool): True if the post was made by someone replying to their own thread.
+        replies (list): List of Post objects representing the replies to this post. Empty list if there are no replies.
+        reply_count (int): The number of replies to this post.
+        created_at (datetime): Time the post was created.
+        updated_at (datetime): Time the post was last updated (seems to always be the same as created_at).
+        own_post (boolean): True if the post was written by the user who fetched it, False if it was not.
+        location (dict): Dictionary mapping 'lat', 'lng' and 'name' to latitude, longitude and name.
+        message (str): The contents of the post. Empty string it no message is found.
+        color (str): Six character hex describing the color of the post. FFFFFF if no color is found.
+        post_id (str): Alphanumeric string identifying the post.
+    """
+    def __init__(self, json_dict, pydel_instance=None):
+        """
+        Instantiates a Post object.
+
+        Args:
+             json_dict: Dictionary describing a Jodel post.
+             (optional) pydel_instance: A Pydel instance used for voting/replying/deleting.
+
+        Raises:
+            InvalidPostException: json_dict does not describe a valid Jodel (typically, it does map post_id)
+        """
+        if 'post_id' not in json_dict:
+            raise InvalidPostException('Post data did not contain post_id', json_dict)
+        self._json_dict = json_dict
+        self._pydel_instance = pydel_instance
+
+    def _record_vote(self, direction):
+        # A copy, since the json data may be shared with cached responses and other accounts' posts
+        self._json_dict = dict(self._json_dict, voted=direction)
+
     @property
     def voted(self):
         if 'voted' in self._json_dict:
@@ -542,7 +1308,7 @@ class Post:
     @property
     def replies(self):
         if self.has_replies:
-            return generate_post_list(self._json_dict['children'], self.pydel_instance)
+            return generate_post_list(self._json_dict['children'], self._pydel_instance, self.__class__)
         else:
             return []
 
@@ -600,5 +1366,200 @@ class Post:
             raise AttributeError
 
 
-def generate_post_list(json_data, pydel_instance):
-    return [Post(p, pydel_instance) for p in json_data]
+def _location_extra(location):
+    # The keys of a location besides its name and coordinates (loc_accuracy), as a tuple of items shared by all posts
+    # with the same ones, since the values repeat a lot
+    extra = tuple(item for item in location.items() if item[0] not in ('name', 'loc_coordinates'))
+    try:
+        shared = _LOCATION_EXTRAS.get(extra)
+    except TypeError:  # Unhashable values
+        return extra
+    if shared is None:
+        shared = extra
+        if len(_LOCATION_EXTRAS) < MAX_LOCATION_EXTRAS:
+            _LOCATION_EXTRAS[extra] = extra
+    return shared
+
+
+class CompactPost(_PostActions):
+    """
+    A Jodel post decoded into a compact, slotted object.
+
+    CompactPost offers the same attributes and methods as Post, but decodes the json data once at instantiation instead
+    of keeping it around and decoding it on every access. Timestamps are parsed on first access and cached, replies are
+    decoded into CompactPost objects up front, and keys without a dedicated attribute are kept in a small overflow
+    dictionary. This makes CompactPost the better choice when many posts are kept in memory or accessed repeatedly.
+
+    Unlike Post, missing vote_count, child_count, post_own, parent_creator, children, location and timestamp keys do not
+    raise errors, but give 0, 0, None, None, [], None and None respectively, and replies is a tuple.
+
+    Attributes (in addition to those of Post):
+        vote_count (int): The vote count of this post.
+        lat (float): Latitude of the post, or None.
+        lng (float): Longitude of the post, or None.
+        location_name (str): Name of the location of the post, or None.
+    """
+    __slots__ = ('post_id', 'message', 'color', 'vote_count', 'reply_count', 'voted', 'post_own', 'parent_creator',
+                 'replies', 'lat', 'lng', 'location_name', '_created_at', '_updated_at', '_created', '_updated',
+                 '_location_extra', '_location', '_extra', '_pydel_instance')
+
+    _known_keys = frozenset(('post_id', 'message', 'color', 'vote_count', 'child_count', 'voted', 'post_own',
+                             'parent_creator', 'children', 'location', 'created_at', 'updated_at'))
+
+    def __init__(self, json_dict, pydel_instance=None):
+        """
+        Instantiates a CompactPost object.
+
+        Args:
+             json_dict: Dictionary describing a Jodel post.
+             (optional) pydel_instance: A Pydel instance used for voting/replying/deleting.
+
+        Raises:
+            InvalidPostException: json_dict does not describe a valid Jodel (typically, it does map post_id)
+        """
+        if 'post_id' not in json_dict:
+            raise InvalidPostException('Post data did not contain post_id', json_dict)
+
+        get = json_dict.get
+        self.post_id = json_dict['post_id']
+        self.message = get('message', '')
+        self.color = sys.intern(get('color', 'FFFFFF'))  # Only a handful of distinct values, so share them
+        self.vote_count = get('vote_count', 0)
+        self.reply_count = get('child_count', 0)
+        self.voted = get('voted')
+        post_own = get('post_own')
+        self.post_own = sys.intern(post_own) if post_own is not None else None
+        self.parent_creator = get('parent_creator')
+
+        children = get('children')
+        if self.reply_count and children:
+            self.replies = tuple(CompactPost(c, pydel_instance) for c in children)
+        else:
+            self.replies = ()
+
+        location = get('location')
+        location_extra = None
+        if location is not None:
+            coordinates = location.get('loc_coordinates') or {}
+            self.lat = coordinates.get('lat')
+            self.lng = coordinates.get('lng')
+            name = location.get('name')
+            self.location_name = sys.intern(name) if name is not None else None
+            if len(location) > 2:
+                location_extra = _location_extra(location)
+        else:
+            self.lat = self.lng = self.location_name = None
+        self._location_extra = location_extra
+        self._location = None
+
+        self._created_at = get('created_at')  # Raw strings, parsed on first access
+        self._updated_at = get('updated_at')
+        self._created = self._updated = None
+
+        extra = None
+        for key in json_dict:
+            if key not in self._known_keys:
+                if extra is None:
+                    extra = {}
+                extra[key] = json_dict[key]
+        self._extra = extra
+        self._pydel_instance = pydel_instance
+
+    def _record_vote(self, direction):
+        self.voted = direction
+
+    @property
+    def has_replies(self):
+        return self.reply_count != 0
+
+    @property
+    def child_count(self):
+        return self.reply_count
+
+    @property
+    def own_post(self):
+        return self.post_own == 'own'
+
+    @property
+    def reply_from_op(self):
+        return self.parent_creator == 1
+
+    @property
+    def children(self):
+        return [_post_to_json(reply) for reply in self.replies]
+
+    @property
+    def created_at(self):
+        if self._created is None and self._created_at is not None:
+            self._created = utils.iso8601_to_datetime(self._created_at)
+        return self._created
+
+    @property
+    def updated_at(self):
+        if self._updated is None and self._updated_at is not None:
+            self._updated = utils.iso8601_to_datetime(self._updated_at)
+        return self._updated
+
+    @property
+    def location(self):
+        if self._location is None and self.location_name is not None:
+            self._location = {
+                'lat': self.lat,
+                'lng': self.lng,
+                'name': self.location_name
+            }
+        return self._location
+
+    def __getattr__(self, key):
+        if key == '_extra':  # Not set yet, for instance while unpickling
+            raise AttributeError(key)
+
+        extra = self._extra
+        if extra is not None and key in extra:
+            return extra[key]
+        else:
+            raise AttributeError(key)
+
+
+def _registration_body(device_uid, city, country_code, lat, lng):
+    # Shared with AsyncPydel, like the other request bodies
+    return {'client_id': CLIENT_ID,
+            'device_uid': device_uid,
+            'location': {
+                'city': city,
+                'country': country_code,
+                'loc_accuracy': utils.random_loc_accuracy(),
+                'loc_coordinates': {
+                    'lat': lat,
+                    'lng': lng
+                }
+            }}
+
+
+def _refresh_body(distinct_id, refresh_token):
+    return {'client_id': CLIENT_ID, 'distinct_id': distinct_id, 'refresh_token': refresh_token}
+
+
+def generate_post_list(json_data, pydel_instance, post_class=Post):
+    return [post_class(p, pydel_instance) for p in json_data]
+
+
+def _post_to_json(post):
+    json_dict = getattr(post, '_json_dict', None)
+    if json_dict is not None:
+        return json_dict
+
+    # A CompactPost: every key it was built from, with the values it holds now (such as voted after a vote)
+    json_dict = dict(post._extra) if post._extra else {}
+    json_dict.update(post_id=post.post_id, message=post.message, color=post.color, vote_count=post.vote_count,
+                     child_count=post.reply_count)
+    for key, value in (('voted', post.voted), ('post_own', post.post_own), ('parent_creator', post.parent_creator),
+                       ('created_at', post._created_at), ('updated_at', post._updated_at)):
+        if value is not None:
+            json_dict[key] = value
+    if post.location_name is not None or post._location_extra is not None:
+        json_dict['location'] = dict(post._location_extra or (), name=post.location_name,
+                                     loc_coordinates={'lat': post.lat, 'lng': post.lng})
+    if post.replies:
+        json_dict['children'] = post.children
+    return json_dict
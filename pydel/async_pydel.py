@@ -0,0 +1,425 @@
+import asyncio
+import time
+
+import aiohttp
+
+from . import (BASE_API_URL, DEFAULT_POOL_MAXSIZE, DEFAULT_USER_AGENT_STRING, DEFAULT_WRITE_DELAY, FEED_URLS,
+               JSON_CONTENT_TYPE, LOCATION_FEEDS, Post, Pydel, _refresh_body, _registration_body, generate_post_list)
+from .pydel_exceptions import (AuthenticationError, UnexpectedResponseCodeException, NoPydelInstanceException,
+                               UnauthorizedDeletionException, UnauthenticatedException)
+from . import utils
+from .codec import get_codec
+
+
+class AsyncPydel:
+    """
+    asyncio counterpart of Pydel. The methods of Pydel fetching feeds (get_feed, get_feeds, get_home and the like),
+    sending posts, replies, votes and deletions, and authenticating (authenticate, refresh_access_token) are available
+    as coroutines with the same arguments and return values, and the returned posts are AsyncPost instances. The
+    streaming (iter_*) and pagination (paginate) methods are not, nor are request policies, response caching, hooks,
+    feed hubs and credential stores.
+
+    Like Pydel, an expired access token is renewed with the refresh token, and the device is only registered anew if
+    that fails. Request bodies are built by the same code as Pydel's.
+
+    Requires aiohttp. Instances must be used from a single event loop; call close() (or use the instance as an async
+    context manager) when done.
+    """
+    def __init__(self, device_uid, city, country_code, lat, lng, loc_name, user_agent_string=DEFAULT_USER_AGENT_STRING,
+                 session=None, limit=100, limit_per_host=DEFAULT_POOL_MAXSIZE, keepalive_timeout=15,
+                 write_delay=DEFAULT_WRITE_DELAY, base_url=None, codec=None):
+        """
+        Instantiates an AsyncPydel object.
+
+        Args:
+            device_uid: 64 character device UID identifying the user.
+            city: City name
+            country_code: 2 or 3 capital letter country code
+            lat: Latitude of the current position
+            lng: Longitude of the current position
+            loc_name: Human-friendly name of the current position
+            (optional) user_agent_string: User agent string sent with every request.
+            (optional) session: aiohttp.ClientSession to send requests through, for instance one shared by several
+                AsyncPydel instances. The remaining arguments are ignored if a session is given.
+            (optional) limit: Maximum number of simultaneous connections.
+            (optional) limit_per_host: Maximum number of simultaneous connections to a single host.
+            (optional) keepalive_timeout: Seconds to keep idle connections open.
+            (optional) write_delay: See Pydel.
+            (optional) base_url: See Pydel.
+            (optional) codec: See Pydel. Only used to decode responses.
+        """
+        self._device_uid = device_uid
+        self._city = city
+        self._country_code = country_code
+        self._lat = lat
+        self._lng = lng
+        self._loc_name = loc_name
+        self._user_agent_string = user_agent_string
+        self._base_url = base_url if base_url is not None else BASE_API_URL
+        self._codec = get_codec(codec)
+        self._location_fragments = None  # See Pydel._encode_post
+
+        self._access_token = None
+        self._distinct_id = None
+        self._expiration_date = None
+        self._refresh_token = None
+        self._update_headers()
+        self._auth_lock = None
+        self._write_delay = write_delay
+        self._writes_allowed_at = 0
+
+        self._session = session
+        self._owns_session = session is None
+        self._limit = limit
+        self._limit_per_host = limit_per_host
+        self._keepalive_timeout = keepalive_timeout
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes the connections of this instance. Shared sessions passed to the constructor are left open.
+        """
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # aiohttp sessions should be created from within the event loop, so we do it on first use
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self._limit, limit_per_host=self._limit_per_host,
+                                             keepalive_timeout=self._keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _get_auth_lock(self):
+        # Before Python 3.10, locks are bound to the event loop current when they are created, so we do it on first use
+        # as well
+        if self._auth_lock is None:
+            self._auth_lock = asyncio.Lock()
+        return self._auth_lock
+
+    def _generate_headers(self):
+        return {'User-Agent': self._user_agent_string,
+                'Authorization': "Bearer {}".format(self._access_token),
+                'Accept-Encoding': 'gzip'
+                }
+
+    def _update_headers(self):
+        self._headers = self._generate_headers()
+        self._json_headers = dict(self._headers, **{'Content-Type': JSON_CONTENT_TYPE})
+
+    def _has_valid_token(self):
+        return self._access_token is not None and (self._expiration_date is None or
+                                                   self._expiration_date > time.time())
+
+    async def _authenticated_request(self, method, url, data=None, params=None):
+        """
+        Sends an authenticated request.
+
+        Returns:
+            The decoded JSON response body, or None if the response has no body.
+
+        Raises:
+            UnauthenticatedException: authenticate() has not been called.
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        if self._access_token is None:
+            raise UnauthenticatedException()
+
+        if self._expiration_date is not None and self._expiration_date < time.time():  # Our access token has expired
+            await self._renew_token()
+
+        async with self._get_session().request(method=method, url=self._base_url + url, params=params, data=data,
+                                               headers=self._headers if data is None else self._json_headers) as resp:
+            if resp.status == 200:
+                return self._codec.loads(await resp.read())
+
+            elif resp.status == 204:
+                return None
+
+            else:
+                await resp.read()  # Reads the (short) error body before the connection is released
+                raise UnexpectedResponseCodeException("Server responded with {}".format(resp.status), resp.status,
+                                                      resp)
+
+    async def _write_request(self, method, url, data=None):
+        remaining = self._writes_allowed_at - time.time()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+        return await self._authenticated_request(method=method, url=url, data=data)
+
+    _encode_post = Pydel._encode_post
+
+    def _post_jodel(self, color, city, country_code, loc_accuracy, lat, lng, loc_name, message):
+        return self._write_request(method='POST', url='api/v2/posts',
+                                   data=self._encode_post(color, city, country_code, loc_accuracy, lat, lng, loc_name,
+                                                          message))
+
+    def _reply_to_post_id(self, color, city, country_code, loc_accuracy, lat, lng, loc_name, message, post_id):
+        return self._write_request(method='POST', url='api/v2/posts',
+                                   data=self._encode_post(color, city, country_code, loc_accuracy, lat, lng, loc_name,
+                                                          message, ancestor=post_id))
+
+    def _delete_post_id(self, post_id):
+        return self._write_request(method='DELETE', url="api/v2/posts/{}".format(post_id))
+
+    def _vote_post_id(self, post_id, direction):
+        return self._write_request(method='PUT', url="api/v2/posts/{}/{}vote".format(post_id, direction))
+
+    async def _get_posts(self, url):
+        return generate_post_list((await self._authenticated_request(method='GET', url=url))['posts'], self, AsyncPost)
+
+    def get_device_uid(self):
+        return self._device_uid
+
+    async def authenticate(self, force=False):
+        """
+        Authenticates with the Jodel server. See Pydel.authenticate. Writes held back after registering wait without
+        blocking the event loop.
+        """
+        if force:
+            async with self._get_auth_lock():
+                return await self._register()
+
+        return await self._renew_token()
+
+    async def _renew_token(self):
+        # Only one task renews the token at a time, and tasks that had to wait find it already renewed
+        async with self._get_auth_lock():
+            if self._has_valid_token():
+                return True
+
+            if self._refresh_token is not None:
+                try:
+                    return await self._refresh()
+                except AuthenticationError:
+                    pass  # Fall back to registering
+
+            return await self._register()
+
+    async def _register(self):
+        async with self._get_session().post(self._base_url + 'api/v2/users',
+                                            headers={'User-Agent': self._user_agent_string,
+                                                     'Accept-Encoding': 'gzip',
+                                                     'Content-Type': JSON_CONTENT_TYPE},
+                                            data=self._codec.dumps(_registration_body(self._device_uid, self._city,
+                                                                                      self._country_code, self._lat,
+                                                                                      self._lng))) as resp:
+            if resp.status != 200:
+                raise AuthenticationError("Server returned {}".format(resp.status))
+
+            auth = self._codec.loads(await resp.read())
+
+        self._access_token = auth['access_token']
+        self._distinct_id = auth['distinct_id']
+        self._expiration_date = auth['expiration_date']
+        self._refresh_token = auth['refresh_token']
+        self._update_headers()
+
+        # Certain actions are disabled for a few seconds after registering, see _write_request
+        self._writes_allowed_at = time.time() + self._write_delay
+
+        return True
+
+    async def refresh_access_token(self):
+        """
+        Replaces the current access token using the refresh token. See Pydel.refresh_access_token.
+        """
+        async with self._get_auth_lock():
+            return await self._refresh()
+
+    async def _refresh(self):
+        if self._refresh_token is None:
+            raise UnauthenticatedException()
+
+        async with self._get_session().post(self._base_url + 'api/v2/users/refreshToken', headers=self._json_headers,
+                                            data=self._codec.dumps(_refresh_body(self._distinct_id,
+                                                                                 self._refresh_token))) as resp:
+            if resp.status != 200:
+                raise AuthenticationError("Server returned {}".format(resp.status))
+
+            auth = self._codec.loads(await resp.read())
+
+        self._access_token = auth['access_token']
+        self._expiration_date = auth['expiration_date']
+        self._update_headers()
+
+        return True
+
+    async def get_karma(self):
+        """
+        Returns karma for the currently logged in user. See Pydel.get_karma.
+        """
+        return int((await self._authenticated_request(method='GET', url='/api/v2/users/karma'))['karma'])
+
+    async def get_feed(self, feed, lat=None, lng=None):
+        """
+        Returns the posts of a feed. See Pydel.get_feed.
+        """
+        return generate_post_list(await self._fetch_feed(feed, lat, lng), self, AsyncPost)
+
+    async def _fetch_feed(self, feed, lat=None, lng=None):
+        params = {'lat': lat, 'lng': lng} if lat is not None and lng is not None else None
+        return (await self._authenticated_request(method='GET', url=FEED_URLS[feed], params=params))['posts']
+
+    async def get_feeds(self, feeds=LOCATION_FEEDS):
+        """
+        Fetches several feeds concurrently. A post found in more than one feed is represented by the same AsyncPost
+        object in all of them. See Pydel.get_feeds.
+        """
+        feeds = list(feeds)
+        responses = await asyncio.gather(*[self._fetch_feed(feed) for feed in feeds])
+
+        posts_by_id = {}
+        result = {}
+        for feed, json_data in zip(feeds, responses):
+            posts = []
+            for p in json_data:
+                post = posts_by_id.get(p.get('post_id'))
+                if post is None:
+                    post = posts_by_id[p['post_id']] = AsyncPost(p, self)
+                posts.append(post)
+            result[feed] = posts
+
+        return result
+
+    async def get_home(self):
+        """
+        Returns newest post near the current position. See Pydel.get_home.
+        """
+        return await self._get_posts(FEED_URLS['home'])
+
+    async def get_my_jodels(self):
+        """
+        Returns the posts of the currently logged in user. See Pydel.get_my_jodels.
+        """
+        return await self._get_posts(FEED_URLS['mine'])
+
+    async def get_my_replies(self):
+        """
+        Returns the replies of the currently logged in user. See Pydel.get_my_replies.
+        """
+        return await self._get_posts(FEED_URLS['mine_replies'])
+
+    async def get_my_votes(self):
+        """
+        Returns posts the currently logged in user has voted on. See Pydel.get_my_votes.
+        """
+        return await self._get_posts(FEED_URLS['mine_votes'])
+
+    async def get_my_top_jodels(self):
+        """
+        Returns the highest voted posts of the currently logged in user. See Pydel.get_my_top_jodels.
+        """
+        return await self._get_posts(FEED_URLS['mine_popular'])
+
+    async def get_newest_jodels(self):
+        """
+        Returns newest posts near the current position. See Pydel.get_newest_jodels.
+        """
+        return await self._get_posts(FEED_URLS['newest'])
+
+    async def get_top_jodels(self):
+        """
+        Returns highest voted posts near the current position. See Pydel.get_top_jodels.
+        """
+        return await self._get_posts(FEED_URLS['popular'])
+
+    async def get_most_discussed_jodels(self):
+        """
+        Returns most commented posts near the current position. See Pydel.get_most_discussed_jodels.
+        """
+        return await self._get_posts(FEED_URLS['discussed'])
+
+    async def post_jodel(self, color, message):
+        """
+        Posts a new Jodel, using current position and a randomized location accuracy. See Pydel.post_jodel.
+        """
+        return generate_post_list(await self._post_jodel(color=color, city=self._city, country_code=self._country_code,
+                                                         loc_accuracy=utils.random_loc_accuracy(), lat=self._lat,
+                                                         lng=self._lng, loc_name=self._loc_name, message=message),
+                                  self, AsyncPost)
+
+    async def reply_to_jodel(self, message, jodel):
+        """
+        Posts a reply, using current position and a randomized location accuracy. See Pydel.reply_to_jodel.
+        """
+        return generate_post_list(await self._reply_to_post_id(color=jodel.color, city=self._city,
+                                                               country_code=self._country_code,
+                                                               loc_accuracy=utils.random_loc_accuracy(), lat=self._lat,
+                                                               lng=self._lng, loc_name=self._loc_name, message=message,
+                                                               post_id=jodel.post_id),
+                                  self, AsyncPost)
+
+    async def delete_post(self, post):
+        """
+        Deletes a post. See Pydel.delete_post.
+        """
+        await self._delete_post_id(post.post_id)
+        return True
+
+    async def upvote_post(self, post):
+        """
+        Upvotes a post. See Pydel.upvote_post.
+        """
+        if post.voted is not None:
+            return False
+
+        else:
+            await self._vote_post_id(post.post_id, 'up')
+            post._record_vote('up')
+            return True
+
+    async def downvote_post(self, post):
+        """
+        Downvotes a post. See Pydel.downvote_post.
+        """
+        if post.voted is not None:
+            return False
+
+        else:
+            await self._vote_post_id(post.post_id, 'down')
+            post._record_vote('down')
+            return True
+
+
+class AsyncPost(Post):
+    """
+    A Jodel post fetched by an AsyncPydel instance. Identical to Post, except that upvote(), downvote(), reply() and
+    delete() are coroutines.
+    """
+    async def upvote(self):
+        if self._pydel_instance is not None:
+            return await self._pydel_instance.upvote_post(self)
+        else:
+            raise NoPydelInstanceException()
+
+    async def downvote(self):
+        if self._pydel_instance is not None:
+            return await self._pydel_instance.downvote_post(self)
+        else:
+            raise NoPydelInstanceException()
+
+    async def reply(self, message):
+        if self._pydel_instance is not None:
+            return await self._pydel_instance.reply_to_jodel(message, self)
+
+        else:
+            raise NoPydelInstanceException()
+
+    async def delete(self):
+        if not self.own_post:
+            raise UnauthorizedDeletionException(self.post_id)
+
+        elif self._pydel_instance is None:
+            raise NoPydelInstanceException
+
+        else:
+            return await self._pydel_instance.delete_post(self)
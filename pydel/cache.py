@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+DEFAULT_TTL = 10
+DEFAULT_MAX_ENTRIES = 1000
+
+
+class ResponseCache:
+    """
+    Time- and size-bounded cache of responses to GET requests, shared by any number of Pydel instances.
+
+    Entries are keyed by endpoint, account, location, URL and query parameters, and expire ttl seconds after they were
+    fetched (endpoint_ttls overrides the TTL of individual endpoints; a TTL of 0 disables caching for an endpoint). When
+    the cache holds max_entries entries, the least recently used one is evicted.
+
+    Concurrent misses for the same key are coalesced: one thread fetches the response, and the others wait for it.
+
+    A Pydel instance invalidates the entries of its account after each of its own writes.
+    """
+    def __init__(self, ttl=DEFAULT_TTL, endpoint_ttls=None, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            (optional) ttl: Seconds a response is reused for.
+            (optional) endpoint_ttls: Dictionary mapping endpoint names (such as 'karma' or 'popular') to their TTL.
+            (optional) max_entries: Maximum number of cached responses.
+        """
+        self.ttl = ttl
+        self.endpoint_ttls = dict(endpoint_ttls or {})
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()  # key -> (expires_at, response), least recently used first
+        self._in_flight = {}  # key -> Future of the response being fetched
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, fetch):
+        """
+        Returns the cached response for key, or calls fetch() to get it.
+
+        Args:
+            key: Tuple (endpoint, account, location, url, params), see Pydel.
+            fetch: Function returning the response. Exceptions raised by it are not cached.
+        """
+        ttl = self.endpoint_ttls.get(key[0], self.ttl)
+        if not ttl:
+            return fetch()
+
+        generation = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self._in_flight[key] = Future()
+                generation = self._generation
+
+        if generation is None:  # Another thread is fetching it
+            return future.result()
+
+        try:
+            response = fetch()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if generation == self._generation:  # Not invalidated while we were fetching
+                self._entries[key] = (time.time() + ttl, response)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        future.set_result(response)
+        return response
+
+    def invalidate(self, endpoint=None, account=None, location=None):
+        """
+        Removes the entries matching the given endpoint, account and location. Without arguments, removes all entries.
+        Responses being fetched when this is called are not cached.
+        """
+        with self._lock:
+            self._generation += 1
+            if endpoint is None and account is None and location is None:
+                self._entries.clear()
+                return
+
+            for key in list(self._entries):
+                if ((endpoint is None or key[0] == endpoint) and (account is None or key[1] == account) and
+                        (location is None or key[2] == location)):
+                    del self._entries[key]
+
+    def clear(self):
+        """
+        Removes all entries.
+        """
+        self.invalidate()
+
+    def stats(self):
+        """
+        Returns a dictionary mapping 'entries', 'hits', 'misses', 'coalesced' (misses that waited for a request sent by
+        another thread) and 'evictions' to their counts.
+        """
+        with self._lock:
+            return {'entries': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'coalesced': self.coalesced,
+                    'evictions': self.evictions}
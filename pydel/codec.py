@@ -0,0 +1,70 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+PREFERENCE = ('orjson', 'ujson', 'json')
+
+
+class JSONCodec:
+    """
+    A JSON decoder and encoder. loads takes the raw bytes (or str) of a document, dumps returns compact UTF-8 bytes.
+    """
+    def __init__(self, name, loads, dumps):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __repr__(self):
+        return '<JSONCodec {}>'.format(self.name)
+
+
+_json_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode  # json.dumps makes one per call
+
+
+def _json_dumps(obj):
+    return _json_encode(obj).encode('utf-8')
+
+
+def _ujson_dumps(obj):
+    return ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False).encode('utf-8')
+
+
+CODECS = {'json': JSONCodec('json', json.loads, _json_dumps)}
+if ujson is not None:
+    CODECS['ujson'] = JSONCodec('ujson', ujson.loads, _ujson_dumps)
+if orjson is not None:
+    CODECS['orjson'] = JSONCodec('orjson', orjson.loads, orjson.dumps)
+
+
+def get_codec(codec=None):
+    """
+    Looks up a JSON codec.
+
+    Args:
+        (optional) codec: Name of an installed codec, one of PREFERENCE, or a JSONCodec, which is returned as is.
+            Defaults to the first of PREFERENCE that is installed.
+
+    Returns:
+        JSONCodec object
+
+    Raises:
+        ValueError: The codec is unknown or not installed.
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+
+    if codec is None:
+        return next(CODECS[name] for name in PREFERENCE if name in CODECS)
+
+    try:
+        return CODECS[codec]
+    except KeyError:
+        raise ValueError("JSON codec {} is not available (installed: {})".format(codec, ', '.join(sorted(CODECS))))
@@ -0,0 +1,267 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import Post
+
+DEFAULT_MAX_WORKERS = 8
+RESUME_OVERLAP = 10  # Replies fetched again when resuming, see ConversationFetcher._load
+
+
+class Node(object):
+    """
+    A post or reply in a Conversation.
+
+    Attributes:
+        post_id (str): ID of the post.
+        parent (Node): The reply this one answers (given as parent_id by the server), or the original post. None for
+            the original post.
+        children (list): Nodes answering this one, oldest first.
+        depth (int): 0 for the original post, 1 for replies to it, 2 for replies to those and so on.
+        from_op (bool): Whether the author of the original post wrote this (parent_creator).
+        vote_count (int): Votes of the post when it was fetched.
+    """
+    __slots__ = ('post_id', 'parent', 'children', 'depth', 'from_op', 'vote_count', '_json_dict', '_conversation',
+                 '_post')
+
+    def __init__(self, json_dict, parent, conversation):
+        self.post_id = json_dict['post_id']
+        self.parent = parent
+        self.children = []
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.from_op = parent is None or bool(json_dict.get('parent_creator'))
+        self.vote_count = json_dict.get('vote_count', 0)
+        self._json_dict = json_dict
+        self._conversation = conversation
+        self._post = None
+
+    def __repr__(self):
+        return '<Node {} depth={} replies={}>'.format(self.post_id, self.depth, len(self.children))
+
+    @property
+    def post(self):
+        """
+        The post as an object of the conversation's post_class, bound to its Pydel instance. Built on first access.
+        """
+        if self._post is None:
+            self._post = self._conversation.post_class(self._json_dict, self._conversation.pydel_instance)
+        return self._post
+
+
+class Conversation:
+    """
+    A post and all of its replies, as a tree.
+
+    Replies answering another reply (given by parent_id) are its children, all others are children of the original
+    post (root). Besides the tree, the conversation keeps the replies in the order they were written (replies), those
+    by the author of the original post (op_replies), and running totals that are updated as replies are added rather
+    than recomputed: vote totals, the deepest reply and the position of the last reply fetched. The latter is where
+    ConversationFetcher.refresh() resumes, so that mostly replies written since are fetched.
+    """
+    def __init__(self, post_id, pydel_instance=None, post_class=Post):
+        self.post_id = post_id
+        self.pydel_instance = pydel_instance
+        self.post_class = post_class
+
+        self.root = None
+        self.replies = []
+        self.op_replies = []
+        self.reply_votes = 0
+        self.max_depth = 0
+        self.fetched = 0  # Skip after the last reply received, as numbered by the server when it was received
+        self.complete = False
+        self.updated_at = None
+
+        self._nodes = {}
+        self._lock = threading.Lock()  # Held while fetching, see ConversationFetcher
+
+    def __len__(self):
+        return len(self.replies)
+
+    def __iter__(self):
+        return self.walk()
+
+    def __contains__(self, post_id):
+        return post_id in self._nodes
+
+    def __repr__(self):
+        return '<Conversation {} replies={}>'.format(self.post_id, len(self.replies))
+
+    def get(self, post_id):
+        """
+        Returns the node of the post or reply with the given ID, or None.
+        """
+        return self._nodes.get(post_id)
+
+    @property
+    def total_votes(self):
+        """
+        Votes of the original post and all of its replies together.
+        """
+        return (self.root.vote_count if self.root is not None else 0) + self.reply_votes
+
+    def walk(self):
+        """
+        Returns a generator of all nodes, depth first, starting with the original post. Each node is followed by its
+        replies, oldest first.
+        """
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def _set_root(self, json_dict):
+        if self.root is None:
+            self.root = self._nodes[json_dict['post_id']] = Node(json_dict, None, self)
+        else:
+            # Same node, so that the tree stays intact; only what may have changed is updated
+            self.root.vote_count = json_dict.get('vote_count', 0)
+            self.root._json_dict = json_dict
+            self.root._post = None
+
+    def _add_replies(self, replies):
+        added = []
+        for json_dict in replies:
+            if json_dict['post_id'] in self._nodes:  # Page boundaries shifted by a deleted reply
+                continue
+
+            parent = self._nodes.get(json_dict.get('parent_id')) or self.root
+            node = Node(json_dict, parent, self)
+            self._nodes[node.post_id] = node
+            parent.children.append(node)
+            self.replies.append(node)
+            if node.from_op:
+                self.op_replies.append(node)
+            self.reply_votes += node.vote_count
+            self.max_depth = max(self.max_depth, node.depth)
+            added.append(node)
+        return added
+
+
+class ConversationFetcher:
+    """
+    Fetches conversations, many at a time.
+
+    A conversation is fetched page by page from the details endpoint of the API. Pages of one conversation are
+    necessarily fetched one after another, but fetch_many() and refresh_many() fetch up to max_workers conversations
+    at the same time.
+    """
+    def __init__(self, pydel_instance, max_workers=DEFAULT_MAX_WORKERS, max_pages=None):
+        """
+        Args:
+            pydel_instance: Authenticated Pydel instance sending the requests, which the posts are bound to.
+            (optional) max_workers: Maximum number of simultaneous requests.
+            (optional) max_pages: Maximum number of pages fetched per conversation and call. Conversations cut short
+                this way are not complete, and the next refresh() continues where this one stopped.
+        """
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self._pydel_instance = pydel_instance
+
+    def _load(self, conversation):
+        p = self._pydel_instance
+        added = []
+        with conversation._lock:
+            pages = 0
+            step = RESUME_OVERLAP
+            # Replies deleted since the last fetch move the rest forward, so the last page is fetched again from a bit
+            # earlier. Replies seen before are skipped by Conversation._add_replies.
+            skip = max(0, conversation.fetched - step)
+            resuming = skip > 0
+            while self.max_pages is None or pages < self.max_pages:
+                page = p._get_post_details(conversation.post_id, skip)
+                pages += 1
+                conversation._set_root(page['details'])
+                replies = page['replies']
+
+                if resuming and skip and (not replies or replies[0]['post_id'] not in conversation):
+                    # More replies were deleted than the overlap, so the page may start after replies not seen yet
+                    step *= 2
+                    skip = max(0, skip - step)
+                    continue
+                resuming = False
+
+                added.extend(conversation._add_replies(replies))
+                conversation.fetched = skip + len(replies)
+                conversation.updated_at = time.time()
+                conversation.complete = page.get('next') is None
+                if conversation.complete or not replies:
+                    break
+                skip = page['next']
+        return added
+
+    def fetch(self, post):
+        """
+        Fetches a whole conversation.
+
+        Args:
+            post: Post object or post_id of the original post.
+
+        Returns:
+            Conversation object.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code.
+        """
+        post_id = post if isinstance(post, str) else post.post_id
+        conversation = Conversation(post_id, self._pydel_instance, self._pydel_instance._post_class)
+        self._load(conversation)
+        return conversation
+
+    def refresh(self, conversation):
+        """
+        Adds the replies written since the conversation was last fetched, and updates the original post.
+
+        Returns:
+            List of the nodes added, oldest first.
+
+        Raises:
+            See fetch().
+        """
+        return self._load(conversation)
+
+    def _map(self, function, items, return_exceptions):
+        def call(item):
+            try:
+                return function(item), None
+            except Exception as e:
+                return None, e
+
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            results = list(executor.map(call, items))
+
+        if not return_exceptions:
+            for _, error in results:
+                if error is not None:
+                    raise error
+        return [error if error is not None else result for result, error in results]
+
+    def fetch_many(self, posts, return_exceptions=False):
+        """
+        Fetches several conversations concurrently.
+
+        Args:
+            posts: Post objects or post_ids of the original posts.
+            (optional) return_exceptions: If True, the exception a conversation failed with takes its place in the
+                result. Otherwise, the first such exception is raised once all conversations are done.
+
+        Returns:
+            List of Conversation objects, in the order of posts.
+        """
+        return self._map(self.fetch, posts, return_exceptions)
+
+    def refresh_many(self, conversations, return_exceptions=False):
+        """
+        Refreshes several conversations concurrently.
+
+        Returns:
+            List with the list of nodes added to each conversation, in the order of conversations.
+        """
+        return self._map(self.refresh, conversations, return_exceptions)
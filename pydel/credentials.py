@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+import threading
+
+CREDENTIAL_KEYS = ('access_token', 'distinct_id', 'expiration_date', 'refresh_token')
+
+
+class MemoryCredentialStore:
+    """
+    Keeps authentication credentials in memory, keyed by device UID. A store may be shared by any number of Pydel
+    instances and threads.
+
+    Credentials are dictionaries mapping 'access_token', 'distinct_id', 'expiration_date' and 'refresh_token' to the
+    values returned by the server.
+    """
+    def __init__(self):
+        self._credentials = {}
+        self._lock = threading.Lock()
+
+    def load(self, device_uid):
+        """
+        Returns the stored credentials for device_uid, or None if there are none.
+        """
+        with self._lock:
+            credentials = self._credentials.get(device_uid)
+            return dict(credentials) if credentials is not None else None
+
+    def save(self, device_uid, credentials):
+        """
+        Stores credentials for device_uid, replacing any previously stored credentials.
+        """
+        with self._lock:
+            self._credentials[device_uid] = dict(credentials)
+
+    def delete(self, device_uid):
+        """
+        Forgets the credentials for device_uid.
+        """
+        with self._lock:
+            self._credentials.pop(device_uid, None)
+
+
+class FileCredentialStore(MemoryCredentialStore):
+    """
+    Persists authentication credentials to a JSON file so they survive process restarts.
+
+    The file is only readable by its owner, and is replaced atomically on every change. Changes made by other processes
+    using the same file are merged in before writing.
+    """
+    def __init__(self, path):
+        MemoryCredentialStore.__init__(self)
+        self._path = path
+        self._credentials = self._read()
+
+    def _read(self):
+        try:
+            with open(self._path) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self._path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.pydel-credentials')  # mkstemp creates the file as 0600
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._credentials, f)
+            os.replace(tmp_path, self._path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+    def load(self, device_uid):
+        with self._lock:
+            credentials = self._read().get(device_uid)
+            if credentials is not None:
+                self._credentials[device_uid] = credentials
+            return dict(credentials) if credentials is not None else None
+
+    def save(self, device_uid, credentials):
+        with self._lock:
+            self._credentials = self._read()
+            self._credentials[device_uid] = dict(credentials)
+            self._write()
+
+    def delete(self, device_uid):
+        with self._lock:
+            self._credentials = self._read()
+            if self._credentials.pop(device_uid, None) is not None:
+                self._write()
@@ -0,0 +1,138 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+
+DEFAULT_PAGE_SIZE = 60
+TIME_ORDERED_FEEDS = ('home', 'newest', 'mine', 'mine_replies')
+
+
+class FeedCursor:
+    """
+    Iterates over a feed page by page, for as far back as the server allows.
+
+    Pages are requested with the post_id of the last post of the previous page as the 'after' parameter. While the posts
+    of one page are consumed, the next page is fetched on a background thread, so iterating over the cursor is one
+    continuous stream of posts. Posts already seen on an earlier page are skipped.
+
+    Iteration stops when the server returns a page without new posts, or when one of the limits is reached:
+        max_posts: Number of posts yielded.
+        max_age: Age of the posts in seconds. In the feeds ordered by time (TIME_ORDERED_FEEDS), iteration stops at the
+            first older post. In the other feeds, older posts are skipped, and iteration stops after a page consisting
+            only of older posts.
+        max_pages: Number of pages fetched.
+
+    The after attribute holds the post_id the next page will start after, so that a new cursor can continue where this
+    one stopped.
+    """
+    def __init__(self, pydel_instance, feed, page_size=DEFAULT_PAGE_SIZE, max_posts=None, max_age=None,
+                 max_pages=None, after=None, prefetch=True):
+        """
+        Args:
+            pydel_instance: Authenticated Pydel instance.
+            feed: Name of the feed (see Pydel.get_feed).
+            (optional) page_size: Number of posts requested per page.
+            (optional) max_posts: Maximum number of posts to yield.
+            (optional) max_age: Maximum age of the posts to yield, in seconds.
+            (optional) max_pages: Maximum number of pages to fetch.
+            (optional) after: post_id to start after. Defaults to the start of the feed.
+            (optional) prefetch: Whether to fetch the next page while the current one is consumed.
+        """
+        self.feed = feed
+        self.page_size = page_size
+        self.max_posts = max_posts
+        self.max_age = max_age
+        self.max_pages = max_pages
+        self.after = after
+        self.prefetch = prefetch
+        self.pages_fetched = 0
+        self.posts_yielded = 0
+        self._pydel_instance = pydel_instance
+
+    def __iter__(self):
+        for page in self.pages():
+            for post in page:
+                yield post
+
+    def _fetch(self, after):
+        return self._pydel_instance._get_page(self.feed, self.page_size, after)
+
+    def _too_old(self, json_dict, oldest):
+        created_at = json_dict.get('created_at')
+        return oldest is not None and created_at is not None and utils.iso8601_to_datetime(created_at) < oldest
+
+    def pages(self):
+        """
+        Iterates over the pages of the feed.
+
+        Returns:
+            Generator of non-empty lists of Post objects.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        oldest = None
+        if self.max_age is not None:
+            oldest = datetime.datetime.now(utils.UTC).replace(tzinfo=None) - datetime.timedelta(seconds=self.max_age)
+
+        time_ordered = self.feed in TIME_ORDERED_FEEDS
+        post_class = self._pydel_instance._post_class
+        seen = set()
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        pending = None
+
+        try:
+            json_data = self._fetch(self.after)
+            while True:
+                self.pages_fetched += 1
+
+                page = []
+                reached_end = True
+                for json_dict in json_data:
+                    post_id = json_dict['post_id']
+                    if post_id not in seen:
+                        seen.add(post_id)
+                        reached_end = False
+
+                        if self._too_old(json_dict, oldest):
+                            if time_ordered:
+                                reached_end = True
+                                break
+                        elif self.max_posts is not None and self.posts_yielded + len(page) >= self.max_posts:
+                            reached_end = True
+                            break
+                        else:
+                            page.append(json_dict)
+
+                    self.after = post_id
+
+                if not page and not time_ordered and oldest is not None:
+                    reached_end = True
+
+                if self.max_posts is not None and self.posts_yielded + len(page) >= self.max_posts:
+                    reached_end = True
+                if self.max_pages is not None and self.pages_fetched >= self.max_pages:
+                    reached_end = True
+
+                if not reached_end and executor is not None:
+                    pending = executor.submit(self._fetch, self.after)
+
+                if page:
+                    self.posts_yielded += len(page)
+                    yield [post_class(json_dict, self._pydel_instance) for json_dict in page]
+
+                if reached_end:
+                    return
+
+                if pending is not None:
+                    json_data = pending.result()
+                    pending = None
+                else:
+                    json_data = self._fetch(self.after)
+
+        finally:
+            if pending is not None:
+                pending.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
@@ -0,0 +1,292 @@
+import datetime
+import sys
+
+import numpy
+
+from . import Post, _post_to_json
+from . import colors
+from . import utils
+
+KNOWN_COLORS = (colors.ORANGE, colors.YELLOW, colors.RED, colors.BLUE, colors.BLUEGREY, colors.GREEN, 'FFFFFF')
+NUMERIC_COLUMNS = ('vote_count', 'child_count', 'lat', 'lng', 'created_at', 'updated_at', 'color', 'own')
+STRING_COLUMNS = ('post_id', 'message', 'location_name')
+COLUMNS = STRING_COLUMNS + NUMERIC_COLUMNS
+
+
+def _epoch(iso8601):
+    if iso8601 is None:
+        return numpy.nan
+    return utils.iso8601_to_utc_datetime(iso8601).timestamp()
+
+
+def _iso8601(epoch):
+    return datetime.datetime.fromtimestamp(epoch, utils.UTC).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _intern(value):
+    return sys.intern(value) if value is not None else None
+
+
+def _object_array(values):
+    # numpy.array would try to make a multidimensional array out of nested sequences
+    array = numpy.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class PostFrame:
+    """
+    Columnar container for analysing many posts at once.
+
+    Every column is a numpy array with one entry per post:
+        post_id, message, location_name: Interned strings (None if missing).
+        vote_count, child_count: Integers.
+        lat, lng: Floats (NaN if missing).
+        created_at, updated_at: Seconds since the epoch, UTC (NaN if missing).
+        color: Indices into the colors attribute of the frame.
+        own: True for posts written by the user who fetched them.
+
+    Columns are accessed as frame['vote_count'] or frame.vote_count. Indexing a frame with a boolean mask, an array of
+    indices or a slice gives a new frame, as do filter(), sort_by() and group_by(). to_posts() turns a frame back into
+    Post objects.
+
+    Requires numpy.
+    """
+    def __init__(self, columns, color_names=KNOWN_COLORS, pydel_instance=None):
+        """
+        Instantiates a PostFrame from its columns. Use from_json or from_posts to build a frame from posts.
+
+        Args:
+            columns: Dictionary mapping every name in COLUMNS to an array of equal length.
+            (optional) color_names: Color hex strings that the color column indexes into.
+            (optional) pydel_instance: Pydel instance the posts returned by to_posts are bound to.
+        """
+        lengths = set(len(columns[name]) for name in COLUMNS)
+        if len(lengths) > 1:
+            raise ValueError("Columns differ in length")
+
+        self._columns = columns
+        self.colors = tuple(color_names)
+        self.pydel_instance = pydel_instance
+
+    @classmethod
+    def from_json(cls, json_data, pydel_instance=None):
+        """
+        Builds a frame from posts as returned by the API.
+
+        Args:
+            json_data: A feed response (a dictionary mapping 'posts' to a list of posts) or a list of post dictionaries.
+            (optional) pydel_instance: Pydel instance the posts returned by to_posts are bound to.
+        """
+        if isinstance(json_data, dict):
+            json_data = json_data['posts']
+
+        color_names = list(KNOWN_COLORS)
+        color_codes = dict((c, i) for i, c in enumerate(color_names))
+
+        def color_code(color):
+            code = color_codes.get(color)
+            if code is None:
+                code = color_codes[color] = len(color_names)
+                color_names.append(color)
+            return code
+
+        def coordinate(post, key):
+            try:
+                return post['location']['loc_coordinates'][key]
+            except (KeyError, TypeError):
+                return numpy.nan
+
+        def location_name(post):
+            location = post.get('location')
+            return _intern(location.get('name')) if location else None
+
+        n = len(json_data)
+        columns = {
+            'post_id': _object_array([_intern(p['post_id']) for p in json_data]),
+            'message': _object_array([_intern(p.get('message', '')) for p in json_data]),
+            'location_name': _object_array([location_name(p) for p in json_data]),
+            'vote_count': numpy.fromiter((p.get('vote_count', 0) for p in json_data), numpy.int32, n),
+            'child_count': numpy.fromiter((p.get('child_count', 0) for p in json_data), numpy.int32, n),
+            'lat': numpy.fromiter((coordinate(p, 'lat') for p in json_data), numpy.float64, n),
+            'lng': numpy.fromiter((coordinate(p, 'lng') for p in json_data), numpy.float64, n),
+            'created_at': numpy.fromiter((_epoch(p.get('created_at')) for p in json_data), numpy.float64, n),
+            'updated_at': numpy.fromiter((_epoch(p.get('updated_at')) for p in json_data), numpy.float64, n),
+            'color': numpy.fromiter((color_code(p.get('color', 'FFFFFF')) for p in json_data), numpy.uint8, n),
+            'own': numpy.fromiter((p.get('post_own') == 'own' for p in json_data), numpy.bool_, n)
+        }
+        return cls(columns, color_names, pydel_instance)
+
+    @classmethod
+    def from_posts(cls, posts, pydel_instance=None):
+        """
+        Builds a frame from Post (or CompactPost) objects.
+
+        Args:
+            posts: List of posts.
+            (optional) pydel_instance: Pydel instance the posts returned by to_posts are bound to. Defaults to the
+                instance of the first post.
+        """
+        posts = list(posts)
+        if pydel_instance is None and posts:
+            pydel_instance = posts[0]._pydel_instance
+
+        return cls.from_json([_post_to_json(p) for p in posts], pydel_instance)
+
+    @classmethod
+    def concat(cls, frames):
+        """
+        Returns a frame containing the posts of all the given frames, in order.
+        """
+        frames = list(frames)
+        if not frames:
+            return cls.from_json([])
+
+        color_names = list(frames[0].colors)
+        columns = dict((name, []) for name in COLUMNS)
+        for frame in frames:
+            mapping = []
+            for color in frame.colors:
+                if color not in color_names:
+                    color_names.append(color)
+                mapping.append(color_names.index(color))
+
+            for name in COLUMNS:
+                columns[name].append(frame._columns[name])
+            columns['color'][-1] = numpy.array(mapping, dtype=numpy.uint8)[frame._columns['color']]
+
+        return cls(dict((name, numpy.concatenate(arrays)) for name, arrays in columns.items()), color_names,
+                   frames[0].pydel_instance)
+
+    def __len__(self):
+        return len(self._columns['post_id'])
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._columns[key]
+        return self.take(key)
+
+    def __getattr__(self, key):
+        if key != '_columns' and key in self._columns:
+            return self._columns[key]
+        raise AttributeError(key)
+
+    def __repr__(self):
+        return '<PostFrame with {} posts>'.format(len(self))
+
+    def take(self, selection):
+        """
+        Returns a frame with the selected posts.
+
+        Args:
+            selection: Boolean mask, array of indices or slice.
+        """
+        return PostFrame(dict((name, column[selection]) for name, column in self._columns.items()), self.colors,
+                         self.pydel_instance)
+
+    def filter(self, mask=None, **conditions):
+        """
+        Returns a frame with the posts matching mask and all conditions.
+
+        Args:
+            (optional) mask: Boolean array, for instance frame.vote_count > 10.
+            conditions: Column names mapped to the value the column must equal, or to a (low, high) tuple of the
+                inclusive range the column must be within. Colors are given as hex strings.
+
+        Example:
+            frame.filter(frame.child_count > 0, color=colors.RED, created_at=(start, end))
+        """
+        # A copy, since the conditions are and-ed into it
+        selected = numpy.ones(len(self), dtype=numpy.bool_) if mask is None else numpy.array(mask, dtype=numpy.bool_)
+        for name, condition in conditions.items():
+            column = self._columns[name]
+            if isinstance(condition, tuple):
+                low, high = condition
+                selected &= (column >= low) & (column <= high)
+            elif name == 'color':
+                selected &= column == (self.colors.index(condition) if condition in self.colors else -1)
+            else:
+                selected &= column == condition
+        return self.take(selected)
+
+    def sort_by(self, name, descending=False):
+        """
+        Returns a frame with the posts sorted by a column. Sorting is stable.
+        """
+        column = self._columns[name]
+        if descending:
+            # Sorting the reversed column and reversing the result keeps equal values in their original order
+            order = len(column) - 1 - numpy.argsort(column[::-1], kind='stable')[::-1]
+        else:
+            order = numpy.argsort(column, kind='stable')
+        return self.take(order)
+
+    def group_by(self, name):
+        """
+        Splits the frame by the values of a column.
+
+        Returns:
+            Dictionary mapping each distinct value (colors as hex strings) to a frame of the posts with that value.
+        """
+        column = self._columns[name]
+        if column.dtype == object:
+            keys, inverse = numpy.unique(numpy.array([k if k is not None else '' for k in column], dtype=object),
+                                         return_inverse=True)
+        else:
+            keys, inverse = numpy.unique(column, return_inverse=True)
+
+        order = numpy.argsort(inverse, kind='stable')
+        bounds = numpy.searchsorted(inverse[order], numpy.arange(len(keys) + 1))
+        groups = {}
+        for i, key in enumerate(keys):
+            if name == 'color':
+                key = self.colors[key]
+            elif column.dtype != object:
+                key = key.item()
+            groups[key] = self.take(order[bounds[i]:bounds[i + 1]])
+        return groups
+
+    def color_names(self):
+        """
+        Returns the color column as an array of hex strings.
+        """
+        return numpy.array(self.colors, dtype=object)[self._columns['color']]
+
+    def to_json(self):
+        """
+        Returns the posts of the frame as dictionaries shaped like those sent by the API. Only the keys represented by
+        columns are included.
+        """
+        c = self._columns
+        posts = []
+        for i in range(len(self)):
+            post = {
+                'post_id': c['post_id'][i],
+                'message': c['message'][i],
+                'color': self.colors[c['color'][i]],
+                'vote_count': int(c['vote_count'][i]),
+                'child_count': int(c['child_count'][i]),
+                'post_own': 'own' if c['own'][i] else 'friend'
+            }
+            if not numpy.isnan(c['created_at'][i]):
+                post['created_at'] = _iso8601(c['created_at'][i])
+            if not numpy.isnan(c['updated_at'][i]):
+                post['updated_at'] = _iso8601(c['updated_at'][i])
+            if c['location_name'][i] is not None:
+                post['location'] = {'name': c['location_name'][i],
+                                    'loc_coordinates': {'lat': float(c['lat'][i]), 'lng': float(c['lng'][i])}}
+            posts.append(post)
+        return posts
+
+    def to_posts(self, post_class=Post):
+        """
+        Materializes the posts of the frame, bound to the frame's Pydel instance. Only the keys represented by columns
+        are available on the posts; in particular, replies are not.
+
+        Args:
+            (optional) post_class: Post or CompactPost.
+
+        Returns:
+            List of post_class objects.
+        """
+        return [post_class(p, self.pydel_instance) for p in self.to_json()]
@@ -0,0 +1,276 @@
+import socket
+import threading
+
+REQUEST_START = 'request_start'
+RESPONSE = 'response'
+ERROR = 'error'
+REAUTH = 'reauth'
+DECODE = 'decode'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class RequestEvent(object):
+    """
+    Something that happened to a request, passed to the hooks of the Pydel instance sending it.
+
+    Attributes:
+        kind (str): REQUEST_START, RESPONSE, ERROR, REAUTH or DECODE.
+        account (str): Device UID of the Pydel instance.
+        method (str): HTTP method.
+        endpoint (str): Name of the endpoint (see policy.RequestPolicy), 'register' or 'refresh' for REAUTH events.
+        status (int): HTTP status of the response. None for REQUEST_START and for connection errors.
+        bytes_out (int): Size of the request body.
+        bytes_in (int): Size of the response body. None if it was streamed without a Content-Length.
+        retries (int): Number of earlier attempts at the same request, made by the request policy.
+        timings (dict): Seconds spent in each phase of the request, depending on the kind of event:
+            wait: From the call until the request was sent, including rate limiting, token renewal and earlier attempts.
+            server: From sending the request until the response headers had arrived (Response.elapsed). This includes
+                DNS lookups and connection setup when no pooled connection could be reused.
+            download: From the response headers until the body had been read.
+            total: wait, server and download together.
+            decode: Decoding the JSON body (DECODE events).
+        error (Exception): The exception the request failed with, for ERROR and failed REAUTH events.
+    """
+    __slots__ = ('kind', 'account', 'method', 'endpoint', 'status', 'bytes_out', 'bytes_in', 'retries', 'timings',
+                 'error')
+
+    def __init__(self, kind, account, method, endpoint, status=None, bytes_out=0, bytes_in=None, retries=0,
+                 timings=None, error=None):
+        self.kind = kind
+        self.account = account
+        self.method = method
+        self.endpoint = endpoint
+        self.status = status
+        self.bytes_out = bytes_out
+        self.bytes_in = bytes_in
+        self.retries = retries
+        self.timings = timings if timings is not None else {}
+        self.error = error
+
+    def __repr__(self):
+        return '<RequestEvent {} {} {}>'.format(self.kind, self.endpoint, self.status)
+
+
+class Hook:
+    """
+    Base class of the hooks passed to Pydel.add_hook. Every method is called with a RequestEvent, on the thread sending
+    the request, and does nothing unless overridden. Hooks should return quickly, and must not raise.
+    """
+    def on_request_start(self, event):
+        pass
+
+    def on_response(self, event):
+        pass
+
+    def on_error(self, event):
+        pass
+
+    def on_reauth(self, event):
+        pass
+
+    def on_decode(self, event):
+        pass
+
+
+def dispatch(hooks, event):
+    """
+    Passes an event to the method of every hook handling its kind.
+    """
+    name = 'on_' + event.kind
+    for hook in hooks:
+        getattr(hook, name)(event)
+
+
+class _EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # The last one counts latencies beyond the largest bucket
+        self.latency_sum = 0.0
+        self.phase_sums = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.decodes = 0
+        self.decode_sum = 0.0
+
+    def snapshot(self):
+        cumulative = []
+        count = 0
+        for le, n in zip(LATENCY_BUCKETS + (float('inf'),), self.buckets):
+            count += n
+            cumulative.append((le, count))
+
+        completed = self.requests + self.errors
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'error_rate': float(self.errors) / completed if completed else 0.0,
+                'retries': self.retries,
+                'statuses': dict(self.statuses),
+                'latency_buckets': cumulative,
+                'latency_sum': self.latency_sum,
+                'phase_sums': dict(self.phase_sums),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'decodes': self.decodes,
+                'decode_sum': self.decode_sum}
+
+
+class MetricsAggregator(Hook):
+    """
+    Hook keeping per-endpoint counts, error rates, latency histograms (with the upper bounds in LATENCY_BUCKETS, in
+    seconds), phase timings and traffic in memory. May be shared by several Pydel instances.
+    """
+    def __init__(self):
+        self.reauths = 0
+        self.reauth_errors = 0
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _metrics(self, endpoint):
+        metrics = self._endpoints.get(endpoint)
+        if metrics is None:
+            metrics = self._endpoints[endpoint] = _EndpointMetrics()
+        return metrics
+
+    def _record(self, event, failed):
+        total = event.timings.get('total')
+        with self._lock:
+            metrics = self._metrics(event.endpoint)
+            if failed:
+                metrics.errors += 1
+            else:
+                metrics.requests += 1
+            if event.retries:
+                metrics.retries += 1
+            if event.status is not None:
+                metrics.statuses[event.status] = metrics.statuses.get(event.status, 0) + 1
+            if total is not None:
+                i = 0
+                while i < len(LATENCY_BUCKETS) and total > LATENCY_BUCKETS[i]:
+                    i += 1
+                metrics.buckets[i] += 1
+                metrics.latency_sum += total
+            for phase, seconds in event.timings.items():
+                metrics.phase_sums[phase] = metrics.phase_sums.get(phase, 0.0) + seconds
+            metrics.bytes_in += event.bytes_in or 0
+            metrics.bytes_out += event.bytes_out
+
+    def on_response(self, event):
+        self._record(event, False)
+
+    def on_error(self, event):
+        self._record(event, True)
+
+    def on_reauth(self, event):
+        with self._lock:
+            self.reauths += 1
+            if event.error is not None:
+                self.reauth_errors += 1
+
+    def on_decode(self, event):
+        with self._lock:
+            metrics = self._metrics(event.endpoint)
+            metrics.decodes += 1
+            metrics.decode_sum += event.timings['decode']
+
+    def snapshot(self):
+        """
+        Returns the metrics collected so far.
+
+        Returns:
+            Dictionary mapping 'reauths' and 'reauth_errors' to counts, and 'endpoints' to a dictionary mapping every
+            endpoint to a dictionary of its 'requests' and 'errors' (failed attempts, including those retried),
+            'error_rate', 'retries' (attempts that were retries), 'statuses' (counts by HTTP status), 'latency_buckets'
+            (cumulative (upper bound, count) pairs, the last bound being infinity), 'latency_sum', 'phase_sums'
+            (seconds per phase, see RequestEvent), 'bytes_in', 'bytes_out', 'decodes' and 'decode_sum'.
+        """
+        with self._lock:
+            return {'reauths': self.reauths,
+                    'reauth_errors': self.reauth_errors,
+                    'endpoints': dict((name, m.snapshot()) for name, m in self._endpoints.items())}
+
+    def reset(self):
+        with self._lock:
+            self.reauths = 0
+            self.reauth_errors = 0
+            self._endpoints = {}
+
+
+class MetricsExporter:
+    """
+    Interface of exporters publishing the snapshots of a MetricsAggregator to a monitoring system.
+    """
+    def export(self, snapshot):
+        """
+        Publishes a snapshot, as returned by MetricsAggregator.snapshot().
+        """
+        raise NotImplementedError
+
+
+class PrometheusTextExporter(MetricsExporter):
+    """
+    Renders snapshots in the Prometheus text exposition format. export() writes them to path (for the textfile
+    collector of the node exporter, say) if one was given; render() returns the text, for serving it over HTTP.
+    """
+    def __init__(self, path=None, prefix='pydel'):
+        self.path = path
+        self.prefix = prefix
+
+    def render(self, snapshot):
+        p = self.prefix
+        lines = ['# TYPE {}_requests_total counter'.format(p),
+                 '# TYPE {}_errors_total counter'.format(p),
+                 '# TYPE {}_request_seconds histogram'.format(p),
+                 '# TYPE {}_bytes_received_total counter'.format(p),
+                 '# TYPE {}_bytes_sent_total counter'.format(p),
+                 '# TYPE {}_reauths_total counter'.format(p),
+                 '{}_reauths_total {}'.format(p, snapshot['reauths'])]
+        for endpoint, m in sorted(snapshot['endpoints'].items()):
+            label = 'endpoint="{}"'.format(endpoint.replace('\\', '\\\\').replace('"', '\\"'))
+            lines.append('{}_requests_total{{{}}} {}'.format(p, label, m['requests']))
+            lines.append('{}_errors_total{{{}}} {}'.format(p, label, m['errors']))
+            for le, count in m['latency_buckets']:
+                bound = '+Inf' if le == float('inf') else repr(le)
+                lines.append('{}_request_seconds_bucket{{{},le="{}"}} {}'.format(p, label, bound, count))
+            lines.append('{}_request_seconds_sum{{{}}} {}'.format(p, label, m['latency_sum']))
+            lines.append('{}_request_seconds_count{{{}}} {}'.format(p, label, m['latency_buckets'][-1][1]))
+            lines.append('{}_bytes_received_total{{{}}} {}'.format(p, label, m['bytes_in']))
+            lines.append('{}_bytes_sent_total{{{}}} {}'.format(p, label, m['bytes_out']))
+        return '\n'.join(lines) + '\n'
+
+    def export(self, snapshot):
+        text = self.render(snapshot)
+        if self.path is not None:
+            with open(self.path, 'w') as f:
+                f.write(text)
+        return text
+
+
+class StatsdHook(Hook):
+    """
+    Hook sending a timer and a counter per request to a StatsD server over UDP, as <prefix>.<endpoint>.latency (ms),
+    <prefix>.<endpoint>.requests and <prefix>.<endpoint>.errors.
+    """
+    def __init__(self, host='localhost', port=8125, prefix='pydel'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _send(self, event, counter):
+        name = '{}.{}'.format(self.prefix, event.endpoint.strip('/').replace('/', '.'))
+        lines = ['{}.{}:1|c'.format(name, counter)]
+        if 'total' in event.timings:
+            lines.append('{}.latency:{:.3f}|ms'.format(name, event.timings['total'] * 1000))
+        try:
+            self._socket.sendto('\n'.join(lines).encode('utf-8'), self.address)
+        except (OSError, socket.error):
+            pass  # Metrics are best effort
+
+    def on_response(self, event):
+        self._send(event, 'requests')
+
+    def on_error(self, event):
+        self._send(event, 'errors')
@@ -0,0 +1,180 @@
+import threading
+from collections import OrderedDict
+
+from . import FEED_URLS, LOCATION_FEEDS
+from .cache import DEFAULT_MAX_ENTRIES, ResponseCache
+
+DEFAULT_INTERVAL = 10
+DEFAULT_MAX_KNOWN = 10000
+PER_ACCOUNT_FIELDS = ('voted', 'post_own')
+NOT_OWN = 'friend'  # post_own of posts by other users
+
+
+def _personalize(json_dict, known):
+    """
+    Returns json_dict with its per-account fields (and those of its replies) set from known, a dictionary mapping
+    post_id to the per-account fields of one account. json_dict itself is returned if nothing differs.
+    """
+    fields = known.get(json_dict.get('post_id'), {})
+    changed = None
+
+    if json_dict.get('voted') != fields.get('voted'):
+        changed = dict(json_dict)
+        if 'voted' in fields:
+            changed['voted'] = fields['voted']
+        else:
+            del changed['voted']
+
+    own = fields.get('post_own', NOT_OWN)
+    if ('post_own' in json_dict or 'post_own' in fields) and json_dict.get('post_own') != own:
+        changed = changed or dict(json_dict)
+        changed['post_own'] = own
+
+    children = json_dict.get('children')
+    if children:
+        personal = [_personalize(c, known) for c in children]
+        if any(p is not c for p, c in zip(personal, children)):
+            changed = changed or dict(json_dict)
+            changed['children'] = personal
+
+    return changed if changed is not None else json_dict
+
+
+class FeedHub:
+    """
+    Shares location feeds between any number of Pydel instances, so that the number of requests sent grows with the
+    number of distinct locations instead of the number of accounts.
+
+    Instances given the hub (with the hub argument of Pydel) read the location feeds (LOCATION_FEEDS) through it. The
+    first instance to read a feed at a location fetches it, and the response is reused by every instance at the same
+    position for interval seconds. Reads made while it is being fetched wait for it.
+
+    A few fields of a post depend on the account reading it: whether it voted on the post (voted) and whether it wrote
+    it (post_own). The hub learns these from the responses each account fetches itself, including those of
+    get_my_votes() and get_my_jodels(), and from the votes, posts and replies it sends. Posts handed to an account that
+    did not fetch them carry its own fields; only the posts for which they differ from the fetching account's are
+    copied. Every account's posts are bound to its own Pydel instance.
+
+    The hub only knows what it has seen: a post an account voted on before it was given the hub (or through another
+    client) is handed to it without voted until the account fetches it itself, for instance with get_my_votes(). The
+    fields of at most max_known posts are remembered per account, those learned longest ago being forgotten first.
+
+    Writes sent by an instance (posts, replies, votes and deletions) drop the feeds shared at its position, so that the
+    next read fetches them again.
+    """
+    def __init__(self, interval=DEFAULT_INTERVAL, max_entries=DEFAULT_MAX_ENTRIES, max_known=DEFAULT_MAX_KNOWN):
+        """
+        Args:
+            (optional) interval: Seconds a feed fetched at a location is shared for.
+            (optional) max_entries: Maximum number of feeds kept, for all locations together.
+            (optional) max_known: Maximum number of posts whose per-account fields are remembered, per account.
+        """
+        self.interval = interval
+        self.max_known = max_known
+        self.reads = 0
+        self.personalized = 0
+
+        self._cache = ResponseCache(ttl=interval, max_entries=max_entries)
+        self._known = {}  # device_uid -> OrderedDict {post_id: {field: value}}, least recently learned first
+        self._lock = threading.Lock()
+
+    def fetch(self, pydel_instance, feed, lat=None, lng=None):
+        """
+        Returns the JSON posts of a location feed as seen by an account, fetching the feed unless it was fetched at the
+        same location less than interval seconds ago.
+
+        Args:
+            pydel_instance: Authenticated Pydel instance reading the feed, which sends the request if one is needed.
+            feed: Name of a location feed, one of LOCATION_FEEDS.
+            (optional) lat: Latitude to read the feed at, instead of the instance's position.
+            (optional) lng: Longitude to read the feed at, instead of the instance's position.
+
+        Returns:
+            List of dictionaries, which must not be modified.
+
+        Raises:
+            KeyError: feed is not a location feed.
+            Whatever the request raised, see Pydel.get_feed.
+        """
+        if feed not in LOCATION_FEEDS:
+            raise KeyError(feed)
+
+        params = {'lat': lat, 'lng': lng} if lat is not None and lng is not None else None
+        location = (lat, lng) if params is not None else (pydel_instance._lat, pydel_instance._lng)
+
+        def send():
+            req = pydel_instance._authenticated_request(method='GET', url=FEED_URLS[feed], endpoint=feed,
+                                                        params=params)
+            posts = pydel_instance._decode(req, feed)['posts']
+            self.learn(pydel_instance, posts)
+            return posts
+
+        posts = self._cache.get((feed, None, location, FEED_URLS[feed], None), send)
+        # Even the account that fetched the feed may have voted since
+        with self._lock:
+            self.reads += 1
+            known = self._known.get(pydel_instance.get_device_uid(), {})
+            personal = [_personalize(p, known) for p in posts]
+            self.personalized += sum(1 for p, q in zip(personal, posts) if p is not q)
+        return personal
+
+    def learn(self, pydel_instance, posts):
+        """
+        Records the per-account fields of posts (and their replies) fetched by an account itself.
+        """
+        found = []
+        stack = list(posts)
+        while stack:
+            post = stack.pop()
+            fields = dict((f, post[f]) for f in PER_ACCOUNT_FIELDS if f in post and post[f] != NOT_OWN)
+            if fields and 'post_id' in post:
+                found.append((post['post_id'], fields))
+            stack.extend(post.get('children') or ())
+
+        if found:
+            with self._lock:
+                for post_id, fields in found:
+                    self._remember(pydel_instance, post_id, fields)
+
+    def learn_vote(self, pydel_instance, post_id, direction):
+        """
+        Records a vote ('up' or 'down') sent by an account.
+        """
+        with self._lock:
+            self._remember(pydel_instance, post_id, {'voted': direction})
+
+    def _remember(self, pydel_instance, post_id, fields):
+        known = self._known.get(pydel_instance.get_device_uid())
+        if known is None:
+            known = self._known[pydel_instance.get_device_uid()] = OrderedDict()
+        known.setdefault(post_id, {}).update(fields)
+        known.move_to_end(post_id)
+        while len(known) > self.max_known:
+            known.popitem(last=False)
+
+    def invalidate(self, feed=None, location=None):
+        """
+        Drops the shared responses of a feed, or of all feeds, so that they are fetched again on the next read.
+
+        Args:
+            (optional) feed: Name of the feed. Defaults to all feeds.
+            (optional) location: (lat, lng) the feeds were fetched at. Defaults to all locations.
+        """
+        self._cache.invalidate(endpoint=feed, location=location)
+
+    def stats(self):
+        """
+        Returns a dictionary mapping 'reads' (feeds returned), 'upstream' (requests sent), 'coalesced' (reads that
+        waited for a request another account was sending), 'shared' (reads answered by an earlier request), 'feeds'
+        (distinct locations and feeds currently kept), 'accounts' (accounts with known per-account fields) and
+        'personalized' (posts copied to carry the fields of the account reading them) to their counts.
+        """
+        cache = self._cache.stats()
+        with self._lock:
+            return {'reads': self.reads,
+                    'upstream': cache['misses'],
+                    'coalesced': cache['coalesced'],
+                    'shared': cache['hits'],
+                    'feeds': cache['entries'],
+                    'accounts': len(self._known),
+                    'personalized': self.personalized}
@@ -0,0 +1,152 @@
+import random
+import time
+
+import requests
+
+from .pydel_exceptions import UnexpectedResponseCodeException
+from .ratelimit import TokenBucket
+from . import utils
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+
+class RetryPolicy:
+    """
+    Decides whether and when failed requests are retried.
+
+    Requests failing with one of retry_status_codes, or with a connection error or timeout, are retried after a jittered
+    exponential backoff, or after the time given by the server in a Retry-After header. Requests that are not idempotent
+    (posts and replies) are only retried if the server answered 429, since the server has then certainly not acted on
+    them. Nothing is retried once max_retries is reached or if the retry would end after time_budget seconds.
+    """
+    def __init__(self, max_retries=3, backoff=0.5, max_backoff=30, time_budget=60,
+                 retry_status_codes=RETRYABLE_STATUS_CODES):
+        """
+        Instantiates a RetryPolicy.
+
+        Args:
+            (optional) max_retries: Maximum number of retries per request.
+            (optional) backoff: Upper bound of the wait before the first retry, in seconds. Doubled for every retry.
+            (optional) max_backoff: Maximum wait between two attempts, unless the server asks for more with Retry-After.
+            (optional) time_budget: Maximum number of seconds from the first attempt until the last retry is sent.
+            (optional) retry_status_codes: HTTP status codes worth retrying.
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.time_budget = time_budget
+        self.retry_status_codes = retry_status_codes
+
+    def get_wait(self, method, error, attempt, elapsed):
+        """
+        Decides whether a failed request should be retried.
+
+        Args:
+            method: HTTP method of the request.
+            error: The exception raised by the failed attempt.
+            attempt: Number of retries made so far.
+            elapsed: Seconds since the first attempt was sent.
+
+        Returns:
+            Number of seconds to wait before retrying, or None if the request should not be retried.
+        """
+        if attempt >= self.max_retries:
+            return None
+
+        retry_after = None
+        if isinstance(error, UnexpectedResponseCodeException):
+            if error.status_code not in self.retry_status_codes:
+                return None
+            if error.status_code != 429 and method not in IDEMPOTENT_METHODS:
+                return None
+            if error.response is not None:
+                retry_after = utils.parse_retry_after(error.response.headers.get('Retry-After'))
+
+        elif isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            if method not in IDEMPOTENT_METHODS:
+                return None
+
+        else:
+            return None
+
+        # "Full jitter" keeps clients that failed at the same time from retrying at the same time
+        wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+
+        if self.time_budget is not None and elapsed + wait > self.time_budget:
+            return None
+        return wait
+
+
+class RequestPolicy:
+    """
+    Rate limits and retries the requests of a Pydel instance.
+
+    Requests are limited by an overall token bucket and, optionally, by one token bucket per endpoint, and retried
+    according to a RetryPolicy. A policy should not be shared between Pydel instances unless they are meant to share
+    their rate limits. Subclasses may override execute() to change how requests are sent.
+
+    Endpoint names are 'karma', the feed names of FEED_URLS, 'post', 'reply', 'vote' and 'delete'.
+    """
+    def __init__(self, rate=None, burst=None, endpoint_rates=None, retry=None):
+        """
+        Instantiates a RequestPolicy.
+
+        Args:
+            (optional) rate: Maximum average number of requests per second, or None for no limit.
+            (optional) burst: Number of requests that may be sent at once after idling. Defaults to rate, but at least 1.
+            (optional) endpoint_rates: Dictionary mapping endpoint names to their maximum average number of requests per
+                second, or to a (rate, burst) tuple.
+            (optional) retry: RetryPolicy deciding which requests to retry. Defaults to RetryPolicy(). Pass
+                RetryPolicy(max_retries=0) to disable retries.
+        """
+        self.rate_limiter = TokenBucket(rate, burst) if rate else None
+        self.endpoint_limiters = {}
+        for endpoint, endpoint_rate in (endpoint_rates or {}).items():
+            if isinstance(endpoint_rate, tuple):
+                self.endpoint_limiters[endpoint] = TokenBucket(*endpoint_rate)
+            else:
+                self.endpoint_limiters[endpoint] = TokenBucket(endpoint_rate)
+        self.retry = retry if retry is not None else RetryPolicy()
+
+    def throttle(self, endpoint):
+        """
+        Sleeps until a request to endpoint is allowed by the rate limits.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        endpoint_limiter = self.endpoint_limiters.get(endpoint)
+        if endpoint_limiter is not None:
+            endpoint_limiter.acquire()
+
+    def execute(self, send, method, endpoint):
+        """
+        Sends a request, retrying it as long as the retry policy allows.
+
+        Args:
+            send: Function sending the request once, returning the response or raising an exception.
+            method: HTTP method of the request.
+            endpoint: Name of the endpoint the request is sent to.
+
+        Returns:
+            The return value of send.
+
+        Raises:
+            The exception raised by the last attempt, if it failed.
+        """
+        started = time.time()
+        attempt = 0
+        while True:
+            self.throttle(endpoint)
+            try:
+                return send()
+            except (UnexpectedResponseCodeException, requests.exceptions.RequestException) as e:
+                wait = self.retry.get_wait(method, e, attempt, time.time() - started)
+                if wait is None:
+                    raise
+
+            time.sleep(wait)
+            attempt += 1
@@ -0,0 +1,339 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import DEFAULT_POOL_MAXSIZE, LOCATION_FEEDS, Pydel, create_session
+from .pydel_exceptions import NoPydelInstanceException, UnknownAccountException
+from .ratelimit import TokenBucket
+
+ROUND_ROBIN = 'round_robin'
+LEAST_LOADED = 'least_loaded'
+DEFAULT_ACCOUNT_RATE = 1.0
+MAX_CONSECUTIVE_ERRORS = 3
+UNHEALTHY_RETRY_INTERVAL = 60
+
+
+class _Account:
+    def __init__(self, pydel, rate, burst):
+        self.pydel = pydel
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+        self.queued = 0  # Waiting for the rate budget
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error = None
+        self.last_error_at = None
+
+    @property
+    def healthy(self):
+        return self.consecutive_errors < MAX_CONSECUTIVE_ERRORS
+
+    def available(self, now):
+        return self.healthy or now - self.last_error_at > UNHEALTHY_RETRY_INTERVAL
+
+    def load(self):
+        return self.queued + self.in_flight, self.bucket.wait_time() if self.bucket is not None else 0
+
+
+class PydelPool:
+    """
+    A pool of Pydel accounts sharing the work of talking to the Jodel API.
+
+    Reads are spread over the accounts, either round-robin or by sending each request to the least loaded account.
+    Posts returned by the pool belong to the account that fetched them, and votes, replies and deletions of a post are
+    always sent by that account. Every account has its own request budget (a token bucket), so the total throughput
+    grows with the number of accounts while each account stays within its limits.
+
+    Accounts failing MAX_CONSECUTIVE_ERRORS requests in a row are considered unhealthy, and only receive reads again
+    after UNHEALTHY_RETRY_INTERVAL seconds (or when no account is healthy).
+    """
+    def __init__(self, accounts, rate=DEFAULT_ACCOUNT_RATE, burst=None, strategy=ROUND_ROBIN, max_workers=None):
+        """
+        Instantiates a PydelPool.
+
+        Args:
+            accounts: Pydel instances to use. Each should have its own device UID.
+            (optional) rate: Maximum average number of requests per second for each account, or None for no limit.
+            (optional) burst: Number of requests an idle account may send at once. Defaults to rate, but at least 1.
+            (optional) strategy: How reads are assigned to accounts, ROUND_ROBIN or LEAST_LOADED.
+            (optional) max_workers: Maximum number of accounts authenticating at the same time. Defaults to one
+                thread per account, up to 32.
+        """
+        if strategy not in (ROUND_ROBIN, LEAST_LOADED):
+            raise ValueError("Unknown strategy {}".format(strategy))
+
+        self._accounts = [_Account(p, rate, burst) for p in accounts]
+        if not self._accounts:
+            raise ValueError("A pool needs at least one account")
+
+        self._accounts_by_instance = dict((id(a.pydel), a) for a in self._accounts)
+        self._accounts_by_uid = dict((a.pydel.get_device_uid(), a) for a in self._accounts)
+        self._strategy = strategy
+        self._max_workers = max_workers or min(32, len(self._accounts))
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+        self._session = None
+
+    @classmethod
+    def from_device_uids(cls, device_uids, city, country_code, lat, lng, loc_name, rate=DEFAULT_ACCOUNT_RATE,
+                         burst=None, strategy=ROUND_ROBIN, max_workers=None, **kwargs):
+        """
+        Creates a pool of accounts at the same position, sharing one connection pool.
+
+        Args:
+            device_uids: Device UIDs of the accounts, for instance generated with utils.random_device_uid.
+            city, country_code, lat, lng, loc_name: See Pydel.
+            rate, burst, strategy, max_workers: See PydelPool.
+            kwargs: Passed on to every Pydel instance.
+
+        Returns:
+            PydelPool object. Closing it also closes the shared connection pool.
+        """
+        device_uids = list(device_uids)
+        session = kwargs.pop('session', None)
+        owned_session = None
+        if session is None:
+            session = owned_session = create_session(pool_maxsize=max(DEFAULT_POOL_MAXSIZE, len(device_uids)))
+
+        pool = cls([Pydel(device_uid=uid, city=city, country_code=country_code, lat=lat, lng=lng, loc_name=loc_name,
+                          session=session, **kwargs) for uid in device_uids],
+                   rate=rate, burst=burst, strategy=strategy, max_workers=max_workers)
+        pool._session = owned_session
+        return pool
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Closes every account in the pool.
+        """
+        for account in self._accounts:
+            account.pydel.close()
+        if self._session is not None:
+            self._session.close()
+
+    @property
+    def accounts(self):
+        """
+        List of the Pydel instances in the pool.
+        """
+        return [a.pydel for a in self._accounts]
+
+    def get_account(self, device_uid):
+        """
+        Returns the Pydel instance with the given device UID.
+
+        Raises:
+            UnknownAccountException: No account in the pool has this device UID.
+        """
+        try:
+            return self._accounts_by_uid[device_uid].pydel
+        except KeyError:
+            raise UnknownAccountException(device_uid)
+
+    def authenticate(self):
+        """
+        Authenticates all accounts concurrently.
+
+        Returns:
+            Dictionary mapping the device UID of every account that failed to authenticate to the exception raised. Empty
+            if all accounts were authenticated.
+        """
+        def authenticate(account):
+            with self._lock:
+                account.queued += 1
+            try:
+                self._run(account, 0, account.pydel.authenticate)
+            except Exception as e:
+                return account.pydel.get_device_uid(), e
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            return dict(failure for failure in executor.map(authenticate, self._accounts) if failure is not None)
+
+    def stats(self):
+        """
+        Returns the state of every account.
+
+        Returns:
+            List of dictionaries, one per account, mapping 'device_uid', 'healthy', 'queued' (requests waiting for the
+            rate budget), 'in_flight', 'requests', 'errors', 'consecutive_errors' and 'last_error'.
+        """
+        with self._lock:
+            return [{'device_uid': a.pydel.get_device_uid(),
+                     'healthy': a.healthy,
+                     'queued': a.queued,
+                     'in_flight': a.in_flight,
+                     'requests': a.requests,
+                     'errors': a.errors,
+                     'consecutive_errors': a.consecutive_errors,
+                     'last_error': a.last_error} for a in self._accounts]
+
+    def _pick(self):
+        # Picks the account for a read and counts the request as queued there, so that concurrent picks see it
+        with self._lock:
+            now = time.time()
+            candidates = [a for a in self._accounts if a.available(now)] or self._accounts
+
+            if self._strategy == LEAST_LOADED:
+                account = min(candidates, key=_Account.load)
+            else:
+                account = candidates[next(self._next) % len(candidates)]
+
+            account.queued += 1
+            return account
+
+    def _owner(self, post):
+        # Finds the account a post belongs to and counts the request as queued there
+        if post._pydel_instance is None:
+            raise NoPydelInstanceException()
+
+        account = self._accounts_by_instance.get(id(post._pydel_instance))
+        if account is None:
+            raise UnknownAccountException(post._pydel_instance.get_device_uid())
+
+        with self._lock:
+            account.queued += 1
+        return account
+
+    def _run(self, account, tokens, fn, *args):
+        try:
+            if account.bucket is not None and tokens:
+                account.bucket.acquire(tokens)
+        finally:
+            with self._lock:
+                account.queued -= 1
+                account.in_flight += 1
+
+        try:
+            result = fn(*args)
+        except Exception as e:
+            with self._lock:
+                account.in_flight -= 1
+                account.requests += 1
+                account.errors += 1
+                account.consecutive_errors += 1
+                account.last_error = e
+                account.last_error_at = time.time()
+            raise
+
+        with self._lock:
+            account.in_flight -= 1
+            account.requests += 1
+            account.consecutive_errors = 0
+        return result
+
+    def _read(self, method, *args):
+        account = self._pick()
+        return self._run(account, 1, getattr(account.pydel, method), *args)
+
+    def get_feed(self, feed, lat=None, lng=None):
+        """
+        Returns the posts of a feed, fetched by one of the accounts. See Pydel.get_feed.
+        """
+        return self._read('get_feed', feed, lat, lng)
+
+    def get_feeds(self, feeds=LOCATION_FEEDS, max_workers=None):
+        """
+        Fetches several feeds concurrently using one of the accounts. See Pydel.get_feeds.
+        """
+        feeds = list(feeds)
+        account = self._pick()
+        return self._run(account, len(feeds), account.pydel.get_feeds, feeds, max_workers)
+
+    def get_home(self):
+        """
+        Returns newest post near the current position. See Pydel.get_home.
+        """
+        return self._read('get_home')
+
+    def get_newest_jodels(self):
+        """
+        Returns newest posts near the current position. See Pydel.get_newest_jodels.
+        """
+        return self._read('get_newest_jodels')
+
+    def get_top_jodels(self):
+        """
+        Returns highest voted posts near the current position. See Pydel.get_top_jodels.
+        """
+        return self._read('get_top_jodels')
+
+    def get_most_discussed_jodels(self):
+        """
+        Returns most commented posts near the current position. See Pydel.get_most_discussed_jodels.
+        """
+        return self._read('get_most_discussed_jodels')
+
+    def post_jodel(self, color, message, device_uid=None):
+        """
+        Posts a new Jodel. See Pydel.post_jodel.
+
+        Args:
+            color: Post color.
+            message: Content of the post.
+            (optional) device_uid: Device UID of the account to post from. Chosen like for reads if not given.
+
+        Raises:
+            UnknownAccountException: No account in the pool has the given device UID.
+        """
+        if device_uid is None:
+            account = self._pick()
+        else:
+            account = self._accounts_by_uid.get(device_uid)
+            if account is None:
+                raise UnknownAccountException(device_uid)
+            with self._lock:
+                account.queued += 1
+
+        return self._run(account, 1, account.pydel.post_jodel, color, message)
+
+    def reply_to_jodel(self, message, jodel):
+        """
+        Replies to a post from the account that fetched it. See Pydel.reply_to_jodel.
+
+        Raises:
+            NoPydelInstanceException: The post was not fetched by any Pydel instance.
+            UnknownAccountException: The post was fetched by a Pydel instance outside of this pool.
+        """
+        account = self._owner(jodel)
+        return self._run(account, 1, account.pydel.reply_to_jodel, message, jodel)
+
+    def delete_post(self, post):
+        """
+        Deletes a post using the account that fetched it. See Pydel.delete_post.
+
+        Raises:
+            NoPydelInstanceException: The post was not fetched by any Pydel instance.
+            UnknownAccountException: The post was fetched by a Pydel instance outside of this pool.
+        """
+        account = self._owner(post)
+        return self._run(account, 1, account.pydel.delete_post, post)
+
+    def upvote_post(self, post):
+        """
+        Upvotes a post from the account that fetched it. See Pydel.upvote_post.
+
+        Raises:
+            NoPydelInstanceException: The post was not fetched by any Pydel instance.
+            UnknownAccountException: The post was fetched by a Pydel instance outside of this pool.
+        """
+        account = self._owner(post)
+        return self._run(account, 1, account.pydel.upvote_post, post)
+
+    def downvote_post(self, post):
+        """
+        Downvotes a post from the account that fetched it. See Pydel.downvote_post.
+
+        Raises:
+            NoPydelInstanceException: The post was not fetched by any Pydel instance.
+            UnknownAccountException: The post was fetched by a Pydel instance outside of this pool.
+        """
+        account = self._owner(post)
+        return self._run(account, 1, account.pydel.downvote_post, post)
@@ -10,8 +10,10 @@ class AuthenticationError(Error):
 
 
 class UnexpectedResponseCodeException(Error):
-    def __init__(self, message, *args):
+    def __init__(self, message, status_code=None, response=None, *args):
         self.message = message
+        self.status_code = status_code
+        self.response = response
 
         super(UnexpectedResponseCodeException, self).__init__(message, *args)
 
@@ -38,4 +40,11 @@ class UnauthorizedDeletionException(Error):
 
 class UnauthenticatedException(Error):
     def __init__(self, *args):
-        super(UnauthenticatedException, self).__init__(*args)
\ No newline at end of file
+        super(UnauthenticatedException, self).__init__(*args)
+
+
+class UnknownAccountException(Error):
+    def __init__(self, device_uid, *args):
+        self.device_uid = device_uid
+
+        super(UnknownAccountException, self).__init__(*args)
@@ -0,0 +1,83 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    The bucket holds up to capacity tokens and is refilled at rate tokens per second. Every request takes one token, so
+    requests can be sent in bursts of up to capacity, and at rate requests per second on average. Time is measured with
+    a monotonic clock, so that changes to the system clock neither stall the bucket nor let bursts through.
+    """
+    def __init__(self, rate, capacity=None):
+        """
+        Instantiates a TokenBucket, initially full.
+
+        Args:
+            rate: Tokens added per second.
+            (optional) capacity: Maximum number of tokens. Defaults to rate, but at least 1.
+
+        Raises:
+            ValueError: rate is not positive.
+        """
+        if not rate > 0:
+            raise ValueError("Rate must be positive, got {}".format(rate))
+
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self, tokens=1, max_wait=None):
+        """
+        Takes tokens from the bucket, going into debt if there are not enough of them.
+
+        Args:
+            (optional) tokens: Number of tokens to take.
+            (optional) max_wait: If the tokens would not be available within this many seconds, nothing is taken.
+
+        Returns:
+            Number of seconds to wait before the tokens may be used, or None if max_wait would be exceeded.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(0.0, (tokens - self._tokens) / self.rate)
+            if max_wait is not None and wait > max_wait:
+                return None
+
+            self._tokens -= tokens
+            return wait
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Takes tokens from the bucket, sleeping until they are available.
+
+        Args:
+            (optional) tokens: Number of tokens to take.
+            (optional) timeout: Maximum number of seconds to wait.
+
+        Returns:
+            True if the tokens were taken, False if that would have taken longer than timeout.
+        """
+        wait = self.reserve(tokens, timeout)
+        if wait is None:
+            return False
+
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    def wait_time(self, tokens=1):
+        """
+        Returns the number of seconds until tokens would be available, without taking them.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (tokens - self._tokens) / self.rate)
@@ -0,0 +1,397 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+from .ratelimit import TokenBucket
+
+DEFAULT_MAX_RPS = 5
+DEFAULT_MAX_WORKERS = 8
+MIN_INTERVAL = 5
+MAX_INTERVAL = 600
+POSTS_PER_POLL = 10
+RATE_WINDOW = 900
+FRESHNESS_MARGIN = 0.1  # Share of max_age left for polls to start late and be answered
+
+
+def _created_at(post):
+    try:
+        return utils.to_epoch_seconds(post.created_at)
+    except KeyError:
+        return None
+
+
+def _span_rate(posts):
+    """
+    Returns the rate at which the posts of a feed ordered by time were written, in posts per second, or None if the
+    feed does not tell.
+    """
+    created = [c for c in (_created_at(p) for p in posts) if c is not None]
+    if len(created) < 2 or max(created) <= min(created):
+        return None
+    return (len(created) - 1) / (max(created) - min(created))
+
+
+class PollTarget(object):
+    """
+    A feed at a location polled by a PollScheduler.
+
+    Attributes:
+        client: Pydel instance or PydelPool fetching the feed.
+        feed (str): Name of the feed (see Pydel.get_feed).
+        lat (float): Latitude the feed is fetched at, or None for the client's position.
+        lng (float): Longitude the feed is fetched at, or None for the client's position.
+        name (str): Name used in reports.
+        max_age (float): Seconds after which the posts fetched last are considered stale.
+        rate (float): Estimated number of new posts per second, None before the first poll.
+        interval (float): Seconds between polls wanted for rate, before the budget is taken into account.
+        due (float): Time of the next poll, in seconds since the epoch.
+        fetched_at (float): Time the last successful poll was started at, or None.
+        new (int): Number of posts at the last poll that were not in the feed at the poll before.
+        polls (int): Successful polls.
+        errors (int): Failed polls.
+        last_error (Exception): Exception the last failed poll raised.
+        missed (int): Polls started when the posts fetched before were already stale.
+        max_lateness (float): Longest time a poll started after it was due, in seconds.
+    """
+    __slots__ = ('client', 'feed', 'lat', 'lng', 'name', 'max_age', 'rate', 'interval', 'due', 'fetched_at', 'new',
+                 'polls', 'errors', 'last_error', 'missed', 'max_lateness', '_post_ids', '_active', '_sequence')
+
+    def __init__(self, client, feed, lat, lng, name, max_age, interval):
+        self.client = client
+        self.feed = feed
+        self.lat = lat
+        self.lng = lng
+        self.name = name
+        self.max_age = max_age
+        self.rate = None
+        self.interval = interval
+        self.due = 0
+        self.fetched_at = None
+        self.new = 0
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+        self.missed = 0
+        self.max_lateness = 0.0
+        self._post_ids = None
+        self._active = True
+        self._sequence = None  # Of its entry in the queue; other entries are outdated
+
+    def __repr__(self):
+        return '<PollTarget {} interval={:.0f}>'.format(self.name, self.interval)
+
+    def age(self, now=None):
+        """
+        Seconds since the last successful poll, or None if there has not been one.
+        """
+        return (now or time.time()) - self.fetched_at if self.fetched_at is not None else None
+
+    def stats(self, now=None):
+        now = now or time.time()
+        age = self.age(now)
+        return {'name': self.name,
+                'feed': self.feed,
+                'lat': self.lat,
+                'lng': self.lng,
+                'rate': self.rate,
+                'interval': self.interval,
+                'due_in': self.due - now,
+                'age': age,
+                'max_age': self.max_age,
+                'stale': age is None or age > self.max_age,
+                'new': self.new,
+                'polls': self.polls,
+                'errors': self.errors,
+                'last_error': self.last_error,
+                'missed': self.missed,
+                'max_lateness': self.max_lateness}
+
+
+class PollScheduler:
+    """
+    Polls many feeds at many locations, each as often as it changes, within a global budget of requests per second.
+
+    Targets are kept in a priority queue ordered by the time their next poll is due, and polled by up to max_workers
+    threads as they come due. The scheduler learns how many new posts per second every target gets: the first poll
+    estimates it from the creation times of the posts in the feed, and every later one updates a moving average with
+    the posts that were not in the feed at the poll before, weighted by the time since (the last rate_window seconds
+    weigh the most). A target is then polled every posts_per_poll / rate seconds, within min_interval and
+    max_interval, and a little more often than every max_age seconds (see FRESHNESS_MARGIN).
+
+    All polls take a token from a TokenBucket refilled at max_rps. When the intervals wanted add up to more requests
+    per second than that, all of them are stretched by the same factor, so that busy targets are still polled more
+    often than quiet ones, and polls that are due are started in the order they became due. Targets then go stale.
+
+    A target is stale when its last successful poll is more than max_age seconds ago. stats() reports the age of every
+    target and how often polls started too late to keep it fresh.
+    """
+    def __init__(self, max_rps=DEFAULT_MAX_RPS, max_workers=DEFAULT_MAX_WORKERS, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, posts_per_poll=POSTS_PER_POLL, rate_window=RATE_WINDOW):
+        """
+        Args:
+            (optional) max_rps: Maximum number of requests per second, for all targets together.
+            (optional) max_workers: Maximum number of simultaneous requests.
+            (optional) min_interval: Shortest time between two polls of a target, in seconds.
+            (optional) max_interval: Longest time between two polls of a target, unless the budget stretches it. Also
+                the interval of targets that have not had new posts, and the default max_age.
+            (optional) posts_per_poll: Number of new posts a poll should find. Less makes polls more frequent.
+            (optional) rate_window: Seconds of polls a target's rate is averaged over.
+        """
+        self.max_rps = max_rps
+        self.max_workers = max_workers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.posts_per_poll = posts_per_poll
+        self.rate_window = rate_window
+
+        self._bucket = TokenBucket(max_rps)
+        self._queue = []  # (due, sequence number, target)
+        self._sequence = itertools.count()
+        self._targets = []
+        self._demand = 0.0  # Requests per second the targets' intervals add up to
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._targets)
+
+    @property
+    def targets(self):
+        """
+        List of all PollTarget objects.
+        """
+        with self._condition:
+            return list(self._targets)
+
+    @property
+    def stretch(self):
+        """
+        Factor by which the budget stretches the intervals of all targets, 1 if it does not.
+        """
+        with self._condition:
+            return max(1.0, self._demand / self.max_rps)
+
+    def add(self, client, feed='newest', lat=None, lng=None, max_age=None, name=None):
+        """
+        Adds a target, to be polled as soon as possible.
+
+        Args:
+            client: Authenticated Pydel instance or PydelPool.
+            (optional) feed: Name of the feed (see Pydel.get_feed).
+            (optional) lat: Latitude to fetch the feed at, instead of the client's position.
+            (optional) lng: Longitude to fetch the feed at, instead of the client's position.
+            (optional) max_age: Seconds after which the target is considered stale. Defaults to max_interval.
+            (optional) name: Name used in reports. Defaults to the feed and location.
+
+        Returns:
+            PollTarget object.
+        """
+        if name is None:
+            name = '{}@{},{}'.format(feed, lat, lng) if lat is not None else feed
+        max_age = max_age if max_age is not None else self.max_interval
+        target = PollTarget(client, feed, lat, lng, name, max_age, self._interval(None, max_age))
+        target.due = time.time()
+        with self._condition:
+            self._targets.append(target)
+            self._demand += 1.0 / target.interval
+            self._push(target)
+        return target
+
+    def remove(self, target):
+        """
+        Stops polling a target. A poll already running is completed.
+        """
+        with self._condition:
+            if target._active:
+                target._active = False
+                target._sequence = None  # Outdates its entry in the queue
+                self._targets.remove(target)
+                self._demand -= 1.0 / target.interval
+
+    def _push(self, target):
+        target._sequence = next(self._sequence)
+        heapq.heappush(self._queue, (target.due, target._sequence, target))
+        self._condition.notify()
+
+    def _interval(self, rate, max_age):
+        interval = self.max_interval if not rate else self.posts_per_poll / rate
+        if max_age is not None:
+            interval = min(interval, max_age * (1 - FRESHNESS_MARGIN))
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def _learn(self, target, posts, now):
+        post_ids = set(p.post_id for p in posts)
+        if target._post_ids is None:
+            target.new = len(post_ids)
+            observed = _span_rate(posts) or 0.0
+            rate = observed
+        else:
+            target.new = len(post_ids - target._post_ids)
+            elapsed = max(now - target.fetched_at, 1e-3)
+            observed = target.new / elapsed
+            if target.new and target.new == len(post_ids):
+                # Every post is new, so more were probably missed; the feed itself tells how fast they came
+                observed = max(observed, _span_rate(posts) or 0.0)
+            weight = 1 - math.exp(-elapsed / self.rate_window)
+            rate = target.rate + weight * (observed - target.rate)
+
+        target._post_ids = post_ids
+        target.rate = rate
+        target.fetched_at = now
+        target.polls += 1
+
+    def poll(self, target):
+        """
+        Polls a target now, and schedules its next poll.
+
+        Returns:
+            List of Post objects.
+
+        Raises:
+            Whatever the client raised, see Pydel.get_feed. The next poll is then scheduled after twice the interval.
+        """
+        started = time.time()
+        with self._condition:
+            age = target.age(started)
+            if age is not None and age > target.max_age:
+                target.missed += 1
+            target.max_lateness = max(target.max_lateness, started - target.due)
+
+        try:
+            posts = target.client.get_feed(target.feed, target.lat, target.lng)
+        except Exception as e:
+            with self._condition:
+                target.errors += 1
+                target.last_error = e
+                self._reschedule(target, target.interval * 2, time.time())
+            raise
+
+        with self._condition:
+            self._learn(target, posts, started)
+            if target._active:
+                self._demand -= 1.0 / target.interval
+            target.interval = self._interval(target.rate, target.max_age)
+            if target._active:
+                self._demand += 1.0 / target.interval
+            self._reschedule(target, target.interval, started)
+        return posts
+
+    def _reschedule(self, target, interval, since):
+        target.due = since + interval * max(1.0, self._demand / self.max_rps)
+        if target._active:
+            self._push(target)
+
+    def _next(self):
+        """
+        Waits for the next target that is due and a free worker, and takes a token for it. Returns None once stopped.
+        """
+        with self._condition:
+            while not self._stop.is_set():
+                while self._queue and self._queue[0][1] != self._queue[0][2]._sequence:
+                    heapq.heappop(self._queue)
+                now = time.time()
+                if self._queue and self._queue[0][0] <= now and self._in_flight < self.max_workers:
+                    target = heapq.heappop(self._queue)[2]
+                    self._in_flight += 1
+                    break
+                timeout = self._queue[0][0] - now if self._queue and self._in_flight < self.max_workers else None
+                self._condition.wait(timeout)
+            else:
+                return None
+
+        wait = self._bucket.reserve()
+        if wait and self._stop.wait(wait):
+            with self._condition:
+                self._in_flight -= 1
+                if target._active:
+                    self._push(target)
+            return None
+        return target
+
+    def _work(self, target, callback):
+        try:
+            posts = self.poll(target)
+        except Exception:
+            posts = None
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+        if posts is not None and callback is not None:
+            callback(target, posts)
+
+    def run(self, callback=None):
+        """
+        Polls targets as they become due until stop() is called, calling callback(target, posts) after every
+        successful poll from one of the worker threads. Failed polls are counted in the target's statistics and retried
+        later.
+        """
+        self._stop.clear()
+        self._run(callback)
+
+    def _run(self, callback):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pydel-poll') as executor:
+            while True:
+                target = self._next()
+                if target is None:
+                    break
+                executor.submit(self._work, target, callback)
+
+    def start(self, callback=None):
+        """
+        Runs the scheduler on a background thread. Does nothing if it is already running. See run().
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback,), name='pydel-scheduler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops run() or the background thread once the polls running have completed.
+        """
+        with self._condition:
+            self._stop.set()
+            self._condition.notify_all()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
+
+    def stats(self):
+        """
+        Returns statistics of all targets.
+
+        Returns:
+            Dictionary mapping 'targets' (number of targets), 'demand' (requests per second the targets' intervals add
+            up to), 'max_rps', 'stretch' (see the property), 'polls', 'errors', 'missed' (polls started when the target
+            was already stale), 'stale' (targets stale now) and 'oldest' (age of the least recently polled target) to
+            their values, and 'per_target' to a list of dictionaries, one per target, mapping 'name', 'feed', 'lat',
+            'lng', 'rate', 'interval', 'due_in', 'age', 'max_age', 'stale', 'new', 'polls', 'errors', 'last_error',
+            'missed' and 'max_lateness' (see PollTarget) to their values.
+        """
+        now = time.time()
+        with self._condition:
+            per_target = [t.stats(now) for t in self._targets]
+            demand = self._demand
+        ages = [t['age'] for t in per_target if t['age'] is not None]
+        return {'targets': len(per_target),
+                'demand': demand,
+                'max_rps': self.max_rps,
+                'stretch': max(1.0, demand / self.max_rps),
+                'polls': sum(t['polls'] for t in per_target),
+                'errors': sum(t['errors'] for t in per_target),
+                'missed': sum(t['missed'] for t in per_target),
+                'stale': sum(1 for t in per_target if t['stale']),
+                'oldest': max(ages) if ages else None,
+                'per_target': per_target}
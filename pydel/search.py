@@ -0,0 +1,613 @@
+import bisect
+import heapq
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+import zlib
+from array import array
+
+from . import _post_to_json
+from . import utils
+
+ORDER_BY = ('created_at', 'vote_count', None)
+MAX_TOKEN_LENGTH = 64
+
+_MAGIC = b'PYDELIX1'
+_HEADER = struct.Struct('<8s9Q')
+_TOKEN = re.compile(r'\w+')
+_QUERY_TOKEN = re.compile(r'\(|\)|"[^"]*"?|[^\s()"]+')
+
+
+def tokenize(text):
+    """
+    Splits a text into lower-case words, for the index and for queries.
+
+    Text is normalized (NFKC) and case-folded, so that the full-width or ligature forms of a letter match the plain one,
+    and German ß matches ss. Letters of every script count as word characters, so æ, ø, å, ä, ö and ü stay inside words.
+    Punctuation, symbols and emoji separate words and are dropped.
+    """
+    return [t for t in _TOKEN.findall(unicodedata.normalize('NFKC', text).casefold()) if len(t) <= MAX_TOKEN_LENGTH]
+
+
+def _append_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _decode_varints(buf):
+    values = []
+    value = 0
+    shift = 0
+    for byte in buf:
+        if byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            values.append(value | (byte << shift))
+            value = 0
+            shift = 0
+    return values
+
+
+def _epoch(iso8601):
+    return utils.iso8601_to_utc_datetime(iso8601).timestamp() if iso8601 else 0.0
+
+
+def _little_endian(a):
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a
+
+
+class _Postings(object):
+    """
+    The documents containing a term, as varint-encoded gaps between ascending doc ids (docs), and for every document the
+    number of occurrences followed by the gaps between their positions (positions). Both are read-only slices of the
+    index file until the first document is appended.
+    """
+    __slots__ = ('docs', 'positions', 'last', 'count')
+
+    def __init__(self, docs=b'', positions=b'', last=0, count=0):
+        self.docs = docs
+        self.positions = positions
+        self.last = last
+        self.count = count
+
+    def append(self, doc, term_positions):
+        if not isinstance(self.docs, bytearray):
+            self.docs = bytearray(self.docs)
+            self.positions = bytearray(self.positions)
+        _append_varint(self.docs, doc - self.last)
+        self.last = doc
+        self.count += 1
+
+        _append_varint(self.positions, len(term_positions))
+        previous = 0
+        for position in term_positions:
+            _append_varint(self.positions, position - previous)
+            previous = position
+
+    def doc_ids(self):
+        docs = _decode_varints(self.docs)
+        doc = 0
+        for i, gap in enumerate(docs):
+            doc += gap
+            docs[i] = doc
+        return docs
+
+    def doc_positions(self, wanted):
+        """
+        Returns a dictionary mapping the doc ids in wanted to the positions of the term in them.
+        """
+        result = {}
+        values = _decode_varints(self.positions)
+        i = 0
+        for doc in self.doc_ids():
+            n = values[i]
+            if doc in wanted:
+                positions = []
+                position = 0
+                for gap in values[i + 1:i + 1 + n]:
+                    position += gap
+                    positions.append(position)
+                result[doc] = positions
+            i += 1 + n
+        return result
+
+
+class SearchIndex:
+    """
+    Inverted index of post messages, for keyword, phrase and prefix searches.
+
+    Posts are keyed by post_id and get consecutive integer doc ids as they are added. For every word, the index keeps
+    the doc ids of the posts containing it and the positions it has in them, as varint-encoded gaps. Adding a post that
+    is already indexed with the same message only updates its vote count; a changed message replaces it. Removed posts
+    are marked as deleted and left out of results, and compact() drops them for good.
+
+    An index saved with save() is memory-mapped by load(): only the list of post_ids, the vote counts and creation times
+    are read in, while postings are read from the file as queries need them. Posts added afterwards are appended in
+    memory, and saved with the rest by the next save().
+
+    Queries (see search) combine words, "quoted phrases" and prefix* searches with AND (implied between words), OR, NOT
+    (or a leading -) and parentheses. Results can be ordered by creation time or vote count.
+
+    The index may be used from several threads.
+    """
+    def __init__(self):
+        self._post_ids = []
+        self._votes = array('q')
+        self._created = array('d')
+        self._checksums = array('I')
+        self._deleted = set()
+        self._doc_ids = {}
+
+        self._postings = {}  # term -> _Postings, for terms added or read since loading
+        self._base = {}  # term -> row of _base_table, for terms in the loaded file
+        self._base_terms = []  # Sorted
+        self._base_table = None
+        self._new_terms = []  # Sorted terms not in the loaded file
+        self._mmap = None
+        self._file = None
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._post_ids) - len(self._deleted)
+
+    def __contains__(self, post_id):
+        with self._lock:
+            return post_id in self._live_doc_ids()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _live_doc_ids(self):
+        # Built on first use after loading, which restarts do not have to wait for
+        if self._doc_ids is None:
+            deleted = self._deleted
+            self._doc_ids = dict((post_id, doc) for doc, post_id in enumerate(self._post_ids) if doc not in deleted)
+        return self._doc_ids
+
+    def _get(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            row = self._base.get(term)
+            if row is None:
+                return None
+            docs_offset, docs_length, positions_offset, positions_length, last, count = \
+                self._base_table[row * 6:row * 6 + 6]
+            view = memoryview(self._mmap)
+            postings = self._postings[term] = _Postings(view[docs_offset:docs_offset + docs_length],
+                                                        view[positions_offset:positions_offset + positions_length],
+                                                        last, count)
+        return postings
+
+    def add(self, posts):
+        """
+        Adds or updates posts.
+
+        Args:
+            posts: Iterable of Post objects, CompactPost objects or JSON dictionaries.
+
+        Returns:
+            The number of posts that were not indexed before.
+        """
+        added = 0
+        with self._lock:
+            doc_ids = self._live_doc_ids()
+            for post in posts:
+                json_dict = post if isinstance(post, dict) else _post_to_json(post)
+                post_id = json_dict['post_id']
+                message = json_dict.get('message') or ''
+                checksum = zlib.crc32(message.encode('utf-8'))
+
+                doc = doc_ids.get(post_id)
+                if doc is not None:
+                    if self._checksums[doc] == checksum:
+                        self._votes[doc] = json_dict.get('vote_count', 0)
+                        continue
+                    self._deleted.add(doc)
+                else:
+                    added += 1
+
+                doc = len(self._post_ids)
+                doc_ids[post_id] = doc
+                self._post_ids.append(post_id)
+                self._votes.append(json_dict.get('vote_count', 0))
+                self._created.append(_epoch(json_dict.get('created_at')))
+                self._checksums.append(checksum)
+
+                positions = {}
+                for position, term in enumerate(tokenize(message)):
+                    positions.setdefault(term, []).append(position)
+                for term, term_positions in positions.items():
+                    postings = self._get(term)
+                    if postings is None:
+                        postings = self._postings[term] = _Postings()
+                        bisect.insort(self._new_terms, term)
+                    postings.append(doc, term_positions)
+        return added
+
+    def remove(self, posts):
+        """
+        Removes posts from the index.
+
+        Args:
+            posts: Iterable of Post objects or post_ids.
+
+        Returns:
+            The number of posts that were indexed.
+        """
+        removed = 0
+        with self._lock:
+            doc_ids = self._live_doc_ids()
+            for post in posts:
+                doc = doc_ids.pop(post if isinstance(post, str) else post.post_id, None)
+                if doc is not None:
+                    self._deleted.add(doc)
+                    removed += 1
+        return removed
+
+    def _parse(self, query):
+        # Closing parentheses without an opening one are dropped, so that they do not end the query early
+        tokens = []
+        depth = 0
+        for token in _QUERY_TOKEN.findall(query):
+            if token == ')':
+                if not depth:
+                    continue
+                depth -= 1
+            elif token == '(':
+                depth += 1
+            tokens.append(token)
+        pos = [0]
+
+        def peek():
+            return tokens[pos[0]] if pos[0] < len(tokens) else None
+
+        def parse_or():
+            node = parse_and()
+            while peek() == 'OR':
+                pos[0] += 1
+                node = ('or', node, parse_and())
+            return node
+
+        def parse_and():
+            nodes = []
+            while peek() not in (None, ')', 'OR'):
+                if peek() == 'AND':
+                    pos[0] += 1
+                    continue
+                node = parse_unary()
+                if node is not None:
+                    nodes.append(node)
+            return ('and', nodes)
+
+        def parse_unary():
+            token = tokens[pos[0]]
+            pos[0] += 1
+            if token == 'NOT' or token == '-' or token.startswith('-'):
+                if len(token) > 1 and token != 'NOT':
+                    tokens[pos[0] - 1] = token[1:]
+                    pos[0] -= 1
+                elif peek() in (None, ')', 'OR'):
+                    return None
+                node = parse_unary()
+                return ('not', node) if node is not None else None
+            if token == '(':
+                node = parse_or()
+                if peek() == ')':
+                    pos[0] += 1
+                return node
+            if token == ')':
+                return None
+            if token.startswith('"'):
+                terms = tokenize(token.strip('"'))
+                return ('phrase', terms) if terms else None
+
+            prefix = token.endswith('*')
+            terms = tokenize(token)
+            if not terms:
+                return None
+            if prefix:
+                return ('and', [('phrase', terms[:-1]), ('prefix', terms[-1])]) if len(terms) > 1 else \
+                    ('prefix', terms[0])
+            return ('phrase', terms) if len(terms) > 1 else ('term', terms[0])
+
+        return parse_or()
+
+    def _docs(self, term):
+        postings = self._get(term)
+        return set(postings.doc_ids()) if postings is not None else set()
+
+    def _terms_with_prefix(self, prefix):
+        terms = []
+        for sorted_terms in (self._base_terms, self._new_terms):
+            i = bisect.bisect_left(sorted_terms, prefix)
+            while i < len(sorted_terms) and sorted_terms[i].startswith(prefix):
+                terms.append(sorted_terms[i])
+                i += 1
+        return terms
+
+    def _phrase(self, terms):
+        candidates = self._docs(terms[0])
+        for term in terms[1:]:
+            if not candidates:
+                return candidates
+            candidates &= self._docs(term)
+        if len(terms) == 1 or not candidates:
+            return candidates
+
+        starts = self._get(terms[0]).doc_positions(candidates)
+        for offset, term in enumerate(terms[1:], 1):
+            positions = self._get(term).doc_positions(set(starts))
+            for doc in list(starts):
+                following = set(positions[doc])
+                matching = [p for p in starts[doc] if p + offset in following]
+                if matching:
+                    starts[doc] = matching
+                else:
+                    del starts[doc]
+        return set(starts)
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == 'term':
+            return self._docs(node[1])
+        if kind == 'phrase':
+            return self._phrase(node[1])
+        if kind == 'prefix':
+            docs = set()
+            for term in self._terms_with_prefix(node[1]):
+                docs |= self._docs(term)
+            return docs
+        if kind == 'or':
+            return self._evaluate(node[1]) | self._evaluate(node[2])
+        if kind == 'not':
+            return self._all_docs() - self._evaluate(node[1])
+
+        # Intersect the positive parts, starting with the smallest, then take out the negated ones
+        positive = [self._evaluate(n) for n in node[1] if n[0] != 'not']
+        negative = [n[1] for n in node[1] if n[0] == 'not']
+        if not positive:
+            if not negative:
+                return set()
+            positive = [self._all_docs()]
+        positive.sort(key=len)
+        docs = positive[0]
+        for other in positive[1:]:
+            docs &= other
+        for n in negative:
+            if not docs:
+                break
+            docs -= self._evaluate(n)
+        return docs
+
+    def _all_docs(self):
+        return set(range(len(self._post_ids))) - self._deleted
+
+    def _matches(self, query):
+        return self._evaluate(self._parse(query)) - self._deleted
+
+    def search(self, query, order_by='created_at', descending=True, limit=None):
+        """
+        Searches the indexed messages.
+
+        Args:
+            query: Words that must all occur, such as 'eksamen kaffe'. Words ending with * match every word they are the
+                start of ('trond*'), and text in double quotes matches the words in that order ('"hei og hallo"'). OR
+                between two parts matches posts with either, NOT or a leading - excludes posts ('-regn'), and
+                parentheses group parts. Matching ignores case and punctuation, see tokenize.
+            (optional) order_by: One of ORDER_BY: 'created_at', 'vote_count', or None for the order posts were added
+                in.
+            (optional) descending: Whether to return the newest or most voted posts first.
+            (optional) limit: Maximum number of post_ids returned.
+
+        Returns:
+            List of the post_ids of the matching posts.
+        """
+        if order_by not in ORDER_BY:
+            raise ValueError("Cannot order by {}".format(order_by))
+
+        with self._lock:
+            docs = self._matches(query)
+            key = self._created.__getitem__ if order_by == 'created_at' else \
+                self._votes.__getitem__ if order_by == 'vote_count' else None
+
+            if limit is not None and limit < len(docs):
+                if key is None:
+                    docs = heapq.nlargest(limit, docs) if descending else heapq.nsmallest(limit, docs)
+                else:
+                    docs = heapq.nlargest(limit, docs, key) if descending else heapq.nsmallest(limit, docs, key)
+            else:
+                docs = sorted(docs, key=key, reverse=descending)
+            return [self._post_ids[doc] for doc in docs]
+
+    def count(self, query):
+        """
+        Returns the number of posts matching a query, see search.
+        """
+        with self._lock:
+            return len(self._matches(query))
+
+    def _terms(self):
+        return self._base_terms + self._new_terms
+
+    def compact(self):
+        """
+        Drops removed and replaced posts for good, giving the remaining ones new doc ids. This reads and rewrites every
+        posting list, so it takes a while for big indexes.
+        """
+        with self._lock:
+            if not self._deleted:
+                return
+
+            remap = {}
+            post_ids = []
+            votes = array('q')
+            created = array('d')
+            checksums = array('I')
+            for doc, post_id in enumerate(self._post_ids):
+                if doc not in self._deleted:
+                    remap[doc] = len(post_ids)
+                    post_ids.append(post_id)
+                    votes.append(self._votes[doc])
+                    created.append(self._created[doc])
+                    checksums.append(self._checksums[doc])
+
+            postings = {}
+            for term in self._terms():
+                docs = self._get(term).doc_ids()
+                positions = self._get(term).doc_positions(set(docs))
+                new = _Postings()
+                for doc in docs:
+                    if doc in remap:
+                        new.append(remap[doc], positions[doc])
+                if new.count:
+                    postings[term] = new
+
+            self._close_file()
+            self._post_ids = post_ids
+            self._votes = votes
+            self._created = created
+            self._checksums = checksums
+            self._deleted = set()
+            self._doc_ids = None
+            self._postings = postings
+            self._new_terms = sorted(postings)
+
+    def save(self, path):
+        """
+        Writes the index to a file, which load() can memory-map. The file is replaced atomically.
+        """
+        with self._lock:
+            terms = self._terms()
+            terms.sort()
+            table = array('Q')
+            chunks = []
+            offset = 0
+            for term in terms:
+                postings = self._get(term)
+                table.extend((offset, len(postings.docs), offset + len(postings.docs), len(postings.positions),
+                              postings.last, postings.count))
+                chunks.append(postings.docs)
+                chunks.append(postings.positions)
+                offset += len(postings.docs) + len(postings.positions)
+
+            sections = [
+                '\n'.join(self._post_ids).encode('utf-8'),
+                _little_endian(array('q', self._votes)).tobytes(),
+                _little_endian(array('d', self._created)).tobytes(),
+                _little_endian(array('I', self._checksums)).tobytes(),
+                _little_endian(array('Q', sorted(self._deleted))).tobytes(),
+                '\n'.join(terms).encode('utf-8'),
+                _little_endian(table).tobytes(),
+            ]
+
+            temporary = '{}.{}.tmp'.format(path, os.getpid())
+            with open(temporary, 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, len(self._post_ids), len(terms), *[len(s) for s in sections]))
+                for section in sections:
+                    f.write(section)
+                for chunk in chunks:
+                    f.write(chunk)
+            os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Opens an index written by save(). The file must not be modified while the index is open.
+
+        Raises:
+            ValueError: The file is not an index.
+        """
+        index = cls()
+        index._file = open(path, 'rb')
+        try:
+            index._mmap = mmap.mmap(index._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file cannot be mapped
+            index._file.close()
+            raise ValueError("{} is not a search index".format(path))
+
+        fields = _HEADER.unpack_from(index._mmap) if len(index._mmap) >= _HEADER.size else None
+        if fields is None or fields[0] != _MAGIC:
+            index.close()
+            raise ValueError("{} is not a search index".format(path))
+
+        n_docs, n_terms = fields[1:3]
+        sections = []
+        offset = _HEADER.size
+        for length in fields[3:]:
+            sections.append(index._mmap[offset:offset + length])
+            offset += length
+
+        def numbers(typecode, data):
+            a = array(typecode)
+            a.frombytes(data)
+            return _little_endian(a)
+
+        index._post_ids = sections[0].decode('utf-8').split('\n') if n_docs else []
+        index._votes = numbers('q', sections[1])
+        index._created = numbers('d', sections[2])
+        index._checksums = numbers('I', sections[3])
+        index._deleted = set(numbers('Q', sections[4]))
+        index._doc_ids = None
+        index._base_terms = sections[5].decode('utf-8').split('\n') if n_terms else []
+        index._base = dict(zip(index._base_terms, range(n_terms)))
+
+        # Postings offsets in the table are relative to the end of the sections
+        table = numbers('Q', sections[6])
+        for i in range(0, len(table), 6):
+            table[i] += offset
+            table[i + 2] += offset
+        index._base_table = table
+        return index
+
+    def _close_file(self):
+        self._base = {}
+        self._base_terms = []
+        self._base_table = None
+        if self._mmap is not None:
+            # Views of the file must be released before it can be unmapped
+            for postings in self._postings.values():
+                if isinstance(postings.docs, memoryview):
+                    postings.docs.release()
+                    postings.positions.release()
+            self._postings = dict((term, p) for term, p in self._postings.items() if isinstance(p.docs, bytearray))
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def close(self):
+        """
+        Closes the file the index was loaded from. The index can no longer be used afterwards.
+        """
+        with self._lock:
+            self._close_file()
+            self._postings = {}
+
+    def stats(self):
+        """
+        Returns a dictionary mapping 'posts' (indexed posts), 'deleted' (removed or replaced posts not yet compacted),
+        'terms' (distinct words) and 'postings_bytes' (size of the encoded posting lists in memory or mapped) to their
+        values.
+        """
+        with self._lock:
+            size = sum(len(p.docs) + len(p.positions) for p in self._postings.values())
+            if self._base_table is not None:
+                size += sum(self._base_table[i + 1] + self._base_table[i + 3]
+                            for i in range(0, len(self._base_table), 6)
+                            if self._base_terms[i // 6] not in self._postings)
+            return {'posts': len(self),
+                    'deleted': len(self._deleted),
+                    'terms': len(self._base_terms) + len(self._new_terms),
+                    'postings_bytes': size}
@@ -0,0 +1,263 @@
+import sqlite3
+import threading
+import time
+
+from . import Post, _post_to_json
+from . import utils
+from .codec import get_codec
+
+DEFAULT_BATCH_SIZE = 5000
+ORDER_COLUMNS = ('created_at', 'updated_at', 'vote_count', 'child_count', 'last_seen')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    created_at REAL,
+    updated_at REAL,
+    color TEXT,
+    lat REAL,
+    lng REAL,
+    location_name TEXT,
+    vote_count INTEGER,
+    child_count INTEGER,
+    first_seen REAL,
+    last_seen REAL,
+    json TEXT
+);
+CREATE INDEX IF NOT EXISTS posts_created_at ON posts (created_at);
+CREATE INDEX IF NOT EXISTS posts_location ON posts (lat, lng);
+CREATE INDEX IF NOT EXISTS posts_location_name ON posts (location_name);
+CREATE INDEX IF NOT EXISTS posts_color ON posts (color);
+CREATE TABLE IF NOT EXISTS history (
+    post_id TEXT,
+    seen_at REAL,
+    vote_count INTEGER,
+    child_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS history_post_id ON history (post_id, seen_at);
+"""
+
+_UPSERT = """
+INSERT INTO posts (post_id, created_at, updated_at, color, lat, lng, location_name, vote_count, child_count,
+                   first_seen, last_seen, json)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (post_id) DO UPDATE SET
+    created_at = excluded.created_at, updated_at = excluded.updated_at, color = excluded.color, lat = excluded.lat,
+    lng = excluded.lng, location_name = excluded.location_name, vote_count = excluded.vote_count,
+    child_count = excluded.child_count, last_seen = excluded.last_seen, json = excluded.json
+"""
+
+
+def _epoch(iso8601):
+    return utils.iso8601_to_utc_datetime(iso8601).timestamp() if iso8601 else None
+
+
+def _row(json_dict, encoded, seen_at):
+    location = json_dict.get('location') or {}
+    coordinates = location.get('loc_coordinates') or {}
+    return (json_dict['post_id'], _epoch(json_dict.get('created_at')), _epoch(json_dict.get('updated_at')),
+            json_dict.get('color', 'FFFFFF'), coordinates.get('lat'), coordinates.get('lng'), location.get('name'),
+            json_dict.get('vote_count', 0), json_dict.get('child_count', 0), seen_at, seen_at, encoded)
+
+
+class PostStore:
+    """
+    Archive of posts in an SQLite database, with one row per post however often it is added.
+
+    Adding a post that is already stored updates it if anything about it changed (its vote count, but also its message,
+    location or the voted field, for instance), and every change of its vote or reply count is recorded in its
+    history. Posts can be looked up by ID, or queried by creation time, location and color, which are
+    indexed.
+
+    Posts are stored as the JSON they were received as. CompactPost objects, which do not keep their JSON, are stored
+    with the keys they represent as attributes; in particular, their replies are not stored.
+
+    The store may be used from several threads.
+    """
+    def __init__(self, path, pydel_instance=None, post_class=Post, batch_size=DEFAULT_BATCH_SIZE, codec=None):
+        """
+        Opens or creates a store.
+
+        Args:
+            path: Path of the database file, or ':memory:'.
+            (optional) pydel_instance: Pydel instance the posts returned are bound to.
+            (optional) post_class: Class of the posts returned, Post (the default) or CompactPost.
+            (optional) batch_size: Number of posts written per transaction by add().
+            (optional) codec: codec.JSONCodec, or the name of one, encoding and decoding the stored posts. Defaults to
+                the fastest one installed.
+        """
+        self.pydel_instance = pydel_instance
+        self.post_class = post_class
+        self.batch_size = batch_size
+        self.codec = get_codec(codec)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM posts').fetchone()[0]
+
+    def __contains__(self, post_id):
+        with self._lock:
+            return self._connection.execute('SELECT 1 FROM posts WHERE post_id = ?', (post_id,)).fetchone() is not None
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def add(self, posts, seen_at=None):
+        """
+        Stores posts, updating those already stored. A post occurring more than once is stored as last given.
+
+        Args:
+            posts: Iterable of Post objects (or CompactPost objects, or post dictionaries as sent by the API).
+            (optional) seen_at: Time the posts were fetched, in seconds since the epoch. Defaults to now.
+
+        Returns:
+            Number of posts that were not stored before.
+        """
+        if seen_at is None:
+            seen_at = time.time()
+
+        batch = {}
+        added = 0
+        for post in posts:
+            json_dict = post if isinstance(post, dict) else _post_to_json(post)
+            batch[json_dict['post_id']] = json_dict
+            if len(batch) >= self.batch_size:
+                added += self._add_batch(batch, seen_at)
+                batch = {}
+
+        if batch:
+            added += self._add_batch(batch, seen_at)
+        return added
+
+    def _add_batch(self, batch, seen_at):
+        with self._lock, self._connection:
+            known = {}
+            ids = list(batch)
+            for i in range(0, len(ids), 500):  # Stays below SQLite's limit on the number of parameters
+                chunk = ids[i:i + 500]
+                known.update((r[0], r[1:]) for r in self._connection.execute(
+                    'SELECT post_id, vote_count, child_count, json FROM posts WHERE post_id IN ({})'.format(
+                        ','.join('?' * len(chunk))), chunk))
+
+            # Posts stored with the same JSON only get their last_seen updated, which spares rewriting their row
+            dumps = self.codec.dumps
+            rows = []
+            history = []
+            unchanged = []
+            for post_id, json_dict in batch.items():
+                encoded = dumps(json_dict).decode('utf-8')
+                stored = known.get(post_id)
+                if stored is not None and stored[2] == encoded:
+                    unchanged.append((seen_at, post_id))
+                    continue
+
+                row = _row(json_dict, encoded, seen_at)
+                rows.append(row)
+                if stored is None or stored[:2] != row[7:9]:
+                    history.append((post_id, seen_at, row[7], row[8]))
+
+            self._connection.executemany(_UPSERT, rows)
+            self._connection.executemany('INSERT INTO history VALUES (?, ?, ?, ?)', history)
+            self._connection.executemany('UPDATE posts SET last_seen = ? WHERE post_id = ?', unchanged)
+
+        return len(batch) - len(known)
+
+    def _posts(self, rows, pydel_instance):
+        if pydel_instance is None:
+            pydel_instance = self.pydel_instance
+        loads = self.codec.loads
+        return [self.post_class(loads(r[0]), pydel_instance) for r in rows]
+
+    def get(self, post_id, pydel_instance=None):
+        """
+        Returns the stored post with the given ID, or None.
+
+        Args:
+            post_id: ID of the post.
+            (optional) pydel_instance: Pydel instance the post is bound to. Defaults to the store's.
+        """
+        with self._lock:
+            rows = self._connection.execute('SELECT json FROM posts WHERE post_id = ?', (post_id,)).fetchall()
+        posts = self._posts(rows, pydel_instance)
+        return posts[0] if posts else None
+
+    def query(self, created_after=None, created_before=None, color=None, location_name=None, bbox=None,
+              min_votes=None, order_by='created_at', descending=True, limit=None, pydel_instance=None):
+        """
+        Returns the stored posts matching all the given conditions.
+
+        Args:
+            (optional) created_after: Only posts created at or after this time (a datetime, naive ones being UTC, or
+                seconds since the epoch).
+            (optional) created_before: Only posts created before this time.
+            (optional) color: Only posts of this color.
+            (optional) location_name: Only posts with this location name.
+            (optional) bbox: Only posts within the box (min_lat, min_lng, max_lat, max_lng).
+            (optional) min_votes: Only posts with at least this many votes.
+            (optional) order_by: One of ORDER_COLUMNS.
+            (optional) descending: Whether to sort in descending order.
+            (optional) limit: Maximum number of posts returned.
+            (optional) pydel_instance: Pydel instance the posts are bound to. Defaults to the store's.
+
+        Returns:
+            List of post_class objects.
+        """
+        if order_by not in ORDER_COLUMNS:
+            raise ValueError("Cannot order by {}".format(order_by))
+
+        conditions = []
+        params = []
+        if created_after is not None:
+            conditions.append('created_at >= ?')
+            params.append(utils.to_epoch_seconds(created_after))
+        if created_before is not None:
+            conditions.append('created_at < ?')
+            params.append(utils.to_epoch_seconds(created_before))
+        if color is not None:
+            conditions.append('color = ?')
+            params.append(color)
+        if location_name is not None:
+            conditions.append('location_name = ?')
+            params.append(location_name)
+        if bbox is not None:
+            conditions.append('lat BETWEEN ? AND ? AND lng BETWEEN ? AND ?')
+            params.extend((bbox[0], bbox[2], bbox[1], bbox[3]))
+        if min_votes is not None:
+            conditions.append('vote_count >= ?')
+            params.append(min_votes)
+
+        sql = 'SELECT json FROM posts'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY {} {}'.format(order_by, 'DESC' if descending else 'ASC')
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return self._posts(rows, pydel_instance)
+
+    def history(self, post_id):
+        """
+        Returns the recorded changes of a post, oldest first.
+
+        Returns:
+            List of (seen_at, vote_count, reply_count) tuples, seen_at being seconds since the epoch.
+        """
+        with self._lock:
+            return self._connection.execute('SELECT seen_at, vote_count, child_count FROM history WHERE post_id = ? '
+                                            'ORDER BY seen_at', (post_id,)).fetchall()
@@ -0,0 +1,135 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+# The C scanner of the json module, which decodes one value starting at a given index and returns where it ends
+_scan_once = json.JSONDecoder().scan_once
+
+
+class _Reader:
+    """
+    Buffer over an iterable of byte chunks, read on demand.
+    """
+    def __init__(self, chunks, encoding):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Appends the next chunk to the buffer, dropping what has been read. Returns False if there are no chunks left.
+        """
+        while not self.eof:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self.eof = True
+                text = self._decoder.decode(b'', True)
+            else:
+                text = self._decoder.decode(chunk)
+
+            if text or self.eof:
+                # Everything before pos has been read, so the buffer only ever holds about one value and a chunk
+                self.buf = self.buf[self.pos:] + text
+                self.pos = 0
+                return bool(text)
+        return False
+
+    def peek(self):
+        """
+        Skips whitespace and returns the next character, or None at the end of the input.
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, characters):
+        c = self.peek()
+        if c is None or c not in characters:
+            raise ValueError("Expected one of {!r} at {!r}".format(characters, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+        return c
+
+    def read_value(self):
+        """
+        Reads and decodes the JSON value starting at the next non-whitespace character.
+
+        A value cut off by the end of the buffer fails to decode, except for a number, which decodes up to where it is
+        cut off. Both are decoded again once the next chunk has been appended.
+
+        Returns:
+            The decoded value.
+        """
+        if self.peek() is None:
+            raise ValueError("Unexpected end of input")
+
+        while True:
+            try:
+                value, end = _scan_once(self.buf, self.pos)
+            except (StopIteration, ValueError):  # StopIteration: a value is missing, also inside an object or array
+                if not self.fill():
+                    raise ValueError("Invalid JSON value at {!r}".format(self.buf[self.pos:self.pos + 20]))
+                continue
+
+            if _NUMBER_TAIL.match(self.buf, end).end() < len(self.buf) or not self.fill():
+                self.pos = end
+                return value
+
+
+def iter_json_array(chunks, key=None, encoding='utf-8'):
+    """
+    Incrementally decodes the elements of a JSON array.
+
+    Only the current element is kept in memory, so elements can be processed as soon as they have arrived, and memory
+    use does not grow with the size of the array. Elements are decoded by the C scanner of the standard library's json
+    module, which also finds where each one ends, whichever codec the caller otherwise uses (see pydel.codec).
+
+    Args:
+        chunks: Iterable of byte strings making up the JSON document, such as Response.iter_content().
+        (optional) key: If given, the document is an object and the array is the value of this key. Otherwise, the
+            document is the array itself.
+        (optional) encoding: Encoding of the document.
+
+    Returns:
+        Generator of decoded elements.
+
+    Raises:
+        KeyError: The document has no such key.
+        ValueError: The document is not valid JSON, or is not shaped as described above. What follows the array is
+            not read, and not checked.
+    """
+    reader = _Reader(chunks, encoding)
+
+    if key is not None:
+        reader.expect('{')
+        if reader.peek() == '}':
+            raise KeyError(key)
+
+        while True:
+            if reader.peek() != '"':
+                raise ValueError("Expected a key")
+            found = reader.read_value()
+            reader.expect(':')
+
+            if found == key:
+                break
+
+            reader.read_value()
+            if reader.expect(',}') == '}':
+                raise KeyError(key)
+
+    reader.expect('[')
+    if reader.peek() == ']':
+        return
+
+    while True:
+        yield reader.read_value()
+        if reader.expect(',]') == ']':
+            return
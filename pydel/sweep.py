@@ -0,0 +1,217 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+GRID = 'grid'
+HEX = 'hex'
+DEFAULT_SPACING = 10
+DEFAULT_MAX_WORKERS = 8
+MAX_SKIP = 8
+MIN_CONTRIBUTION = 0.1
+KM_PER_DEGREE = 111.32
+
+
+def point_in_polygon(lat, lng, polygon):
+    """
+    Returns whether a point lies within a polygon, given as a list of (lat, lng) vertices.
+    """
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lng_i > lng) != (lng_j > lng) and lat < (lat_j - lat_i) * (lng - lng_i) / (lng_j - lng_i) + lat_i:
+            inside = not inside
+        j = i
+    return inside
+
+
+def tile_points(bbox, spacing=DEFAULT_SPACING, tiling=HEX, polygon=None):
+    """
+    Covers a region with evenly spaced points.
+
+    Args:
+        bbox: (min_lat, min_lng, max_lat, max_lng) of the region.
+        (optional) spacing: Distance between neighbouring points, in kilometres.
+        (optional) tiling: HEX, for points in staggered rows, which leaves every spot of the region closer to a point
+            than a grid with the same spacing does, or GRID.
+        (optional) polygon: List of (lat, lng) vertices. Only points within the polygon are kept.
+
+    Returns:
+        List of (lat, lng) tuples, row by row from the south-west corner. Regions too small for any point get their
+        centre.
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    lat_step = spacing / KM_PER_DEGREE
+    row_step = lat_step * math.sqrt(3) / 2 if tiling == HEX else lat_step
+
+    points = []
+    row = 0
+    lat = min_lat
+    while lat <= max_lat:
+        lng_step = spacing / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+        lng = min_lng + (lng_step / 2 if tiling == HEX and row % 2 else 0)
+        while lng <= max_lng:
+            if polygon is None or point_in_polygon(lat, lng, polygon):
+                points.append((lat, lng))
+            lng += lng_step
+
+        row += 1
+        lat = min_lat + row * row_step
+
+    return points or [((min_lat + max_lat) / 2, (min_lng + max_lng) / 2)]
+
+
+class _Tile:
+    def __init__(self, lat, lng):
+        self.lat = lat
+        self.lng = lng
+        self.skip = 1  # Number of sweeps between visits
+        self.due = 0  # Number of the next sweep visiting the tile
+        self.requests = 0
+        self.errors = 0
+        self.last_error = None
+        self.posts = 0
+        self.new = 0
+
+    def stats(self):
+        return {'lat': self.lat,
+                'lng': self.lng,
+                'posts': self.posts,
+                'new': self.new,
+                'duplicate_ratio': 1 - float(self.new) / self.posts if self.posts else 0.0,
+                'skip': self.skip,
+                'requests': self.requests,
+                'errors': self.errors,
+                'last_error': self.last_error}
+
+
+class RegionSweeper:
+    """
+    Fetches a location feed at every point of a tiling of a region, and merges the results.
+
+    The feeds of neighbouring points overlap, so every sweep deduplicates the posts by post_id. A tile is credited with
+    the posts no tile before it (in tiling order) has found. With adaptive set, a tile for which no more than
+    min_contribution of its posts were new is visited only every other sweep, then every fourth sweep and so on, up to
+    every max_skip sweeps, and every sweep again once it contributes more. Over time, requests concentrate on the tiles
+    that are actually needed to cover the region: in dense areas where feeds reach less far, all tiles are kept, while
+    in sparse areas most of them are thinned out.
+
+    The client is a Pydel instance or a PydelPool, whose accounts then share the requests.
+    """
+    def __init__(self, client, bbox=None, polygon=None, spacing=DEFAULT_SPACING, tiling=HEX, feed='newest',
+                 max_workers=DEFAULT_MAX_WORKERS, adaptive=True, min_contribution=MIN_CONTRIBUTION,
+                 max_skip=MAX_SKIP):
+        """
+        Args:
+            client: Authenticated Pydel instance or PydelPool.
+            (optional) bbox: (min_lat, min_lng, max_lat, max_lng) of the region.
+            (optional) polygon: List of (lat, lng) vertices of the region, instead of or within bbox.
+            (optional) spacing: Distance between neighbouring tiles, in kilometres.
+            (optional) tiling: HEX or GRID, see tile_points.
+            (optional) feed: Name of the location feed to fetch (see Pydel.get_feed).
+            (optional) max_workers: Maximum number of simultaneous requests.
+            (optional) adaptive: Whether to visit tiles contributing few new posts less often.
+            (optional) min_contribution: Share of new posts at or below which a tile is visited less often.
+            (optional) max_skip: Longest interval between visits of a tile, in sweeps.
+        """
+        if bbox is None:
+            if polygon is None:
+                raise ValueError("Either bbox or polygon must be given")
+            bbox = (min(p[0] for p in polygon), min(p[1] for p in polygon),
+                    max(p[0] for p in polygon), max(p[1] for p in polygon))
+
+        self.feed = feed
+        self.max_workers = max_workers
+        self.adaptive = adaptive
+        self.min_contribution = min_contribution
+        self.max_skip = max_skip
+        self.sweeps = 0
+
+        self._client = client
+        self._tiles = [_Tile(lat, lng) for lat, lng in tile_points(bbox, spacing, tiling, polygon)]
+        self._last_sweep = {'requests': 0, 'posts': 0, 'unique': 0, 'errors': 0}
+
+    @property
+    def points(self):
+        """
+        The (lat, lng) points of all tiles.
+        """
+        return [(t.lat, t.lng) for t in self._tiles]
+
+    def _fetch(self, tile):
+        try:
+            return self._client.get_feed(self.feed, lat=tile.lat, lng=tile.lng), None
+        except Exception as e:
+            return None, e
+
+    def sweep(self):
+        """
+        Fetches the feed at every tile that is due, concurrently.
+
+        Returns:
+            List of the distinct posts found, in tiling order.
+
+        Raises:
+            Whatever exception the last tile failed with, if every tile failed. Failures of single tiles are counted in
+            the statistics instead.
+        """
+        due = [t for t in self._tiles if t.due <= self.sweeps]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._fetch, due))
+
+        seen = set()
+        unique = []
+        fetched = 0
+        errors = 0
+        error = None
+        for tile, (posts, tile_error) in zip(due, results):
+            tile.requests += 1
+            if tile_error is not None:
+                tile.errors += 1
+                tile.last_error = error = tile_error
+                tile.due = self.sweeps + 1
+                errors += 1
+                continue
+
+            new = 0
+            for post in posts:
+                if post.post_id not in seen:
+                    seen.add(post.post_id)
+                    unique.append(post)
+                    new += 1
+
+            tile.posts = len(posts)
+            tile.new = new
+            fetched += len(posts)
+            if self.adaptive:
+                if new > self.min_contribution * len(posts):
+                    tile.skip = 1
+                else:
+                    tile.skip = min(self.max_skip, tile.skip * 2)
+            tile.due = self.sweeps + tile.skip
+
+        self.sweeps += 1
+        self._last_sweep = {'requests': len(due), 'posts': fetched, 'unique': len(unique), 'errors': errors}
+
+        if due and errors == len(due):
+            raise error
+        return unique
+
+    def stats(self):
+        """
+        Returns statistics of the last sweep.
+
+        Returns:
+            Dictionary mapping 'sweeps' (number of sweeps so far), 'tiles' (number of tiles), 'requests', 'errors',
+            'posts' (posts fetched), 'unique' (distinct posts) and 'duplicate_ratio' (share of the posts fetched that
+            another tile had already found) to their values, and 'per_tile' to a list of dictionaries, one per tile,
+            mapping 'lat', 'lng', 'posts' and 'new' (posts the tile contributed) at its last visit, 'duplicate_ratio',
+            'skip' (sweeps between visits), 'requests', 'errors' and 'last_error'.
+        """
+        last = self._last_sweep
+        stats = {'sweeps': self.sweeps,
+                 'tiles': len(self._tiles),
+                 'duplicate_ratio': 1 - float(last['unique']) / last['posts'] if last['posts'] else 0.0,
+                 'per_tile': [t.stats() for t in self._tiles]}
+        stats.update(last)
+        return stats
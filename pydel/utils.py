@@ -1,7 +1,15 @@
+import array
 import hashlib
 import datetime
+import email.utils
+import sys
 import uuid
 import random
+import time
+
+UTC = datetime.timezone.utc
+ISO8601_FALLBACK_FORMATS = ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ", "%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z",
+                            "%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S")
 
 
 def random_device_uid():
@@ -12,5 +20,115 @@ def random_loc_accuracy():
         return random.uniform(1.0, 15.0)
 
 
+def _parse_fixed_layout(iso8601):
+    # Parses the layout sent by the API, 2016-01-31T12:34:56.789Z, by position
+    if (len(iso8601) < 21 or iso8601[-1] != 'Z' or iso8601[4] != '-' or iso8601[7] != '-' or iso8601[10] != 'T' or
+            iso8601[13] != ':' or iso8601[16] != ':' or iso8601[19] != '.'):
+        raise ValueError("Unexpected timestamp layout: {}".format(iso8601))
+
+    return datetime.datetime(int(iso8601[0:4]), int(iso8601[5:7]), int(iso8601[8:10]), int(iso8601[11:13]),
+                             int(iso8601[14:16]), int(iso8601[17:19]), int(iso8601[20:-1][:6].ljust(6, '0')), UTC)
+
+
+if sys.version_info >= (3, 11):
+    _parse_fast = datetime.datetime.fromisoformat  # Understands the trailing Z since 3.11, and is much faster
+else:
+    _parse_fast = _parse_fixed_layout
+
+
+def _parse_fallback(iso8601):
+    for date_format in ISO8601_FALLBACK_FORMATS:
+        try:
+            parsed = datetime.datetime.strptime(iso8601, date_format)
+        except ValueError:
+            continue
+
+        return parsed.replace(tzinfo=UTC) if parsed.tzinfo is None else parsed.astimezone(UTC)
+
+    raise ValueError("Unsupported timestamp: {}".format(iso8601))
+
+
+def iso8601_to_utc_datetime(iso8601):
+    """
+    Converts an ISO 8601 timestamp as sent by the API (2016-01-31T12:34:56.789Z) to a timezone-aware UTC datetime.
+
+    Timestamps in that layout take a fast path. Other common ISO 8601 layouts are parsed more slowly, and timestamps
+    without a timezone are taken to be in UTC.
+
+    Raises:
+        ValueError: The timestamp could not be parsed.
+    """
+    try:
+        parsed = _parse_fast(iso8601)
+    except (TypeError, ValueError):
+        return _parse_fallback(iso8601)
+
+    if parsed.tzinfo is not UTC:  # fromisoformat also accepts timestamps in other layouts
+        return parsed.replace(tzinfo=UTC) if parsed.tzinfo is None else parsed.astimezone(UTC)
+    return parsed
+
+
 def iso8601_to_datetime(iso8601):
-    return datetime.datetime.strptime(iso8601, "%Y-%m-%dT%H:%M:%S.%fZ")
+    """
+    Converts an ISO 8601 timestamp as sent by the API to a naive datetime in UTC. See iso8601_to_utc_datetime.
+    """
+    if iso8601[-1:] == 'Z':
+        try:
+            parsed = datetime.datetime.fromisoformat(iso8601[:-1])  # Much cheaper than removing the timezone afterwards
+        except ValueError:
+            pass
+        else:
+            if parsed.tzinfo is None:
+                return parsed
+
+    return iso8601_to_utc_datetime(iso8601).replace(tzinfo=None)
+
+
+def batch_iso8601_to_datetime(timestamps, epoch_seconds=False):
+    """
+    Converts many ISO 8601 timestamps at once. See iso8601_to_utc_datetime.
+
+    Args:
+        timestamps: Iterable of timestamps as sent by the API.
+        (optional) epoch_seconds: If True, return seconds since the epoch instead of datetimes.
+
+    Returns:
+        List of timezone-aware UTC datetimes, or an array.array of doubles if epoch_seconds is True. The array supports
+        the buffer protocol, so numpy.frombuffer(result) gives a numpy array without copying.
+
+    Raises:
+        ValueError: A timestamp could not be parsed.
+    """
+    parse = iso8601_to_utc_datetime
+    if epoch_seconds:
+        return array.array('d', [parse(t).timestamp() for t in timestamps])
+    return [parse(t) for t in timestamps]
+
+
+def to_epoch_seconds(when):
+    """
+    Converts a datetime (naive ones being taken to be in UTC, like those of Post.created_at) to seconds since the epoch.
+    Numbers are returned as they are.
+    """
+    if isinstance(when, datetime.datetime):
+        return (when if when.tzinfo is not None else when.replace(tzinfo=UTC)).timestamp()
+    return when
+
+
+def parse_retry_after(retry_after):
+    """
+    Converts the value of a Retry-After header, either a number of seconds or an HTTP date, to a number of seconds.
+    Returns None if the value is missing or cannot be parsed.
+    """
+    if not retry_after:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    date = email.utils.parsedate_tz(retry_after)
+    if date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date) - time.time())
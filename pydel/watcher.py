@@ -0,0 +1,227 @@
+import threading
+from collections import OrderedDict
+
+import requests
+
+from .pydel_exceptions import AuthenticationError, UnexpectedResponseCodeException
+
+NEW_POST = 'new_post'
+VOTES_CHANGED = 'votes_changed'
+NEW_REPLIES = 'new_replies'
+POST_DISAPPEARED = 'post_disappeared'
+
+DEFAULT_INTERVAL = 30
+MIN_INTERVAL = 5
+MAX_INTERVAL = 300
+DEFAULT_MAX_SEEN = 10000
+
+
+def _created_at(post):
+    try:
+        return post.created_at
+    except KeyError:
+        return None
+
+
+class FeedEvent(object):
+    """
+    A change observed by a FeedWatcher.
+
+    Attributes:
+        kind (str): NEW_POST, VOTES_CHANGED, NEW_REPLIES or POST_DISAPPEARED.
+        post_id (str): ID of the post.
+        post (Post): The post as last fetched. None for POST_DISAPPEARED.
+        vote_count (int): Current vote count (last known vote count for POST_DISAPPEARED).
+        reply_count (int): Current number of replies (last known number for POST_DISAPPEARED).
+        previous_vote_count (int): Vote count at the previous poll. None for NEW_POST.
+        previous_reply_count (int): Number of replies at the previous poll. None for NEW_POST.
+    """
+    __slots__ = ('kind', 'post_id', 'post', 'vote_count', 'reply_count', 'previous_vote_count', 'previous_reply_count')
+
+    def __init__(self, kind, post_id, post, vote_count, reply_count, previous_vote_count=None,
+                 previous_reply_count=None):
+        self.kind = kind
+        self.post_id = post_id
+        self.post = post
+        self.vote_count = vote_count
+        self.reply_count = reply_count
+        self.previous_vote_count = previous_vote_count
+        self.previous_reply_count = previous_reply_count
+
+    def __repr__(self):
+        return '<FeedEvent {} {}>'.format(self.kind, self.post_id)
+
+
+class FeedWatcher:
+    """
+    Polls a feed and reports what changed since the previous poll.
+
+    The vote and reply counts of the most recently seen max_seen posts are remembered; older posts are forgotten, so
+    memory use stays constant however long the watcher runs. A forgotten post that shows up again is reported as new.
+
+    A post is reported as disappeared when it was in the feed at the previous poll, but is missing although the feed
+    still reaches back to when it was created. In the feeds ordered by time, this usually means it was deleted.
+
+    With adaptive set, the interval is halved (down to min_interval) after a poll that found changes, and grows by half
+    (up to max_interval) after a poll that did not.
+
+    Events can be consumed with poll(), by iterating over watch(), or by passing a callback to run() or start().
+    Failed polls do not end watch(), run() or start(); they are counted in errors and kept in last_error.
+    """
+    def __init__(self, pydel_instance, feed='newest', interval=DEFAULT_INTERVAL, adaptive=False,
+                 min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, max_seen=DEFAULT_MAX_SEEN, initial_events=True):
+        """
+        Args:
+            pydel_instance: Authenticated Pydel instance.
+            (optional) feed: Name of the feed (see Pydel.get_feed).
+            (optional) interval: Seconds between polls, or the initial interval if adaptive is set.
+            (optional) adaptive: Whether to adapt the interval to how often the feed changes.
+            (optional) min_interval: Shortest interval when adaptive.
+            (optional) max_interval: Longest interval when adaptive. Also the time to wait after a failed poll.
+            (optional) max_seen: Number of posts to remember.
+            (optional) initial_events: Whether the first poll reports every post in the feed as new.
+        """
+        self.feed = feed
+        self.interval = interval
+        self.adaptive = adaptive
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_seen = max_seen
+        self.initial_events = initial_events
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+
+        self._pydel_instance = pydel_instance
+        self._seen = OrderedDict()  # post_id -> (vote_count, reply_count), least recently seen first
+        self._previous = {}  # post_id -> created_at of the posts in the feed at the previous poll
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        """
+        Fetches the feed once.
+
+        Returns:
+            List of FeedEvent objects, in feed order, followed by the disappeared posts.
+
+        Raises:
+            AuthenticationError: An attempt to replace an outdated auth token failed.
+            UnexpectedResponseCodeException: The server responded with an unexpected HTTP status code (that is, not 200 or 204)
+        """
+        posts = self._pydel_instance.get_feed(self.feed)
+        first_poll = self.polls == 0
+        self.polls += 1
+
+        seen = self._seen
+        events = []
+        current = {}
+        for post in posts:
+            post_id = post.post_id
+            vote_count = post.vote_count
+            reply_count = post.reply_count
+            current[post_id] = _created_at(post)
+
+            previous = seen.get(post_id)
+            if previous is None:
+                if not first_poll or self.initial_events:
+                    events.append(FeedEvent(NEW_POST, post_id, post, vote_count, reply_count))
+            else:
+                seen.move_to_end(post_id)
+                previous_vote_count, previous_reply_count = previous
+                if vote_count != previous_vote_count:
+                    events.append(FeedEvent(VOTES_CHANGED, post_id, post, vote_count, reply_count,
+                                            previous_vote_count, previous_reply_count))
+                if reply_count > previous_reply_count:
+                    events.append(FeedEvent(NEW_REPLIES, post_id, post, vote_count, reply_count,
+                                            previous_vote_count, previous_reply_count))
+                if vote_count == previous_vote_count and reply_count == previous_reply_count:
+                    continue
+
+            seen[post_id] = (vote_count, reply_count)
+
+        oldest = min([c for c in current.values() if c is not None] or [None])
+        for post_id, created_at in self._previous.items():
+            if post_id in current or (oldest is not None and created_at is not None and created_at < oldest):
+                continue
+
+            last = seen.pop(post_id, None)
+            if last is not None:
+                events.append(FeedEvent(POST_DISAPPEARED, post_id, None, last[0], last[1], last[0], last[1]))
+
+        while len(seen) > self.max_seen:
+            seen.popitem(last=False)
+
+        self._previous = current
+        if self.adaptive and not first_poll:
+            if events:
+                self.interval = max(self.min_interval, self.interval / 2.0)
+            else:
+                self.interval = min(self.max_interval, self.interval * 1.5)
+
+        return events
+
+    def watch(self, on_error=None):
+        """
+        Polls the feed until stop() is called, yielding events as they are found. Polls failing with an unexpected
+        response code, a connection error or a failed renewal of the auth token are retried after max_interval seconds.
+
+        Args:
+            (optional) on_error: Function called with the exception of every failed poll.
+
+        Returns:
+            Generator of FeedEvent objects.
+        """
+        self._stop.clear()
+        return self._watch(on_error)
+
+    def _watch(self, on_error=None):
+        delay = 0
+        while not self._stop.wait(delay):
+            try:
+                events = self.poll()
+            except (UnexpectedResponseCodeException, AuthenticationError, requests.RequestException) as e:
+                self.errors += 1
+                self.last_error = e
+                delay = self.max_interval
+                if on_error is not None:
+                    on_error(e)
+                continue
+
+            for event in events:
+                yield event
+            delay = self.interval
+
+    def run(self, callback, on_error=None):
+        """
+        Polls the feed until stop() is called, calling callback(event) for every event. See watch().
+        """
+        self._stop.clear()
+        self._run(callback, on_error)
+
+    def _run(self, callback, on_error=None):
+        for event in self._watch(on_error):
+            callback(event)
+
+    def start(self, callback, on_error=None):
+        """
+        Runs the watcher on a background thread. Does nothing if it is already running. See run().
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback, on_error),
+                                        name='pydel-watch-{}'.format(self.feed))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops watch(), run() or the background thread after the current poll.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._thread = None
@@ -0,0 +1,194 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import _PostActions
+
+UPVOTE = 'upvote'
+DOWNVOTE = 'downvote'
+DELETE = 'delete'
+REPLY = 'reply'
+
+SENT = 'sent'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class _Action:
+    __slots__ = ('kind', 'post', 'post_id', 'message', 'future', 'status', 'reason', 'error')
+
+    def __init__(self, kind, post, post_id, message):
+        self.kind = kind
+        self.post = post
+        self.post_id = post_id
+        self.message = message
+        self.future = Future()
+        self.status = None
+        self.reason = None
+        self.error = None
+
+    def record(self):
+        return {'action': self.kind, 'post_id': self.post_id, 'status': self.status, 'reason': self.reason,
+                'error': self.error}
+
+
+class WriteQueue:
+    """
+    Collects votes, replies and deletions, and sends them in batches.
+
+    Actions are queued by upvote(), downvote(), reply() and delete(), which return a concurrent.futures.Future, and sent
+    by flush() with at most max_workers requests at a time. Each request still waits for the write delay after
+    authentication and for the rate limits of the Pydel instance's request policy.
+
+    Actions are deduplicated as they are queued:
+        - Queuing an action that is already queued returns the future of the queued one.
+        - A vote on a post that has been voted on, either according to the post or to the queue's own record of votes,
+          is skipped, as is a vote on a post that already has the opposite vote queued.
+        - Votes and replies on a post that is queued for deletion are skipped, including those queued before it.
+
+    The record of votes (the voted attribute, mapping post_id to 'up' or 'down') is updated as votes are sent, so that
+    later batches do not send them again. It may be passed in to carry it over from an earlier queue.
+
+    Futures of votes and deletions resolve to True if the request was sent and False if the action was skipped. Futures
+    of replies resolve to the list of posts returned by the server (see Pydel.reply_to_jodel), or None if skipped. Futures
+    of failed actions raise the exception the request failed with.
+    """
+    def __init__(self, pydel_instance, max_workers=DEFAULT_MAX_WORKERS, voted=None):
+        """
+        Args:
+            pydel_instance: Authenticated Pydel instance sending the actions.
+            (optional) max_workers: Maximum number of simultaneous requests.
+            (optional) voted: Dictionary mapping the post_id of posts already voted on to 'up' or 'down'.
+        """
+        self.max_workers = max_workers
+        self.voted = voted if voted is not None else {}
+
+        self._pydel_instance = pydel_instance
+        self._pending = OrderedDict()  # (kind, post_id, message) -> _Action
+        self._actions = []  # Every action queued since the last flush, including those skipped
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def upvote(self, post):
+        """
+        Queues an upvote of a post (a Post object or a post_id).
+        """
+        return self._add(UPVOTE, post)
+
+    def downvote(self, post):
+        """
+        Queues a downvote of a post (a Post object or a post_id).
+        """
+        return self._add(DOWNVOTE, post)
+
+    def delete(self, post):
+        """
+        Queues the deletion of a post (a Post object or a post_id).
+        """
+        return self._add(DELETE, post)
+
+    def reply(self, post, message):
+        """
+        Queues a reply to a post (a Post object, whose color the reply takes).
+
+        Raises:
+            ValueError: post is a post_id rather than a Post object.
+        """
+        if isinstance(post, str):
+            raise ValueError("A reply needs the Post object it answers, not its post_id")
+        return self._add(REPLY, post, message)
+
+    def _skip(self, action, reason):
+        action.status = SKIPPED
+        action.reason = reason
+        action.future.set_result(None if action.kind == REPLY else False)
+
+    def _add(self, kind, post, message=None):
+        post_id = post if isinstance(post, str) else post.post_id
+        key = (kind, post_id, message)
+
+        with self._lock:
+            queued = self._pending.get(key)
+            if queued is not None:
+                return queued.future
+
+            action = _Action(kind, post, post_id, message)
+            self._actions.append(action)
+
+            if kind in (UPVOTE, DOWNVOTE):
+                opposite = DOWNVOTE if kind == UPVOTE else UPVOTE
+                if post_id in self.voted or getattr(post, 'voted', None) is not None:
+                    self._skip(action, 'already voted')
+                elif (DELETE, post_id, None) in self._pending:
+                    self._skip(action, 'post is being deleted')
+                elif (opposite, post_id, None) in self._pending:
+                    self._skip(action, 'opposite vote queued')
+
+            elif kind == REPLY:
+                if (DELETE, post_id, None) in self._pending:
+                    self._skip(action, 'post is being deleted')
+
+            else:
+                for other in [k for k in self._pending if k[1] == post_id]:
+                    self._skip(self._pending.pop(other), 'post is being deleted')
+
+            if action.status is None:
+                self._pending[key] = action
+            return action.future
+
+    def _send(self, action):
+        p = self._pydel_instance
+        try:
+            if action.kind == REPLY:
+                result = p.reply_to_jodel(action.message, action.post)
+            elif action.kind == DELETE:
+                p._delete_post_id(action.post_id)
+                result = True
+            else:
+                direction = 'up' if action.kind == UPVOTE else 'down'
+                if isinstance(action.post, _PostActions):  # Also records the vote on the post
+                    (p.upvote_post if action.kind == UPVOTE else p.downvote_post)(action.post)
+                else:
+                    p._vote_post_id(action.post_id, direction)
+                with self._lock:
+                    self.voted[action.post_id] = direction
+                result = True
+        except Exception as e:
+            action.status = FAILED
+            action.error = e
+            action.future.set_exception(e)
+            return
+
+        action.status = SENT
+        action.future.set_result(result)
+
+    def flush(self):
+        """
+        Sends all queued actions and waits for them to finish.
+
+        Returns:
+            List with one dictionary per action queued since the last flush, in the order they were queued, mapping
+            'action' (UPVOTE, DOWNVOTE, REPLY or DELETE), 'post_id', 'status' (SENT, SKIPPED or FAILED), 'reason' (why
+            it was skipped) and 'error' (the exception it failed with).
+        """
+        with self._lock:
+            pending = list(self._pending.values())
+            actions = self._actions
+            self._pending = OrderedDict()
+            self._actions = []
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as executor:
+                list(executor.map(self._send, pending))
+
+        return [a.record() for a in actions]
@@ -8,5 +8,10 @@ setup(
     author='Mads Rolsdorph',
     author_email='m.rolsdorph@gmail.com',
     license='MIT',
-    packages=['pydel']
+    packages=['pydel'],
+    python_requires='>=3.7',
+    extras_require={
+        'async': ['aiohttp'],
+        'frame': ['numpy']
+    }
 )
\ No newline at end of file
@@ -0,0 +1,62 @@
+import unittest
+
+from pydel import Post
+from pydel.conversation import RESUME_OVERLAP, ConversationFetcher
+
+PAGE_SIZE = 5
+
+
+class FakeThread:
+    """
+    Stands in for a Pydel instance, serving one post and its replies the way the details endpoint pages them.
+    """
+    _post_class = Post
+
+    def __init__(self, replies):
+        self.replies = ['r{}'.format(i) for i in range(replies)]
+        self.skips = []
+
+    def add(self, count):
+        start = len(self.replies) and int(self.replies[-1][1:]) + 1
+        self.replies.extend('r{}'.format(i) for i in range(start, start + count))
+
+    def delete(self, count):
+        del self.replies[:count]
+
+    def _get_post_details(self, post_id, skip=0):
+        self.skips.append(skip)
+        page = self.replies[skip:skip + PAGE_SIZE]
+        end = skip + len(page)
+        return {'details': {'post_id': post_id, 'vote_count': 0},
+                'replies': [{'post_id': reply_id} for reply_id in page],
+                'next': end if end < len(self.replies) else None}
+
+
+class RefreshTest(unittest.TestCase):
+    def test_refresh_after_deleted_replies(self):
+        thread = FakeThread(12)
+        fetcher = ConversationFetcher(thread)
+        conversation = fetcher.fetch('op')
+        self.assertEqual(len(conversation), 12)
+
+        # More replies deleted than are fetched again when resuming
+        thread.delete(11)
+        thread.add(3)
+        added = fetcher.refresh(conversation)
+
+        self.assertEqual([node.post_id for node in added], ['r12', 'r13', 'r14'])
+        self.assertTrue(conversation.complete)
+
+    def test_refresh_resumes_shortly_before_the_last_reply(self):
+        thread = FakeThread(12)
+        fetcher = ConversationFetcher(thread)
+        conversation = fetcher.fetch('op')
+        del thread.skips[:]
+
+        self.assertEqual(fetcher.refresh(conversation), [])
+        self.assertEqual(thread.skips[0], 12 - RESUME_OVERLAP)
+        self.assertEqual(len(conversation), 12)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from pydel import Pydel
+
+from benchmarks.stub_server import StubServer
+
+FEED = 'GET /api/v2/posts/location/'
+
+
+class FeedCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer(posts=25)
+        self.stub.start()
+        self.pydel = Pydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=self.stub.url)
+        self.pydel.authenticate()
+
+    def tearDown(self):
+        self.pydel.close()
+        self.stub.stop()
+
+    def test_pages_until_the_end_of_the_feed(self):
+        cursor = self.pydel.paginate('newest', page_size=10)
+        self.assertEqual([post.post_id for post in cursor],
+                         [post.post_id for post in self.pydel.get_feed('newest')])
+        # Three pages of posts, and the empty one after them
+        self.assertEqual(cursor.pages_fetched, 4)
+        self.assertEqual(self.stub.requests.get(FEED), 5)
+
+    def test_continues_after(self):
+        posts = [post.post_id for post in self.pydel.get_feed('newest')]
+        cursor = self.pydel.paginate('newest', page_size=10, max_posts=12)
+        self.assertEqual([post.post_id for post in cursor], posts[:12])
+
+        cursor = self.pydel.paginate('newest', page_size=10, after=cursor.after, prefetch=False)
+        self.assertEqual([post.post_id for post in cursor], posts[12:])
+
+
+if __name__ == '__main__':
+    unittest.main()
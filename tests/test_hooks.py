@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pydel import Pydel
+from pydel.hooks import (DECODE, ERROR, REAUTH, RESPONSE, Hook, MetricsAggregator, PrometheusTextExporter,
+                         RequestEvent, dispatch)
+from pydel.pydel_exceptions import UnexpectedResponseCodeException
+
+from benchmarks.stub_server import StubServer
+
+
+class RecordingHook(Hook):
+    """
+    Keeps every event it is passed, whatever its kind.
+    """
+    def __init__(self):
+        self.events = []
+
+    def on_request_start(self, event):
+        self.events.append(event)
+
+    on_response = on_error = on_reauth = on_decode = on_request_start
+
+
+def response(endpoint, total, status=200, retries=0, bytes_in=100, bytes_out=10, kind=RESPONSE):
+    return RequestEvent(kind, 'uid', 'GET', endpoint, status, bytes_out, bytes_in, retries,
+                        {'wait': 0.0, 'server': total, 'download': 0.0, 'total': total})
+
+
+class DispatchTest(unittest.TestCase):
+    def test_dispatch_by_kind(self):
+        recording = RecordingHook()
+        dispatch((Hook(), recording), response('karma', 0.1, kind=ERROR))
+        self.assertEqual([e.kind for e in recording.events], [ERROR])
+
+    def test_events_of_requests(self):
+        recording = RecordingHook()
+        with StubServer() as stub:
+            p = Pydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=stub.url, hooks=[recording])
+            p.authenticate()
+            p.get_karma()
+            p.remove_hook(recording)
+            p.get_karma()
+            p.add_hook(recording)
+            with self.assertRaises(UnexpectedResponseCodeException):
+                p._get_post_details('unknown')
+            p.close()
+
+        self.assertEqual([(e.kind, e.endpoint, e.status) for e in recording.events],
+                         [(REAUTH, 'register', 200),
+                          ('request_start', 'karma', None), (RESPONSE, 'karma', 200), (DECODE, 'karma', 200),
+                          ('request_start', 'details', None), (ERROR, 'details', 404)])
+        karma = recording.events[2]
+        self.assertEqual(karma.bytes_in, len(b'{"karma":42}'))
+        self.assertEqual(sorted(karma.timings), ['download', 'server', 'total', 'wait'])
+        self.assertAlmostEqual(karma.timings['total'],
+                               karma.timings['wait'] + karma.timings['server'] + karma.timings['download'])
+        self.assertIsInstance(recording.events[-1].error, UnexpectedResponseCodeException)
+
+
+class MetricsAggregatorTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsAggregator()
+        for event in (response('karma', 0.004), response('karma', 0.3, retries=1), response('karma', 20),
+                      response('karma', 0.05, status=503, kind=ERROR), response('newest', 0.01, bytes_in=None)):
+            dispatch((self.metrics,), event)
+        dispatch((self.metrics,), RequestEvent(DECODE, 'uid', 'GET', 'karma', 200, timings={'decode': 0.5}))
+        dispatch((self.metrics,), RequestEvent(REAUTH, 'uid', 'POST', 'refresh', 200, timings={'total': 0.1}))
+        dispatch((self.metrics,), RequestEvent(REAUTH, 'uid', 'POST', 'refresh', error=ValueError()))
+
+    def test_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        self.assertEqual((snapshot['reauths'], snapshot['reauth_errors']), (2, 1))
+        self.assertEqual(sorted(snapshot['endpoints']), ['karma', 'newest'])
+
+        karma = snapshot['endpoints']['karma']
+        self.assertEqual((karma['requests'], karma['errors'], karma['error_rate'], karma['retries']), (3, 1, 0.25, 1))
+        self.assertEqual(karma['statuses'], {200: 3, 503: 1})
+        self.assertEqual(dict(karma['latency_buckets']),
+                         {0.005: 1, 0.01: 1, 0.025: 1, 0.05: 2, 0.1: 2, 0.25: 2, 0.5: 3, 1: 3, 2.5: 3, 5: 3, 10: 3,
+                          float('inf'): 4})
+        self.assertAlmostEqual(karma['latency_sum'], 20.354)
+        self.assertAlmostEqual(karma['phase_sums']['server'], 20.354)
+        self.assertEqual((karma['bytes_in'], karma['bytes_out']), (400, 40))
+        self.assertEqual((karma['decodes'], karma['decode_sum']), (1, 0.5))
+
+        newest = snapshot['endpoints']['newest']
+        self.assertEqual((newest['requests'], newest['bytes_in'], newest['error_rate']), (1, 0, 0.0))
+
+    def test_reset(self):
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot(), {'reauths': 0, 'reauth_errors': 0, 'endpoints': {}})
+
+
+class PrometheusTextExporterTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = MetricsAggregator()
+        dispatch((self.metrics,), response('karma', 0.02))
+        dispatch((self.metrics,), response('karma', 3, kind=ERROR))
+        dispatch((self.metrics,), response('a "quoted" \\ name', 0.02))
+
+    def test_render(self):
+        lines = PrometheusTextExporter(prefix='test').render(self.metrics.snapshot()).splitlines()
+        for line in ('# TYPE test_request_seconds histogram',
+                     'test_reauths_total 0',
+                     'test_requests_total{endpoint="karma"} 1',
+                     'test_errors_total{endpoint="karma"} 1',
+                     'test_request_seconds_bucket{endpoint="karma",le="0.01"} 0',
+                     'test_request_seconds_bucket{endpoint="karma",le="0.025"} 1',
+                     'test_request_seconds_bucket{endpoint="karma",le="5"} 2',
+                     'test_request_seconds_bucket{endpoint="karma",le="+Inf"} 2',
+                     'test_request_seconds_sum{endpoint="karma"} 3.02',
+                     'test_request_seconds_count{endpoint="karma"} 2',
+                     'test_bytes_received_total{endpoint="karma"} 200',
+                     'test_bytes_sent_total{endpoint="karma"} 20',
+                     'test_requests_total{endpoint="a \\"quoted\\" \\\\ name"} 1'):
+            self.assertIn(line, lines)
+
+    def test_export_writes_the_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'pydel.prom')
+            exporter = PrometheusTextExporter(path)
+            text = exporter.export(self.metrics.snapshot())
+            with open(path) as f:
+                self.assertEqual(f.read(), text)
+            self.assertTrue(text.endswith('\n'))
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+import threading
+import unittest
+
+from pydel import Pydel
+from pydel.hub import FeedHub
+
+from benchmarks.stub_server import StubServer
+
+ACCOUNTS = 5
+FEED = 'GET /api/v2/posts/location/'
+
+
+class FakeResponse:
+    def __init__(self, posts):
+        self.posts = posts
+
+
+class FakeClient:
+    """
+    Stands in for a Pydel instance, answering feed requests with the posts as this account sees them.
+    """
+    def __init__(self, device_uid, posts, lat=63.43, lng=10.39):
+        self._device_uid = device_uid
+        self._lat = lat
+        self._lng = lng
+        self.posts = posts
+        self.requests = 0
+
+    def get_device_uid(self):
+        return self._device_uid
+
+    def _authenticated_request(self, method, url, endpoint=None, params=None):
+        self.requests += 1
+        return FakeResponse(self.posts)
+
+    def _decode(self, req, endpoint):
+        return {'posts': req.posts}
+
+
+def feed_as_seen_by_author():
+    return [{'post_id': 'voted', 'message': 'a', 'voted': 'up', 'post_own': 'friend'},
+            {'post_id': 'own', 'message': 'b', 'post_own': 'own',
+             'children': [{'post_id': 'reply', 'message': 'c', 'post_own': 'own', 'voted': 'down'},
+                          {'post_id': 'other', 'message': 'd', 'post_own': 'friend'}]},
+            {'post_id': 'plain', 'message': 'e', 'post_own': 'friend'}]
+
+
+class PersonalizeTest(unittest.TestCase):
+    def setUp(self):
+        self.hub = FeedHub(interval=60)
+        self.author = FakeClient('author', feed_as_seen_by_author())
+        self.reader = FakeClient('reader', None)
+
+    def test_fields_are_not_leaked(self):
+        fetched = self.hub.fetch(self.author, 'newest')
+        read = self.hub.fetch(self.reader, 'newest')
+
+        self.assertEqual(fetched, feed_as_seen_by_author())
+        self.assertEqual((self.author.requests, self.reader.requests), (1, 0))
+        self.assertNotIn('voted', read[0])
+        self.assertEqual(read[1]['post_own'], 'friend')
+        self.assertEqual([(c.get('voted'), c['post_own']) for c in read[1]['children']],
+                         [(None, 'friend'), (None, 'friend')])
+        # Posts without per-account fields are shared, not copied
+        self.assertIs(read[2], fetched[2])
+        self.assertEqual(self.hub.stats()['personalized'], 2)
+
+        # Nor are those of the reader given back to the author
+        self.hub.learn_vote(self.reader, 'plain', 'down')
+        self.hub.learn(self.reader, [{'post_id': 'voted', 'voted': 'down'}])
+        read = self.hub.fetch(self.reader, 'newest')
+        fetched = self.hub.fetch(self.author, 'newest')
+        self.assertEqual((read[0]['voted'], read[2]['voted']), ('down', 'down'))
+        self.assertEqual(fetched, feed_as_seen_by_author())
+
+    def test_author_votes_after_fetching(self):
+        self.hub.fetch(self.author, 'newest')
+        self.hub.learn_vote(self.author, 'plain', 'up')
+        self.assertEqual(self.hub.fetch(self.author, 'newest')[2]['voted'], 'up')
+        self.assertNotIn('voted', self.hub.fetch(self.reader, 'newest')[2])
+        self.assertEqual(self.author.requests, 1)
+
+    def test_locations_are_fetched_separately(self):
+        elsewhere = FakeClient('elsewhere', [], lat=59.91, lng=10.75)
+        self.hub.fetch(self.author, 'newest')
+        self.assertEqual(self.hub.fetch(elsewhere, 'newest'), [])
+        self.assertEqual(self.hub.fetch(self.reader, 'newest', 59.91, 10.75), [])
+        self.assertEqual(elsewhere.requests, 1)
+        self.assertEqual(self.hub.stats()['upstream'], 2)
+
+    def test_only_location_feeds(self):
+        with self.assertRaises(KeyError):
+            self.hub.fetch(self.author, 'mine')
+
+
+class SharedFeedTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer(latency=0.05)
+        self.stub.start()
+        self.hub = FeedHub(interval=60)
+        self.accounts = [Pydel('{:064d}'.format(i), 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen',
+                               base_url=self.stub.url, hub=self.hub, write_delay=0) for i in range(ACCOUNTS)]
+        for p in self.accounts:
+            p.authenticate()
+
+    def tearDown(self):
+        for p in self.accounts:
+            p.close()
+        self.stub.stop()
+
+    def test_one_request_serves_every_account(self):
+        feeds = {}
+        barrier = threading.Barrier(ACCOUNTS)
+
+        def read(p):
+            barrier.wait()
+            feeds[p] = p.get_newest_jodels()
+
+        threads = [threading.Thread(target=read, args=(p,)) for p in self.accounts]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.stub.requests.get(FEED), 1)
+        stats = self.hub.stats()
+        self.assertEqual((stats['reads'], stats['upstream'], stats['coalesced'] + stats['shared']),
+                         (ACCOUNTS, 1, ACCOUNTS - 1))
+
+        post_ids = [post.post_id for post in feeds[self.accounts[0]]]
+        self.assertEqual(len(post_ids), 60)
+        for p, posts in feeds.items():
+            self.assertEqual([post.post_id for post in posts], post_ids)
+            self.assertTrue(all(post._pydel_instance is p for post in posts))
+
+    def test_votes_stay_with_the_account(self):
+        voter, other = self.accounts[:2]
+        post = voter.get_newest_jodels()[0]
+        self.assertIsNone(post.voted)
+        self.assertTrue(voter.upvote_post(post))
+
+        # The vote dropped the shared feed, which is fetched again
+        self.assertEqual(voter.get_newest_jodels()[0].voted, 'up')
+        self.assertIsNone(other.get_newest_jodels()[0].voted)
+        self.assertEqual(self.stub.requests.get(FEED), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
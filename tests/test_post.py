@@ -0,0 +1,52 @@
+import random
+import unittest
+
+from pydel import CompactPost, Post, _post_to_json
+
+from benchmarks.payloads import make_post
+
+ATTRIBUTES = ('post_id', 'message', 'color', 'vote_count', 'reply_count', 'child_count', 'voted', 'post_own',
+              'parent_creator', 'own_post', 'reply_from_op', 'has_replies', 'created_at', 'updated_at', 'location',
+              'user_handle', 'distance')
+
+
+def sample_post():
+    json_dict = make_post(1, random.Random(1), replies=2)
+    json_dict['voted'] = 'up'
+    json_dict['post_own'] = 'own'
+    json_dict['parent_creator'] = 0
+    json_dict['children'][0]['parent_creator'] = 1
+    return json_dict
+
+
+class CompactPostTest(unittest.TestCase):
+    def assertSamePost(self, post, compact):
+        for attribute in ATTRIBUTES:
+            self.assertEqual(getattr(post, attribute), getattr(compact, attribute), attribute)
+        self.assertEqual(post.children, compact.children)
+        self.assertEqual([r.post_id for r in post.replies], [r.post_id for r in compact.replies])
+        for reply, compact_reply in zip(post.replies, compact.replies):
+            self.assertEqual(reply.reply_from_op, compact_reply.reply_from_op)
+
+    def test_same_attributes_as_post(self):
+        json_dict = sample_post()
+        self.assertSamePost(Post(json_dict), CompactPost(json_dict))
+
+    def test_json_round_trip(self):
+        json_dict = sample_post()
+        self.assertEqual(_post_to_json(CompactPost(json_dict)), json_dict)
+
+        compact = CompactPost(dict(json_dict, voted=None))
+        compact._record_vote('down')
+        self.assertEqual(_post_to_json(compact)['voted'], 'down')
+
+    def test_missing_keys(self):
+        compact = CompactPost({'post_id': 'abc'})
+        self.assertEqual((compact.child_count, compact.post_own, compact.parent_creator, compact.children),
+                         (0, None, None, []))
+        self.assertEqual(_post_to_json(compact), {'post_id': 'abc', 'message': '', 'color': 'FFFFFF', 'vote_count': 0,
+                                                  'child_count': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import threading
+import unittest
+
+from pydel.scheduler import PollScheduler
+
+
+class FakeClient:
+    """
+    Stands in for a Pydel instance, counting the feeds it is asked for.
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def get_feed(self, feed, lat=None, lng=None):
+        self.calls += 1
+        return []
+
+
+class RemoveTest(unittest.TestCase):
+    def test_removed_target_is_never_polled(self):
+        scheduler = PollScheduler(max_rps=100)
+        kept, removed = FakeClient(), FakeClient()
+        scheduler.add(kept)
+        scheduler.remove(scheduler.add(removed))
+
+        polled = threading.Event()
+        scheduler.start(lambda target, posts: polled.set())
+        try:
+            self.assertTrue(polled.wait(5))
+        finally:
+            scheduler.stop()
+
+        self.assertEqual(kept.calls, 1)
+        self.assertEqual(removed.calls, 0)
+        self.assertEqual(len(scheduler), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pydel.search import SearchIndex, tokenize
+
+from benchmarks.payloads import make_timestamp
+
+MESSAGES = {
+    'a': 'Hei og hallo fra Trondheim!',
+    'b': 'hallo, HEI',
+    'c': 'Kaffe før eksamen',
+    'd': 'Eksamen i morgen. Ingen kaffe :(',
+    'e': 'Trondhjem er fint',
+    'f': 'Regn, regn og regn i Trondheim',
+}
+
+
+def sample_posts():
+    # Created a minute apart in the order above, with votes in the opposite order
+    return [{'post_id': post_id, 'message': MESSAGES[post_id], 'vote_count': 10 - i, 'created_at': make_timestamp(i * 60)}
+            for i, post_id in enumerate(sorted(MESSAGES))]
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add(sample_posts())
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'index')
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+
+    def assertMatches(self, query, post_ids, index=None):
+        self.assertEqual(sorted((index or self.index).search(query)), sorted(post_ids), query)
+
+    def assertSameResults(self, index, other):
+        for query in ('hei', 'trond*', '"regn i trondheim"', 'kaffe OR hallo', 'NOT regn', 'e*'):
+            self.assertEqual(index.search(query), other.search(query), query)
+
+    def reload(self, index):
+        index.save(self.path)
+        loaded = SearchIndex.load(self.path)
+        self.addCleanup(loaded.close)
+        return loaded
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('Straße, ÆØÅ-ﬁne 😀 x'), ['strasse', 'æøå', 'fine', 'x'])
+
+    def test_words(self):
+        self.assertMatches('hei', ['a', 'b'])
+        self.assertMatches('HALLO', ['a', 'b'])
+        self.assertMatches('kaffe eksamen', ['c', 'd'])
+        self.assertMatches('kaffe AND eksamen', ['c', 'd'])
+        self.assertMatches('kaffe regn', [])
+        self.assertMatches('snø', [])
+
+    def test_phrases(self):
+        self.assertMatches('"hei og hallo"', ['a'])
+        self.assertMatches('"hallo hei"', ['b'])
+        self.assertMatches('"hei hallo"', [])
+        self.assertMatches('"regn i trondheim"', ['f'])
+        self.assertMatches('"regn regn"', ['f'])
+        self.assertMatches('"i morgen" kaffe', ['d'])
+
+    def test_prefix(self):
+        self.assertMatches('trond*', ['a', 'e', 'f'])
+        self.assertMatches('trondh*', ['a', 'e', 'f'])
+        self.assertMatches('trondhe*', ['a', 'f'])
+        self.assertMatches('eks*', ['c', 'd'])
+        self.assertMatches('x*', [])
+
+    def test_not_and_or(self):
+        self.assertMatches('kaffe -morgen', ['c'])
+        self.assertMatches('kaffe NOT morgen', ['c'])
+        self.assertMatches('NOT regn', ['a', 'b', 'c', 'd', 'e'])
+        self.assertMatches('trond* -regn', ['a', 'e'])
+        self.assertMatches('regn OR kaffe', ['c', 'd', 'f'])
+        self.assertMatches('regn OR kaffe OR hei', ['a', 'b', 'c', 'd', 'f'])
+
+    def test_grouping(self):
+        self.assertMatches('(regn OR kaffe) trondheim', ['f'])
+        self.assertMatches('trond* -(regn OR fint)', ['a'])
+        self.assertMatches('(hei OR fint) (trondheim OR trondhjem)', ['a', 'e'])
+        self.assertMatches('(regn OR kaffe', ['c', 'd', 'f'])  # Unbalanced parentheses are forgiven
+        self.assertMatches('regn) OR kaffe', ['c', 'd', 'f'])
+
+    def test_order(self):
+        self.assertEqual(self.index.search('trond*'), ['f', 'e', 'a'])
+        self.assertEqual(self.index.search('trond*', descending=False), ['a', 'e', 'f'])
+        self.assertEqual(self.index.search('trond*', order_by='vote_count'), ['a', 'e', 'f'])
+        self.assertEqual(self.index.search('NOT regn', limit=2), ['e', 'd'])
+        self.assertEqual(self.index.search('NOT regn', order_by=None, descending=False, limit=2), ['a', 'b'])
+        self.assertEqual(self.index.count('NOT regn'), 5)
+        with self.assertRaises(ValueError):
+            self.index.search('hei', order_by='message')
+
+    def test_updates(self):
+        self.assertEqual(self.index.add([{'post_id': 'a', 'message': MESSAGES['a'], 'vote_count': 100}]), 0)
+        self.assertEqual(self.index.search('trond*', order_by='vote_count')[0], 'a')
+        self.assertEqual(self.index.stats()['deleted'], 0)
+
+        self.index.add([{'post_id': 'a', 'message': 'Snø i Trondheim'}])
+        self.assertMatches('hei', ['b'])
+        self.assertMatches('snø', ['a'])
+        self.assertEqual(len(self.index), 6)
+        self.assertEqual(self.index.stats()['deleted'], 1)
+
+    def test_remove(self):
+        self.assertEqual(self.index.remove(['a', 'f', 'unknown']), 2)
+        self.assertEqual(len(self.index), 4)
+        self.assertNotIn('a', self.index)
+        self.assertMatches('trond*', ['e'])
+        self.assertMatches('NOT hei', ['c', 'd', 'e'])
+
+    def test_save_and_load_after_removals(self):
+        self.index.remove(['a', 'f'])
+        self.index.add([{'post_id': 'c', 'message': 'Kaffe etter eksamen'}])
+        loaded = self.reload(self.index)
+
+        self.assertEqual(len(loaded), 4)
+        self.assertNotIn('a', loaded)
+        self.assertIn('e', loaded)
+        self.assertSameResults(loaded, self.index)
+        self.assertMatches('"etter eksamen"', ['c'], loaded)
+        self.assertEqual(loaded.stats()['deleted'], 3)
+
+        # Posts added to a loaded index are saved with the rest
+        loaded.add([{'post_id': 'g', 'message': 'Hei igjen, Trondheim'}])
+        loaded.remove(['b'])
+        reloaded = self.reload(loaded)
+        self.assertSameResults(reloaded, loaded)
+        self.assertMatches('hei', ['g'], reloaded)
+
+    def test_compact(self):
+        self.index.remove(['a'])
+        self.index.add([{'post_id': 'c', 'message': 'Kaffe etter eksamen', 'vote_count': 1,
+                         'created_at': make_timestamp(3600)}])
+        expected = dict((query, self.index.search(query)) for query in ('hei', 'trond*', 'eksamen', 'NOT regn'))
+
+        self.index.compact()
+        self.assertEqual(self.index.stats()['deleted'], 0)
+        self.assertEqual(len(self.index), 5)
+        for query, post_ids in expected.items():
+            self.assertEqual(self.index.search(query), post_ids, query)
+        self.assertEqual(self.index.search('eksamen', order_by=None, descending=False), ['d', 'c'])
+
+        loaded = self.reload(self.index)
+        for query, post_ids in expected.items():
+            self.assertEqual(loaded.search(query), post_ids, query)
+
+    def test_compact_loaded_index(self):
+        self.index.remove(['b', 'e'])
+        loaded = self.reload(self.index)
+        loaded.compact()
+        self.assertEqual(loaded.stats()['deleted'], 0)
+        self.assertSameResults(loaded, self.index)
+
+        reloaded = self.reload(loaded)
+        self.assertSameResults(reloaded, self.index)
+
+    def test_load_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not an index')
+        with self.assertRaises(ValueError):
+            SearchIndex.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
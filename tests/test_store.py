@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from pydel.store import PostStore
+
+from benchmarks.payloads import make_post
+
+
+def sample_posts(n):
+    rng = random.Random(1)
+    return [make_post(i, rng) for i in range(n)]
+
+
+class PostStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = PostStore(':memory:')
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_add_returns_new_posts(self):
+        posts = sample_posts(5)
+        self.assertEqual(self.store.add(posts[:3], seen_at=1), 3)
+        self.assertEqual(self.store.add(posts, seen_at=2), 2)
+        self.assertEqual(len(self.store), 5)
+        self.assertIn(posts[4]['post_id'], self.store)
+
+    def test_upsert_stores_every_change(self):
+        post = sample_posts(1)[0]
+        self.store.add([post], seen_at=1)
+
+        changed = dict(post, message='edited', voted='up', location=dict(post['location'], name='Elsewhere'))
+        self.assertEqual(self.store.add([changed], seen_at=2), 0)
+
+        stored = self.store.get(post['post_id'])
+        self.assertEqual(stored._json_dict, changed)
+        self.assertEqual(len(self.store.query(location_name='Elsewhere')), 1)
+        # The counts did not change, so neither did the history
+        self.assertEqual(self.store.history(post['post_id']), [(1, post['vote_count'], post['child_count'])])
+
+        self.store.add([dict(changed, vote_count=post['vote_count'] + 1)], seen_at=3)
+        self.assertEqual(self.store.history(post['post_id']),
+                         [(1, post['vote_count'], post['child_count']),
+                          (3, post['vote_count'] + 1, post['child_count'])])
+
+    def test_unchanged_posts_only_get_last_seen_updated(self):
+        posts = sample_posts(3)
+        self.store.add(posts, seen_at=1)
+        self.store.add(posts, seen_at=2)
+
+        for post in posts:
+            self.assertEqual(len(self.store.history(post['post_id'])), 1)
+        self.assertEqual(self.store._connection.execute('SELECT MIN(last_seen), MAX(first_seen) FROM posts').fetchone(),
+                         (2, 1))
+
+    def test_last_occurrence_wins(self):
+        post = sample_posts(1)[0]
+        self.assertEqual(self.store.add([post, dict(post, message='second')], seen_at=1), 1)
+        self.assertEqual(self.store.get(post['post_id']).message, 'second')
+
+    def test_query_order(self):
+        posts = sample_posts(6)
+        for i, post in enumerate(posts):
+            post['vote_count'] = (i * 7) % 6
+        self.store.add(posts)
+
+        by_creation = [p['post_id'] for p in posts]
+        self.assertEqual([p.post_id for p in self.store.query()], by_creation[::-1])
+        self.assertEqual([p.post_id for p in self.store.query(descending=False, limit=2)], by_creation[:2])
+
+        by_votes = [p['post_id'] for p in sorted(posts, key=lambda p: p['vote_count'])]
+        self.assertEqual([p.post_id for p in self.store.query(order_by='vote_count', descending=False)], by_votes)
+        self.assertEqual([p.post_id for p in self.store.query(order_by='vote_count', min_votes=3)],
+                         by_votes[:2:-1])
+
+        with self.assertRaises(ValueError):
+            self.store.query(order_by='message')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import json
+import unittest
+
+from pydel import Pydel
+from pydel.hub import FeedHub
+from pydel.streaming import iter_json_array
+
+from benchmarks.stub_server import StubServer
+
+ELEMENTS = [
+    {'message': 'quote " backslash \\ brackets ]}[{ comma , colon :', 'n': -12.5e-3, 'big': 12345678901234567890},
+    'æøå – 😀',
+    '\\"',
+    12345,
+    -0.5,
+    1e10,
+    True,
+    False,
+    None,
+    [],
+    {},
+    [[1, [2, {'x': '}'}]], {'y': []}],
+]
+
+
+def chunks(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def assertStreams(self, document, expected, key=None, encoding='utf-8'):
+        data = document.encode(encoding)
+        for size in range(1, 12):  # Puts chunk boundaries everywhere, inside strings, numbers and literals
+            self.assertEqual(list(iter_json_array(chunks(data, size), key, encoding)), expected, size)
+
+    def test_array(self):
+        self.assertStreams(json.dumps(ELEMENTS, ensure_ascii=False), ELEMENTS)
+        self.assertStreams(json.dumps(ELEMENTS, indent=2), ELEMENTS)
+
+    def test_key(self):
+        document = {'first': {'posts': 'not this one'}, 'skipped': [1, '"]'], 'posts': ELEMENTS, 'after': 1}
+        self.assertStreams(json.dumps(document, ensure_ascii=False), ELEMENTS, key='posts')
+
+    def test_empty(self):
+        self.assertStreams('[]', [])
+        self.assertStreams(' { "posts" : [ ] } ', [], key='posts')
+
+    def test_encodings(self):
+        document = json.dumps(ELEMENTS, ensure_ascii=False)
+        self.assertStreams(document, ELEMENTS, encoding='utf-16')
+        self.assertStreams(json.dumps(ELEMENTS), ELEMENTS, encoding='latin-1')
+
+    def test_missing_key(self):
+        with self.assertRaises(KeyError):
+            list(iter_json_array([b'{"other": [1, 2]}'], 'posts'))
+        with self.assertRaises(KeyError):
+            list(iter_json_array([b'{}'], 'posts'))
+
+    def test_malformed(self):
+        documents = ['[1, 2', '[{"a": 1}', '["abc', '[1 2]', '[1,]', '[tru]', '{"posts": 1}', '"posts"', '',
+                     '[{"a": }]', '["\\x"]']
+        for document in documents:
+            for size in (1, 3, 100):
+                with self.assertRaises(ValueError, msg=(document, size)):
+                    list(iter_json_array(chunks(document.encode(), size), 'posts' if 'posts' in document else None))
+
+    def test_elements_before_an_error(self):
+        elements = iter_json_array([b'[1, {"a": 2}, {"b": '])
+        self.assertEqual(next(elements), 1)
+        self.assertEqual(next(elements), {'a': 2})
+        with self.assertRaises(ValueError):
+            next(elements)
+
+
+class IterFeedTest(unittest.TestCase):
+    def test_same_posts_as_get_feed(self):
+        with StubServer() as stub:
+            p = Pydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=stub.url)
+            p.authenticate()
+            self.assertEqual([post._json_dict for post in p.iter_feed('newest', chunk_size=1000)],
+                             [post._json_dict for post in p.get_feed('newest')])
+            p.close()
+
+    def test_location_feeds_go_through_the_hub(self):
+        with StubServer() as stub:
+            hub = FeedHub(interval=60)
+            p = Pydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=stub.url, hub=hub)
+            p.authenticate()
+            get_posts = [post.post_id for post in p.get_newest_jodels()]
+            iter_posts = [post.post_id for post in p.iter_newest_jodels()]
+            p.close()
+
+            self.assertEqual(iter_posts, get_posts)
+            self.assertEqual(stub.requests.get('GET /api/v2/posts/location/'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+import unittest
+import warnings
+
+from pydel import Pydel
+from pydel.async_pydel import AsyncPydel
+
+from benchmarks.stub_server import StubServer
+
+THREADS = 10
+REFRESH = 'POST /api/v2/users/refreshToken'
+REGISTER = 'POST /api/v2/users'
+
+
+class ConcurrentRenewalTest(unittest.TestCase):
+    def setUp(self):
+        # Slow responses make the threads overlap while the token is being renewed
+        self.stub = StubServer(latency=0.05)
+        self.stub.start()
+        self.pydel = Pydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=self.stub.url,
+                           write_delay=0)
+        self.pydel.authenticate()
+
+    def tearDown(self):
+        self.pydel.close()
+        self.stub.stop()
+
+    def run_threads(self, function):
+        barrier = threading.Barrier(THREADS)
+        errors = []
+
+        def run():
+            barrier.wait()
+            try:
+                function()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_expired_token_is_refreshed_once(self):
+        self.pydel._expiration_date = time.time() - 1
+        self.run_threads(self.pydel.get_karma)
+
+        self.assertEqual(self.stub.requests.get(REFRESH), 1)
+        self.assertEqual(self.stub.requests.get(REGISTER), 1)
+        self.assertEqual(self.stub.requests.get('GET /api/v2/users/karma'), THREADS)
+        self.assertGreater(self.pydel._expiration_date, time.time())
+
+    def test_concurrent_reads_share_the_token(self):
+        token = self.pydel._access_token
+        self.run_threads(self.pydel.get_newest_jodels)
+
+        self.assertIsNone(self.stub.requests.get(REFRESH))
+        self.assertEqual(self.pydel._access_token, token)
+
+
+class AutoRefreshTest(unittest.TestCase):
+    def test_margin_longer_than_token_lifetime(self):
+        with StubServer(token_lifetime=5) as stub:
+            p = Pydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=stub.url, refresh_margin=300)
+            p.authenticate()
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                p.start_auto_refresh()
+                time.sleep(1)
+                p.stop_auto_refresh()
+            p.close()
+
+            # Renewed once right away, and then not again until halfway through the new token's lifetime
+            self.assertEqual(stub.requests.get(REFRESH), 1)
+            self.assertEqual(len(caught), 1)
+
+
+class AsyncConcurrentRenewalTest(unittest.TestCase):
+    def test_instance_created_outside_the_event_loop(self):
+        with StubServer(latency=0.05) as stub:
+            pydel = AsyncPydel('0' * 64, 'Trondheim', 'NO', 63.43, 10.39, 'Strindvegen', base_url=stub.url,
+                               write_delay=0)
+
+            async def get_karma():
+                try:
+                    await pydel.authenticate()
+                    pydel._expiration_date = time.time() - 1
+                    await asyncio.gather(*[pydel.get_karma() for _ in range(THREADS)])
+                finally:
+                    await pydel.close()
+
+            asyncio.run(get_karma())
+
+            self.assertEqual(stub.requests.get(REGISTER), 1)
+            self.assertEqual(stub.requests.get(REFRESH), 1)
+            self.assertEqual(stub.requests.get('GET /api/v2/users/karma'), THREADS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import threading
+import unittest
+
+from pydel.pydel_exceptions import AuthenticationError
+from pydel.watcher import FeedWatcher
+
+
+class FailingRenewal:
+    """
+    Stands in for a Pydel instance whose auth token cannot be renewed.
+    """
+    def get_feed(self, feed):
+        raise AuthenticationError("Server returned 401")
+
+
+class ErrorTest(unittest.TestCase):
+    def test_failed_renewal_does_not_stop_the_thread(self):
+        watcher = FeedWatcher(FailingRenewal(), max_interval=0.01)
+        errors = []
+        retried = threading.Event()
+
+        def on_error(e):
+            errors.append(e)
+            if len(errors) == 3:
+                retried.set()
+
+        watcher.start(lambda event: None, on_error)
+        self.assertTrue(retried.wait(5))
+        watcher.stop()
+
+        self.assertIsInstance(watcher.last_error, AuthenticationError)
+        self.assertGreaterEqual(watcher.errors, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()